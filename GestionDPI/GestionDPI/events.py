@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+import json
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.tokens import Token
+
+
+class Subscription:
+    """Events of one channel for one listener, read with `await get()`."""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, event):
+        # called on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # too slow to keep up: ask the client to reload the queue and stop
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'event': 'resync'})
+            self.broker.unsubscribe(self)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InProcessBroker:
+    """
+    Publish/subscribe within a single server process.
+
+    Publishers may run in any thread (sync views run in a thread pool under
+    ASGI); events are handed to each subscriber's event loop. Only listeners
+    connected to the same process receive the events, so deployments with
+    several worker processes need a broker backed by an external service
+    with the same `publish`/`subscribe` interface.
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channel):
+        """Must be called from the event loop that will read the events."""
+        subscription = Subscription(self, channel, self.maxsize)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+    def publish(self, channel, event):
+        event = {**event, 'id': next(self._ids)}
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # the listener's loop is closed
+                self.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """The broker configured by `TICKET_EVENTS_BROKER` (a dotted class path)."""
+    return import_string(settings.TICKET_EVENTS_BROKER)()
+
+
+def ticket_channel(hospital_id, type):
+    return f"tickets:{hospital_id}:{type}"
+
+
+def ticket_event(event, ticket):
+    payload = {'event': event, 'ticket_id': ticket.id}
+    if event == 'ticket_created':
+        payload.update({
+            'title': ticket.title,
+            'description': ticket.description,
+            'priority': ticket.priority,
+            'created_at': ticket.created_at,
+            'consultation_id': ticket.consultation_id,
+        })
+    return json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+
+
+def publish_ticket_event(event, ticket):
+    """
+    Push a `ticket_created` or `ticket_closed` delta to the listeners of the
+    ticket's hospital and type once the current transaction commits.
+    """
+    channel = ticket_channel(ticket.hospital_id, ticket.type)
+    payload = ticket_event(event, ticket)
+    transaction.on_commit(lambda: get_broker().publish(channel, payload))
+
+
+class EventStreamToken(Token):
+    """
+    JWT opening the event stream of one ticket type, given in the stream's
+    URL since EventSource cannot send headers: short-lived, and refused by
+    the API's authentication, which only takes access tokens.
+    """
+    token_type = 'ticket_events'
+
+    @property
+    def lifetime(self):
+        return settings.TICKET_EVENTS_TOKEN_LIFETIME
+
+    @classmethod
+    def for_stream(cls, user, ticket_type):
+        token = cls.for_user(user)
+        token['ticket_type'] = ticket_type
+        return token
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
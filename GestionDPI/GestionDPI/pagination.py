@@ -0,0 +1,187 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from drf_spectacular.utils import OpenApiParameter
+
+PAGINATION_MODES = ('page', 'cursor')
+COUNT_MODES = ('exact', 'cached', 'estimate', 'none')
+
+# query parameters of `paginate_listing`, for the views' schemas
+LISTING_PARAMETERS = [
+    OpenApiParameter(name='pagination', type=str, location=OpenApiParameter.QUERY, required=False, enum=PAGINATION_MODES, description='Numbered pages (default) or cursor pagination'),
+    OpenApiParameter(name='cursor', type=str, location=OpenApiParameter.QUERY, required=False, description='next_cursor of the previous page, in cursor pagination'),
+    OpenApiParameter(name='page_size', type=int, location=OpenApiParameter.QUERY, required=False, description='Items per page in cursor pagination (default 10, max 100)'),
+    OpenApiParameter(name='count', type=str, location=OpenApiParameter.QUERY, required=False, enum=COUNT_MODES, description='How the total is computed: exact (default for pages), cached (default for cursors), estimate or none (cursors only)'),
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) pagination over a queryset ordered by `(field, id)`.
+
+    Instead of OFFSET, each page filters on the last `(field, id)` pair of the
+    previous page, so page 500 costs the same as page 1 as long as the
+    ordering is backed by an index.
+
+    `ordering` is a field path, prefixed with `-` for descending order,
+    e.g. `-created_at` or `user__user__last_name`.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, queryset, ordering, page_size=20, max_page_size=100):
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.queryset = queryset.annotate(keyset_value=F(self.field)).order_by(
+            *((f'-{self.field}', '-id') if self.descending else (self.field, 'id'))
+        )
+
+    @staticmethod
+    def encode_cursor(value, pk):
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        raw = json.dumps([value, pk]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise InvalidCursor('malformed cursor')
+        return value, pk
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise InvalidCursor('page_size must be an integer')
+        return max(1, min(page_size, self.max_page_size))
+
+    def page(self, cursor=None, page_size=None):
+        """
+        Return `(items, next_cursor)`; `next_cursor` is None on the last page.
+        """
+        page_size = page_size or self.page_size
+        queryset = self.queryset
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            lookup = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'id__{lookup}': pk})
+            )
+
+        items = list(queryset[:page_size + 1])
+        if len(items) <= page_size:
+            return items, None
+
+        items = items[:page_size]
+        last = items[-1]
+        if isinstance(last, dict):
+            return items, self.encode_cursor(last['keyset_value'], last['id'])
+        return items, self.encode_cursor(last.keyset_value, last.id)
+
+    def paginate(self, request):
+        return self.page(
+            request.query_params.get(self.cursor_query_param),
+            self.get_page_size(request),
+        )
+
+
+class ApproximatePaginator(Paginator):
+    """
+    Paginator whose `count` may be preset to an approximate total: pages are
+    not cut at the total, so a stale count never hides rows.
+    """
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+def estimate_count(queryset):
+    """
+    Row estimate of the query planner, without scanning the rows; None when
+    the database cannot tell (only MySQL's EXPLAIN is used).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'mysql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        columns = [column[0] for column in cursor.description]
+        row = dict(zip(columns, cursor.fetchone()))
+    return int(row['rows'] * float(row.get('filtered') or 100) / 100)
+
+
+def count_rows(queryset, mode, cache_key):
+    """
+    Total number of rows for a listing: `exact` runs a COUNT, `cached`
+    reuses a COUNT for `PAGINATION_COUNT_CACHE_TIMEOUT` seconds,
+    `estimate` asks the query planner (falling back to `cached`) and `none`
+    skips the total.
+    """
+    if mode not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+    if mode == 'none':
+        return None
+    if mode == 'exact':
+        return queryset.count()
+    if mode == 'estimate':
+        estimate = estimate_count(queryset)
+        if estimate is not None:
+            return estimate
+    return cache.get_or_set(f"count:{cache_key}", queryset.count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+
+
+def paginate_listing(request, queryset, ordering, cache_key, page_ordering=None, page_size=10):
+    """
+    Paginate a listing in the mode chosen by the `pagination` query parameter.
+
+    `page` (the default) keeps the numbered pages of Django's Paginator,
+    ordered by `page_ordering` (`ordering` by default), and answers `count`,
+    `num_pages` and `current_page`. `cursor` walks the
+    listing by `ordering` with a `KeysetPaginator` and answers `count` and
+    `next_cursor`, at the same cost on every page. The `count` query
+    parameter picks how the total is computed (see `count_rows`); it
+    defaults to `exact` for pages and `cached` for cursors. Pages need a
+    total for `num_pages`, so `none` is only accepted with cursors.
+
+    Returns `(items, meta)`; raises ValueError on invalid parameters.
+    """
+    mode = request.query_params.get('pagination', 'page')
+    if mode not in PAGINATION_MODES:
+        raise ValueError(f"pagination must be one of {', '.join(PAGINATION_MODES)}")
+    count_mode = request.query_params.get('count', 'exact' if mode == 'page' else 'cached')
+    if mode == 'page' and count_mode == 'none':
+        raise ValueError("count=none is only supported with pagination=cursor")
+    count = count_rows(queryset, count_mode, cache_key)
+
+    if mode == 'cursor':
+        items, next_cursor = KeysetPaginator(queryset, ordering, page_size=page_size).paginate(request)
+        return items, {"count": count, "next_cursor": next_cursor}
+
+    paginator = ApproximatePaginator(queryset.order_by(*(page_ordering or (ordering,))), per_page=page_size)
+    # Paginator.count is a cached property, preset it to skip its COUNT
+    paginator.count = count
+    page_obj = paginator.get_page(request.query_params.get("page", 1))
+    return list(page_obj), {
+        "count": count,
+        "num_pages": paginator.num_pages,
+        "current_page": page_obj.number,
+    }
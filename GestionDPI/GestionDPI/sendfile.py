@@ -0,0 +1,100 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# bytes read at a time when streaming part of a file
+_READ_SIZE = 64 * 1024
+
+
+class UnsatisfiableRange(ValueError):
+    pass
+
+
+def parse_range(header, size):
+    """
+    The (first, last) bytes, inclusive, asked by a `Range` header for a file
+    of `size` bytes; None to send the whole file (no header, several ranges
+    or an invalid one). Raises `UnsatisfiableRange` when the range starts
+    past the end of the file.
+    """
+    match = _BYTE_RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # the last `last` bytes
+        if int(last) == 0:
+            raise UnsatisfiableRange(header)
+        return max(size - int(last), 0), size - 1
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        raise UnsatisfiableRange(header)
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(_READ_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+
+
+def file_response(request, path):
+    """
+    Response sending a file under `MEDIA_ROOT`, by the web server when
+    `MEDIA_SENDFILE` names how (the server then answers Range requests),
+    else by Django: whole files through the WSGI server's file wrapper
+    (sendfile), single byte ranges in chunks.
+    """
+    stat = os.stat(path)
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    mode = settings.MEDIA_SENDFILE or None
+    if mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_PREFIX + quote(relative)
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    elif mode is None:
+        if request.headers.get('If-Range', last_modified) != last_modified:
+            # the client's copy is stale, send it the whole file
+            byte_range = None
+        else:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+            except UnsatisfiableRange:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{stat.st_size}"
+                return response
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            first, last = byte_range
+            response = StreamingHttpResponse(_read(path, first, last - first + 1), status=206, content_type=content_type)
+            response['Content-Length'] = str(last - first + 1)
+            response['Content-Range'] = f"bytes {first}-{last}/{stat.st_size}"
+        response['Accept-Ranges'] = 'bytes'
+    else:
+        raise ImproperlyConfigured(f"unknown MEDIA_SENDFILE {mode!r}")
+    response['Last-Modified'] = last_modified
+    return response
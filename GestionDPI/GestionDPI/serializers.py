@@ -1,4 +1,24 @@
+from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from GestionDPI.storage import media_url
+
+
+class MediaUrlField(serializers.Field):
+    """
+    Read-only URL of the image in a model's `CloudinaryField`, built by the
+    backend holding it (`GestionDPI.storage.media_url`).
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if isinstance(value, str):
+            # not read back from the database, e.g. a default just saved
+            value = self.parent.Meta.model._meta.get_field(self.source).to_python(value)
+        return media_url(value)
+
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from decouple import config
 import os
+import tempfile
 from datetime import timedelta
 import cloudinary
 import cloudinary.uploader
@@ -46,7 +47,12 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']
 # MEDIA CONFIGURATION
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+# printable prescriptions, rendered once per prescription content; a cache
+# of patient data, kept outside the source tree
+PRESCRIPTION_RENDER_ROOT = config(
+    'PRESCRIPTION_RENDER_ROOT', default=os.path.join(tempfile.gettempdir(), 'gestiondpi-prescriptions')
+)
 
 
 # Application definition
@@ -108,6 +114,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'GestionDPI.wsgi.application'
 
+# Served by uvicorn workers in production (see README): the ticket event
+# streams need an ASGI server to stay open without holding a worker
+ASGI_APPLICATION = 'GestionDPI.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -130,6 +140,141 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The cached timelines, stats and medicine ids are invalidated by the process
+# that writes, so every process serving the API or running ingest_pending_uploads
+# must share the cache: set CACHE_BACKEND to a shared backend in production, e.g.
+# django.core.cache.backends.redis.RedisCache with CACHE_LOCATION=redis://host:6379
+# or django.core.cache.backends.db.DatabaseCache with CACHE_LOCATION=<table name>.
+# The default per-process cache only suits a single process.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Seconds a consultation attachments timeline stays cached (invalidated on every write)
+CONSULTATION_TIMELINE_CACHE_TIMEOUT = 60 * 60
+
+# Seconds the doctor/admin dashboard stats series stay cached
+DASHBOARD_STATS_CACHE_TIMEOUT = 60
+
+# Seconds a medicine name -> catalog id mapping stays cached (catalog rows are never renamed)
+MEDICINE_ID_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Broker of the ticket queue push events (GestionDPI.events); the in-process
+# broker only reaches listeners connected to the same server process
+TICKET_EVENTS_BROKER = 'GestionDPI.events.InProcessBroker'
+
+# Seconds between two keepalive comments on idle event streams
+TICKET_EVENTS_KEEPALIVE = 15
+
+# Lifetime of the tokens opening an event stream, given in its URL where
+# access tokens would end up in proxy and access logs
+TICKET_EVENTS_TOKEN_LIFETIME = timedelta(minutes=1)
+
+# Seconds a listing total computed with ?count=cached is reused (GestionDPI.pagination)
+PAGINATION_COUNT_CACHE_TIMEOUT = 5 * 60
+
+# Seconds a worker keeps a claimed ticket before it returns to the queue (doctor.dispatch)
+TICKET_LEASE_SECONDS = 15 * 60
+
+# Waiting time that makes a ticket move up one priority level in the dispatch order,
+# applied to Ticket.dispatch_at when a ticket is saved
+TICKET_AGING_SECONDS = 30 * 60
+
+# Candidates tried per claim on databases without SELECT ... SKIP LOCKED
+TICKET_CLAIM_CANDIDATES = 10
+
+# Largest batch accepted by the dashboard/submit_results endpoints
+RESULT_BATCH_MAX_OBSERVATIONS = 500
+
+# Seconds between two checks for medicines created by other processes in the autocomplete index
+MEDICINE_INDEX_REFRESH_INTERVAL = 60
+
+# Ids below the highest one seen that each refresh of the autocomplete index reads again,
+# for medicines created by other processes whose transaction committed late
+MEDICINE_INDEX_RESCAN_IDS = 100
+
+# Backend storing new images (GestionDPI.storage): CloudinaryImageStorage,
+# LocalImageStorage (under MEDIA_ROOT, works offline) or S3ImageStorage; images
+# stored by another backend keep being served by it
+IMAGE_STORAGE_BACKEND = config('IMAGE_STORAGE_BACKEND', default='GestionDPI.storage.CloudinaryImageStorage')
+
+# Bucket of S3ImageStorage, on Amazon S3 or at the endpoint of an S3-compatible
+# store; credentials left empty come from boto3's usual sources
+IMAGE_S3_BUCKET = config('IMAGE_S3_BUCKET', default='')
+IMAGE_S3_ENDPOINT_URL = config('IMAGE_S3_ENDPOINT_URL', default='')
+IMAGE_S3_REGION = config('IMAGE_S3_REGION', default='')
+IMAGE_S3_ACCESS_KEY_ID = config('IMAGE_S3_ACCESS_KEY_ID', default='')
+IMAGE_S3_SECRET_ACCESS_KEY = config('IMAGE_S3_SECRET_ACCESS_KEY', default='')
+
+# Base URL of a public bucket (or of a CDN in front of it); without one images
+# get presigned URLs, valid longer than the cached consultation timelines
+# holding them
+IMAGE_S3_PUBLIC_URL = config('IMAGE_S3_PUBLIC_URL', default='')
+IMAGE_S3_URL_EXPIRY = 6 * 60 * 60
+
+# How LocalImageStorage images are sent (GestionDPI.sendfile): empty streams
+# them from Django with Range support; 'x-accel-redirect' hands them to nginx
+# through MEDIA_SENDFILE_PREFIX, an internal location aliased to MEDIA_ROOT;
+# 'x-sendfile' hands them to Apache or lighttpd
+MEDIA_SENDFILE = config('MEDIA_SENDFILE', default='')
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+
+# Image URLs memoized by GestionDPI.storage.media_url
+MEDIA_URL_CACHE_SIZE = 4096
+
+# Directory where uploaded images wait for the ingestion workers (doctor.ingest);
+# outside the source tree, staged radiographs are patient data
+IMAGE_UPLOAD_STAGING_ROOT = config(
+    'IMAGE_UPLOAD_STAGING_ROOT', default=os.path.join(tempfile.gettempdir(), 'gestiondpi-uploads')
+)
+
+# Threads pushing staged images to the storage backend
+IMAGE_INGEST_WORKERS = 4
+
+# Threads storing the files of one multi-image upload concurrently, and the
+# most files accepted by one dashboard/add_images call
+IMAGE_BATCH_UPLOAD_WORKERS = 8
+IMAGE_BATCH_MAX_FILES = 100
+
+# Largest file accepted by dashboard/chunked_upload, largest chunk accepted per
+# request, and seconds after which an upload left unfinished is failed
+IMAGE_CHUNKED_UPLOAD_MAX_SIZE = 512 * 1024 * 1024
+IMAGE_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+IMAGE_CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Derivatives rendered of each result image when it is stored (doctor.derivatives):
+# longest side in pixels (None keeps the original size) and JPEG quality
+IMAGE_VARIANTS = {
+    'thumbnail': {'size': 256, 'quality': 80},
+    'preview': {'size': 1024, 'quality': 85},
+    'full': {'size': None, 'quality': 90},
+}
+
+# Storage attempts of an image before its upload is marked failed, and the
+# seconds waited before the first retry (doubled on each retry)
+IMAGE_INGEST_ATTEMPTS = 3
+IMAGE_INGEST_RETRY_DELAY = 2
+
+# Store images in the request thread instead of the worker pool (tests)
+IMAGE_INGEST_EAGER = False
+
+# Images deleted from the storage backend per call by the media deletion
+# outbox drainer (doctor.media), attempts before a deletion is left for
+# inspection, and seconds before the first retry (doubled on each retry)
+MEDIA_DELETION_BATCH_SIZE = 100
+MEDIA_DELETION_ATTEMPTS = 5
+MEDIA_DELETION_RETRY_DELAY = 60
+
+# Drain the outbox in the request thread instead of the worker pool (tests)
+MEDIA_DELETION_EAGER = False
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,78 @@
+from calendar import month_name
+from datetime import date, datetime, time, timedelta
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils.timezone import localdate, make_aware
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def bucket_starts(period, count, end=None):
+    """
+    First day of the `count` calendar buckets (day, ISO week or month) ending
+    with the one that contains `end` (today by default), oldest first.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"{period} is not a valid period.")
+    end = end or localdate()
+
+    if period == 'day':
+        return [end - timedelta(days=i) for i in range(count - 1, -1, -1)]
+    if period == 'week':
+        monday = end - timedelta(days=end.weekday())
+        return [monday - timedelta(weeks=i) for i in range(count - 1, -1, -1)]
+
+    starts = []
+    year, month = end.year, end.month
+    for _ in range(count):
+        starts.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return starts[::-1]
+
+
+def bucket_label(period, start):
+    return month_name[start.month] if period == 'month' else start.isoformat()
+
+
+def time_series(metrics, period='month', count=6, end=None):
+    """
+    Gap-filled time series of several metrics.
+
+    `metrics` maps a metric name to `(queryset, date_field)`; each metric is
+    counted with a single grouped query. Returns a list of
+    `(bucket_start, {metric: value})` pairs, oldest bucket first, with 0 for
+    buckets without rows.
+    """
+    starts = bucket_starts(period, count, end)
+    since = make_aware(datetime.combine(starts[0], time.min))
+    trunc = PERIODS[period]
+
+    series = {start: dict.fromkeys(metrics, 0) for start in starts}
+    for name, (queryset, field) in metrics.items():
+        rows = (
+            queryset.filter(**{f'{field}__gte': since})
+            .annotate(bucket=trunc(field))
+            .values('bucket')
+            .annotate(value=Count('id'))
+            .order_by()
+        )
+        for row in rows:
+            bucket = row['bucket']
+            if isinstance(bucket, datetime):
+                bucket = bucket.date()
+            if bucket in series:
+                series[bucket][name] = row['value']
+
+    return list(series.items())
+
+
+def labelled_time_series(metrics, period='month', count=6, end=None):
+    """`time_series` in the dashboards format: `[{label: {metric: value}}, ...]`."""
+    return [
+        {bucket_label(period, start): values}
+        for start, values in time_series(metrics, period, count, end)
+    ]
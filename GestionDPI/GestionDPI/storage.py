@@ -0,0 +1,227 @@
+"""
+Backends storing the images of the application (results, their variants,
+profile pictures), selected by `IMAGE_STORAGE_BACKEND`.
+
+Whatever the backend, an image is kept in a `CloudinaryField` as a
+Cloudinary-shaped value, so the models do not depend on the backend. The
+public ids of the local and S3 images start with their backend's `prefix`,
+the others are Cloudinary's: read and delete existing images with
+`storage_for(image)` or `media_url(image)`, so the images stored before the
+backend was changed keep being served.
+"""
+import mimetypes
+import os
+import shutil
+import tempfile
+import uuid
+from functools import lru_cache
+import cloudinary.api
+import cloudinary.uploader
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+@lru_cache(maxsize=settings.MEDIA_URL_CACHE_SIZE)
+def _cloudinary_url(public_id, format, version, type, resource_type, transformation):
+    return CloudinaryResource(
+        public_id, format=format, version=version, type=type, resource_type=resource_type
+    ).build_url(**dict(transformation))
+
+
+def media_url(image, **transformation):
+    """
+    URL of a stored image, built by the backend holding it; None for an
+    empty image. Cloudinary URLs are memoized, the other backends ignore
+    transformations.
+    """
+    if not image:
+        return None
+    return storage_for(image).url(image, **transformation)
+
+
+class CloudinaryImageStorage:
+    """Images hosted by Cloudinary, the production backend."""
+    prefix = None
+    # most public ids accepted by one Admin API delete call
+    delete_batch_size = 100
+
+    def save(self, path, folder, name=None):
+        """
+        Upload a local file as `<folder>/<name>` (a random name by default);
+        returns the resource to assign to a `CloudinaryField`.
+        """
+        options = {'public_id': name} if name else {}
+        return cloudinary.uploader.upload_resource(path, folder=folder, resource_type='image', **options)
+
+    def delete(self, image):
+        cloudinary.uploader.destroy(image.public_id, invalidate=True)
+
+    def delete_many(self, images):
+        """Delete images with one Admin API call per batch of the same kind of resource."""
+        kinds = {}
+        for image in images:
+            kinds.setdefault((image.resource_type, image.type), []).append(image.public_id)
+        for (resource_type, type), public_ids in kinds.items():
+            for start in range(0, len(public_ids), self.delete_batch_size):
+                cloudinary.api.delete_resources(
+                    public_ids[start:start + self.delete_batch_size],
+                    resource_type=resource_type, type=type, invalidate=True,
+                )
+
+    def url(self, image, **transformation):
+        """
+        What `image.url`, or `image.build_url(...)` with a transformation,
+        gives, memoized by public id, version and transformation: list
+        endpoints render the same avatars on many rows.
+        """
+        options = tuple(sorted({**image.url_options, **transformation}.items()))
+        try:
+            hash(options)
+        except TypeError:
+            # chained transformations (lists of dicts) are built every time
+            return image.build_url(**transformation)
+        return _cloudinary_url(
+            image.public_id, image.format, image.version, image.type, image.resource_type or 'image', options
+        )
+
+
+class LocalImageStorage:
+    """
+    Images kept under `MEDIA_ROOT/local`, for hospitals keeping their images
+    on site and for development and tests without network access. They are
+    served by `GestionDPI.views.MediaFileView`, or by the web server it hands
+    them to (see `MEDIA_SENDFILE`).
+    """
+    prefix = 'local'
+
+    def path(self, image):
+        name = f"{image.public_id}.{image.format}" if image.format else image.public_id
+        return os.path.join(settings.MEDIA_ROOT, name)
+
+    def save(self, path, folder, name=None):
+        format = os.path.splitext(path)[1].lstrip('.').lower() or None
+        public_id = f"{self.prefix}/{folder}/{name or uuid.uuid4().hex}"
+        image = CloudinaryResource(public_id, format=format, type='upload', resource_type='image')
+        destination = self.path(image)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(path, destination)
+        return image
+
+    def delete(self, image):
+        try:
+            os.remove(self.path(image))
+        except FileNotFoundError:
+            pass
+
+    def delete_many(self, images):
+        for image in images:
+            self.delete(image)
+
+    def url(self, image, **transformation):
+        name = f"{image.public_id}.{image.format}" if image.format else image.public_id
+        return f"{settings.MEDIA_URL}{name}"
+
+
+class S3ImageStorage:
+    """
+    Images kept in the `IMAGE_S3_BUCKET` bucket of Amazon S3, or of an
+    S3-compatible object store (MinIO, Ceph) at `IMAGE_S3_ENDPOINT_URL`.
+    Needs boto3.
+    """
+    prefix = 's3'
+    # most keys accepted by one DeleteObjects call
+    delete_batch_size = 1000
+
+    def __init__(self):
+        if not settings.IMAGE_S3_BUCKET:
+            raise ImproperlyConfigured("S3ImageStorage needs IMAGE_S3_BUCKET")
+        self.bucket = settings.IMAGE_S3_BUCKET
+        self.client = self.create_client()
+
+    def create_client(self):
+        try:
+            import boto3
+        except ImportError as e:
+            raise ImproperlyConfigured("S3ImageStorage needs boto3 (pip install boto3)") from e
+        # boto3 falls back to its usual credential sources for unset settings
+        return boto3.client(
+            's3',
+            endpoint_url=settings.IMAGE_S3_ENDPOINT_URL or None,
+            region_name=settings.IMAGE_S3_REGION or None,
+            aws_access_key_id=settings.IMAGE_S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.IMAGE_S3_SECRET_ACCESS_KEY or None,
+        )
+
+    def key(self, image):
+        """Object key of an image: its public id without the prefix, with its extension."""
+        name = image.public_id[len(self.prefix) + 1:]
+        return f"{name}.{image.format}" if image.format else name
+
+    def save(self, path, folder, name=None):
+        format = os.path.splitext(path)[1].lstrip('.').lower() or None
+        public_id = f"{self.prefix}/{folder}/{name or uuid.uuid4().hex}"
+        image = CloudinaryResource(public_id, format=format, type='upload', resource_type='image')
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.client.upload_file(path, self.bucket, self.key(image), ExtraArgs={'ContentType': content_type})
+        return image
+
+    def delete(self, image):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(image))
+
+    def delete_many(self, images):
+        """Delete images with one DeleteObjects call per batch."""
+        keys = [self.key(image) for image in images]
+        for start in range(0, len(keys), self.delete_batch_size):
+            response = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys[start:start + self.delete_batch_size]], 'Quiet': True},
+            )
+            errors = response.get('Errors')
+            if errors:
+                raise OSError(f"{len(errors)} images not deleted, first {errors[0].get('Key')}: {errors[0].get('Message')}")
+
+    def url(self, image, **transformation):
+        if settings.IMAGE_S3_PUBLIC_URL:
+            return f"{settings.IMAGE_S3_PUBLIC_URL.rstrip('/')}/{self.key(image)}"
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.key(image)}, ExpiresIn=settings.IMAGE_S3_URL_EXPIRY
+        )
+
+
+# backends whose images are told apart by the first segment of their public id
+PREFIXED_STORAGES = {storage.prefix: storage for storage in (LocalImageStorage, S3ImageStorage)}
+
+
+@lru_cache(maxsize=None)
+def get_image_storage():
+    """The backend configured by `IMAGE_STORAGE_BACKEND` (a dotted class path), storing new images."""
+    return import_string(settings.IMAGE_STORAGE_BACKEND)()
+
+
+@lru_cache(maxsize=None)
+def _storage(storage_class):
+    return storage_class()
+
+
+def storage_for(image):
+    """The backend holding a stored image: the configured one when it is of its kind."""
+    prefix, _, _ = image.public_id.partition('/')
+    storage_class = PREFIXED_STORAGES.get(prefix, CloudinaryImageStorage)
+    configured = get_image_storage()
+    if isinstance(configured, storage_class):
+        return configured
+    return _storage(storage_class)
+
+
+def save_uploaded_image(uploaded_file, folder):
+    """Store an uploaded file with the configured backend; returns the resource to assign to a `CloudinaryField`."""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return get_image_storage().save(uploaded_file.temporary_file_path(), folder)
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=extension) as staged:
+        for chunk in uploaded_file.chunks():
+            staged.write(chunk)
+        staged.flush()
+        return get_image_storage().save(staged.name, folder)
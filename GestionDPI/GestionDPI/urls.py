@@ -14,9 +14,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from GestionDPI.views import CustomTokenObtainPairView
+from GestionDPI.storage import LocalImageStorage
+from GestionDPI.views import CustomTokenObtainPairView, MediaFileView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
 urlpatterns = [
@@ -32,6 +34,7 @@ urlpatterns = [
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    path(f"{settings.MEDIA_URL.lstrip('/')}{LocalImageStorage.prefix}/<path:path>", MediaFileView.as_view(), name='local_media'),
 ]
 
 
@@ -3,6 +3,26 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from GestionDPI.serializers import CustomTokenObtainPairSerializer
 from django.contrib.auth.models import User
 from rest_framework.response import Response
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.views import View
+from GestionDPI.events import EventStreamToken, format_sse, get_broker, ticket_channel
+from GestionDPI.sendfile import file_response
+from GestionDPI.storage import LocalImageStorage
+from rest_framework.views import APIView
+import rest_framework.status
+from doctor.dispatch import TicketLeased, claim_next_ticket, release_ticket, renew_lease
+from doctor.models import Ticket
+from doctor.results import parse_observations, submit_results
+import asyncio
+import os
 
 @extend_schema(
     tags=['Authentication'],
@@ -60,4 +80,227 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                 return Response("non valid criedentials")
         request._full_data = modified_data
         print(modified_data)
-        return super().post(request, *args, **kwargs)
\ No newline at end of file
+        return super().post(request, *args, **kwargs)
+
+
+def authenticate_stream(request, ticket_type):
+    """
+    AppUser of an access token given in the Authorization header or, since
+    EventSource cannot send headers, of an `EventStreamToken` for
+    `ticket_type` given in the `token` query parameter. None when invalid.
+    """
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    try:
+        if header:
+            raw_token = auth.get_raw_token(header)
+            if raw_token is None:
+                return None
+            token = auth.get_validated_token(raw_token)
+        else:
+            token = EventStreamToken(request.GET.get('token', ''))
+            if token.get('ticket_type') != ticket_type:
+                return None
+        return auth.get_user(token).appuser
+    except (TokenError, InvalidToken, AuthenticationFailed, User.appuser.RelatedObjectDoesNotExist):
+        return None
+
+
+@extend_schema(
+    tags=['Tickets'],
+    summary="Get an event stream token",
+    description="Short-lived token opening the department's ticket event stream, given as `dashboard/events?token=...` since EventSource cannot send headers. Access tokens are not accepted in the URL, where proxies and access logs would keep them.",
+    request=None,
+    responses={200: OpenApiResponse(description="Token and its lifetime in seconds")},
+)
+class TicketEventsTokenView(APIView):
+    ticket_type = None
+
+    def post(self, request):
+        token = EventStreamToken.for_stream(request.user, self.ticket_type)
+        return Response(
+            {"token": str(token), "expires_in": int(settings.TICKET_EVENTS_TOKEN_LIFETIME.total_seconds())},
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+class TicketEventsView(View):
+    """
+    Server-Sent Events stream of the ticket queue of the worker's hospital:
+    `ticket_created` and `ticket_closed` deltas, pushed when the change
+    commits. Clients load the queue once, then apply the deltas; a `resync`
+    event means the client fell behind and must reload the queue.
+
+    Streams are only served through `GestionDPI/asgi.py` (see README): a
+    WSGI server would read the endless stream before sending anything while
+    holding a worker, so it is told to poll the queue instead.
+    """
+    ticket_type = None
+    role = None
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {'error': 'Event streams need the ASGI server, poll dashboard/get_open_tickets instead'}, status=501
+            )
+        app_user = await sync_to_async(authenticate_stream)(request, self.ticket_type)
+        if app_user is None:
+            return JsonResponse({'error': 'Authentication credentials were not provided or are invalid'}, status=401)
+        if app_user.role != self.role:
+            return JsonResponse({'error': 'You do not have permission to perform this action'}, status=403)
+
+        subscription = get_broker().subscribe(ticket_channel(app_user.hospital_id, self.ticket_type))
+        response = StreamingHttpResponse(self.stream(subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # let nginx pass events through as they come
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, subscription):
+        with subscription:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), settings.TICKET_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+                if event['event'] == 'resync':
+                    return
+
+
+class MediaFileView(View):
+    """
+    Images of `LocalImageStorage`, under unguessable names and public like
+    the Cloudinary URLs they replace. See `GestionDPI.sendfile` for how the
+    file is sent.
+    """
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(os.path.join(settings.MEDIA_ROOT, LocalImageStorage.prefix), path)
+        except SuspiciousFileOperation:
+            raise Http404(path)
+        if not os.path.isfile(full_path):
+            raise Http404(path)
+        return file_response(request, full_path)
+
+
+def serialize_claim(ticket):
+    return {
+        "ticket_id": ticket.id,
+        "title": ticket.title,
+        "description": ticket.description,
+        "priority": ticket.priority,
+        "created_at": ticket.created_at,
+        "consultation_id": ticket.consultation_id,
+        "lease_expires_at": ticket.lease_expires_at,
+    }
+
+
+@extend_schema(
+    tags=['Tickets'],
+    summary="Claim the next ticket",
+    description="Lease the most urgent open ticket (priority with aging) to the current worker for a limited time. A worker already holding a lease gets the same ticket back. 204 when the queue is empty.",
+    request=None,
+    responses={
+        200: OpenApiResponse(description="Claimed ticket with its lease expiry"),
+        204: OpenApiResponse(description="No ticket to claim"),
+    },
+)
+class ClaimTicketView(APIView):
+    ticket_type = None
+
+    def post(self, request):
+        ticket = claim_next_ticket(request.user.appuser.worker, self.ticket_type)
+        if ticket is None:
+            return Response(status=rest_framework.status.HTTP_204_NO_CONTENT)
+        return Response(serialize_claim(ticket), status=rest_framework.status.HTTP_200_OK)
+
+
+@extend_schema(
+    tags=['Tickets'],
+    summary="Renew a ticket lease",
+    description="Extend the lease of a ticket claimed by the current worker.",
+    request=None,
+    responses={
+        200: OpenApiResponse(description="Lease renewed"),
+        409: OpenApiResponse(description="The lease expired or belongs to another worker"),
+    },
+)
+class RenewLeaseView(APIView):
+
+    def post(self, request, id):
+        if not renew_lease(request.user.appuser.worker, id):
+            return Response("lease expired or not held", status=rest_framework.status.HTTP_409_CONFLICT)
+        return Response(status=rest_framework.status.HTTP_200_OK)
+
+
+@extend_schema(
+    tags=['Tickets'],
+    summary="Release a ticket",
+    description="Give a ticket claimed by the current worker back to the queue.",
+    request=None,
+    responses={
+        200: OpenApiResponse(description="Ticket released"),
+        409: OpenApiResponse(description="The ticket is not held by the current worker"),
+    },
+)
+class ReleaseTicketView(APIView):
+
+    def post(self, request, id):
+        if not release_ticket(request.user.appuser.worker, id):
+            return Response("ticket not held", status=rest_framework.status.HTTP_409_CONFLICT)
+        return Response(status=rest_framework.status.HTTP_200_OK)
+
+
+@extend_schema(
+    tags=['Tickets'],
+    summary="Submit results in batch",
+    description="Record many observations across many tickets and close those tickets, in one transaction.",
+    request={
+        'application/json': {
+            'type': 'object',
+            'properties': {
+                'observations': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'ticket_id': {'type': 'integer'},
+                            'title': {'type': 'string'},
+                            'notes': {'type': 'string'},
+                        },
+                        'required': ['ticket_id', 'title'],
+                    },
+                },
+            },
+            'required': ['observations'],
+        }
+    },
+    responses={
+        200: OpenApiResponse(description="Ids of the closed tickets"),
+        400: OpenApiResponse(description="Invalid batch"),
+        404: OpenApiResponse(description="Unknown ticket"),
+        409: OpenApiResponse(description="A ticket is leased to another worker"),
+    },
+)
+class SubmitResultsView(APIView):
+    ticket_type = None
+
+    def post(self, request):
+        try:
+            observations = parse_observations(request.data.get("observations"))
+        except ValueError as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_400_BAD_REQUEST)
+        try:
+            closed = submit_results(request.user.appuser.worker, self.ticket_type, observations)
+        except Ticket.DoesNotExist as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+        except TicketLeased as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_409_CONFLICT)
+        return Response(
+            {"closed_tickets": closed, "observations": len(observations)},
+            status=rest_framework.status.HTTP_200_OK,
+        )
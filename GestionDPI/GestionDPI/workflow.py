@@ -0,0 +1,869 @@
+"""
+Views and URLs shared by the result departments (lab, radiology, nursing).
+
+Each department app mounts `workflow_urlpatterns(<ticket type>)`; what
+differs between departments lives in its `doctor.workflow.ResultWorkflow`.
+"""
+import rest_framework.status
+from django.conf import settings
+from django.db import transaction
+from django.urls import path
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiResponse
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from doctor.dispatch import TicketLeased, close_ticket, lock_ticket_for_result
+from doctor.dpi import refresh_dpi_consultation
+from doctor.ingest import UploadOffsetMismatch, complete_chunked_upload, open_chunked_upload, queue_upload, queue_uploads, receive_chunk
+from doctor.models import ImageUpload, Ticket
+from doctor.serializers import TicketSerializer
+from doctor.tickets import closed_tickets, open_ticket_queue, resolve_ticket_workers
+from doctor.timeline import ConsultationTimeline
+from doctor.workflow import get_workflow
+from GestionDPI.events import publish_ticket_event
+from GestionDPI.pagination import LISTING_PARAMETERS, paginate_listing
+from GestionDPI.storage import media_url
+from GestionDPI.views import ClaimTicketView, ReleaseTicketView, RenewLeaseView, SubmitResultsView, TicketEventsTokenView, TicketEventsView
+from users.directory import hospital_patients
+from users.models import Patient
+from users.serializers import PatientSerializer
+
+TICKET_PARTIES = ["consultation.doctor.user.user", "consultation.patient.user.user"]
+
+DOCTOR_OMIT = [
+    "consultation.doctor.user.role",
+    "consultation.doctor.user.gender",
+    "consultation.doctor.user.phone_number",
+    "consultation.doctor.user.nss",
+    "consultation.doctor.user.date_of_birth",
+    "consultation.doctor.user.created_at",
+    "consultation.doctor.user.updated_at",
+    "consultation.doctor.user.place_of_birth",
+    "consultation.doctor.user.hospital",
+    "consultation.doctor.user.address",
+    "consultation.doctor.user.is_active",
+]
+
+OPEN_TICKET_OMIT = [
+    "status",
+    "type",
+    "created_at",
+    "consultation.archived",
+    "consultation.reason",
+    "consultation.patient.medical_condition",
+    "consultation.patient.user.created_at",
+    "consultation.patient.user.updated_at",
+    "consultation.patient.user.place_of_birth",
+    "consultation.patient.user.hospital",
+    "consultation.patient.user.address",
+    "consultation.patient.user.role",
+    "consultation.patient.user.is_active",
+    *DOCTOR_OMIT,
+]
+
+CLOSED_TICKET_OMIT = [
+    "type",
+    "consultation.archived",
+    "consultation.reason",
+    "consultation.patient.consultation_count",
+    "consultation.patient.medical_condition",
+    "consultation.patient.user.image",
+    "consultation.patient.user.created_at",
+    "consultation.patient.user.updated_at",
+    "consultation.patient.user.place_of_birth",
+    "consultation.patient.user.hospital",
+    "consultation.patient.user.address",
+    "consultation.patient.user.role",
+    "consultation.patient.user.is_active",
+    *DOCTOR_OMIT,
+    "consultation.doctor.user.image",
+]
+
+TICKET_HISTORY_FIELDS = [
+    "id",
+    "title",
+    "priority",
+    "worker",
+    "consultation.doctor",
+    "consultation.doctor.id",
+    "consultation.doctor.user.id",
+    "consultation.doctor.user.user",
+    "consultation.patient",
+    "consultation.patient.id",
+    "consultation.patient.user.id",
+    "consultation.patient.user.user",
+    "consultation.id",
+    "created_at",
+]
+
+PATIENT_LIST_OMIT = [
+    "medical_condition",
+    "user.created_at",
+    "user.updated_at",
+    "user.place_of_birth",
+    "user.hospital",
+    "user.role",
+    "user.is_active",
+]
+
+PATIENT_OMIT = [
+    "user.created_at",
+    "user.updated_at",
+    "user.hospital",
+    "user.role",
+    "user.is_active",
+]
+
+
+class WorkflowView(APIView):
+    """A view of the department handling `ticket_type` tickets."""
+    ticket_type = None
+
+    @property
+    def workflow(self):
+        return get_workflow(self.ticket_type)
+
+
+@extend_schema(
+    summary="Get Open Tickets",
+    description="Open tickets of the department in the worker's hospital, most urgent then oldest first.",
+    responses={200: TicketSerializer(many=True)},
+)
+class GetOpenTicketsView(WorkflowView):
+
+    def get(self, request):
+        tickets = open_ticket_queue(request.user.appuser.hospital, self.ticket_type)
+
+        serializer = TicketSerializer(
+            tickets,
+            omit=OPEN_TICKET_OMIT,
+            expand=TICKET_PARTIES,
+            many=True,
+        )
+
+        for e in serializer.data:
+            e["ticket_id"] = e.pop("id")
+        return Response(serializer.data)
+
+
+@extend_schema(
+    summary="Submit Result",
+    description="Add an observation to the result of a ticket and close the ticket.",
+    request={
+        "application/json": OpenApiExample(
+            name="Submit Result Example",
+            value={
+                "ticket_id": 123,
+                "title": "Hemoglobin Analysis",
+                "notes": "Patient shows elevated levels of hemoglobin.",
+            },
+        ),
+    },
+    responses={
+        200: OpenApiResponse(description="Result submitted successfully."),
+        400: OpenApiResponse(description="Bad request or missing parameters."),
+        404: OpenApiResponse(description="Ticket not found."),
+        409: OpenApiResponse(description="The ticket is leased to another worker."),
+    },
+)
+class SubmitResultView(WorkflowView):
+
+    def post(self, request):
+
+        data = request.data
+
+        try:
+            ticket_id = data["ticket_id"]
+            title = data["title"]
+            notes = data.get("notes")
+        except KeyError as e:
+            return Response(
+                f"missing key: {e.__str__()}",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        worker = request.user.appuser.worker
+        with transaction.atomic():
+            try:
+                ticket = lock_ticket_for_result(ticket_id, request.user.appuser.hospital, self.ticket_type, worker)
+            except Ticket.DoesNotExist as e:
+                return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+            except TicketLeased as e:
+                return Response(e.__str__(), status=rest_framework.status.HTTP_409_CONFLICT)
+
+            # the ticket row is locked, so concurrent submissions cannot both create the result
+            result = self.workflow.result_of(ticket, worker)
+            self.workflow.add_observation(result, title, notes)
+
+            close_ticket(ticket)
+            publish_ticket_event("ticket_closed", ticket)
+        ConsultationTimeline.invalidate(ticket.consultation_id)
+        refresh_dpi_consultation(ticket.consultation_id)
+
+        return Response(status=rest_framework.status.HTTP_200_OK)
+
+
+def serialize_uploads(uploads, workflow):
+    """Status of image uploads, with the stored images loaded in one query."""
+    images = workflow.image_model.objects.in_bulk(
+        [upload.image_id for upload in uploads if upload.status == "Stored"]
+    )
+    data = []
+    for upload in uploads:
+        entry = {
+            "upload_id": upload.id,
+            "ticket_id": upload.ticket_id,
+            "file_name": upload.file_name,
+            "status": upload.status,
+            "error": upload.error,
+        }
+        if upload.status == "Receiving":
+            entry["offset"] = upload.received
+            entry["size"] = upload.size
+        if upload.status == "Stored":
+            image = images.get(upload.image_id)
+            entry["image_id"] = upload.image_id
+            entry["image_url"] = media_url(image.image) if image is not None else None
+        data.append(entry)
+    return data
+
+
+@extend_schema(
+    summary="Add Image to Result",
+    description=(
+        "Receive an image for the result of a ticket. The image is stored in the "
+        "background; poll `dashboard/upload_status/<upload_id>` until it is `Stored`."
+    ),
+    request={
+        "multipart/form-data": {
+            "type": "object",
+            "properties": {
+                "ticket_id": {"type": "integer"},
+                "image": {"type": "string", "format": "binary"},
+            },
+            "required": ["ticket_id", "image"],
+        }
+    },
+    responses={
+        202: OpenApiResponse(
+            description="Image received, being stored.",
+            examples={
+                "example": {
+                    "upload_id": 1,
+                    "ticket_id": 123,
+                    "file_name": "chest.jpg",
+                    "status": "Pending",
+                    "error": None,
+                }
+            },
+        ),
+        400: OpenApiResponse(description="Bad request or missing parameters."),
+        404: OpenApiResponse(description="Ticket not found."),
+    },
+)
+class AddImageView(WorkflowView):
+
+    def post(self, request):
+
+        data = request.data
+
+        try:
+            ticket_id = data["ticket_id"]
+            uploaded_image = request.FILES["image"]
+        except KeyError as e:
+            return Response(
+                f"missing key: {e.__str__()}",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            ticket = self.workflow.tickets(request.user.appuser.hospital).get(id=ticket_id)
+        except (Ticket.DoesNotExist, ValueError) as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+
+        upload = queue_upload(ticket, request.user.appuser.worker, uploaded_image)
+
+        return Response(
+            serialize_uploads([upload], self.workflow)[0],
+            status=rest_framework.status.HTTP_202_ACCEPTED,
+        )
+
+
+@extend_schema(
+    summary="Add Images to Result",
+    description=(
+        "Receive a series of images (`images`, repeated) for the result of a ticket. "
+        "Each file is acknowledged on its own: empty files are `Rejected`, the others "
+        "are stored together in the background and can be polled with "
+        "`dashboard/upload_status?ids=1,2,3`."
+    ),
+    request={
+        "multipart/form-data": {
+            "type": "object",
+            "properties": {
+                "ticket_id": {"type": "integer"},
+                "images": {"type": "array", "items": {"type": "string", "format": "binary"}},
+            },
+            "required": ["ticket_id", "images"],
+        }
+    },
+    responses={
+        202: OpenApiResponse(description="Outcome of each file, in the order they were sent."),
+        400: OpenApiResponse(description="No files or too many files."),
+        404: OpenApiResponse(description="Ticket not found."),
+    },
+)
+class AddImagesView(WorkflowView):
+
+    def post(self, request):
+
+        files = request.FILES.getlist("images")
+        if "ticket_id" not in request.data or not files:
+            return Response(
+                "ticket_id and at least one file in images are required",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+        if len(files) > settings.IMAGE_BATCH_MAX_FILES:
+            return Response(
+                f"at most {settings.IMAGE_BATCH_MAX_FILES} images per upload",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            ticket = self.workflow.tickets(request.user.appuser.hospital).get(id=request.data["ticket_id"])
+        except (Ticket.DoesNotExist, ValueError) as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+
+        accepted = [uploaded for uploaded in files if uploaded.size > 0]
+        uploads = iter(serialize_uploads(
+            queue_uploads(ticket, request.user.appuser.worker, accepted) if accepted else [],
+            self.workflow,
+        ))
+        outcomes = [
+            next(uploads) if uploaded.size > 0
+            else {"file_name": uploaded.name, "status": "Rejected", "error": "empty file"}
+            for uploaded in files
+        ]
+
+        return Response(
+            {"ticket_id": ticket.id, "uploads": outcomes},
+            status=rest_framework.status.HTTP_202_ACCEPTED,
+        )
+
+
+@extend_schema(
+    summary="Get Image Upload Status",
+    description="Status of an image sent by the current worker: `Pending`, `Stored` (with the image id and url) or `Failed` (with the error).",
+    responses={
+        200: OpenApiResponse(description="Upload status."),
+        404: OpenApiResponse(description="Upload not found."),
+    },
+)
+class UploadStatusView(WorkflowView):
+
+    def get(self, request, id):
+
+        try:
+            upload = self.uploads(request).get(id=id)
+        except ImageUpload.DoesNotExist as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+
+        return Response(
+            serialize_uploads([upload], self.workflow)[0],
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+    def uploads(self, request):
+        return ImageUpload.objects.filter(worker=request.user.appuser.worker, ticket__type=self.ticket_type)
+
+
+@extend_schema(
+    summary="Get Image Upload Statuses",
+    description="Status of several images sent by the current worker; unknown ids are left out.",
+    parameters=[
+        OpenApiParameter(
+            name="ids",
+            location=OpenApiParameter.QUERY,
+            description="Comma separated upload ids.",
+            required=True,
+            type=str,
+        ),
+    ],
+    responses={
+        200: OpenApiResponse(description="Upload statuses, by upload id."),
+        400: OpenApiResponse(description="Invalid ids."),
+    },
+)
+class UploadStatusesView(UploadStatusView):
+
+    def get(self, request):
+
+        try:
+            ids = [int(id) for id in request.GET.get("ids", "").split(",")]
+        except ValueError:
+            return Response(
+                "ids must be comma separated integers",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+        if len(ids) > settings.IMAGE_BATCH_MAX_FILES:
+            return Response(
+                f"at most {settings.IMAGE_BATCH_MAX_FILES} ids",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        uploads = list(self.uploads(request).filter(id__in=ids).order_by("id"))
+        return Response(
+            serialize_uploads(uploads, self.workflow),
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    summary="Start Chunked Image Upload",
+    description=(
+        "Announce a large image for the result of a ticket, to be sent in chunks of at "
+        "most `chunk_size` bytes with `PUT dashboard/chunked_upload/<upload_id>`. An "
+        "interrupted upload resumes from the `offset` given by `GET` on the same URL."
+    ),
+    request={
+        "application/json": {
+            "type": "object",
+            "properties": {
+                "ticket_id": {"type": "integer"},
+                "file_name": {"type": "string"},
+                "size": {"type": "integer"},
+            },
+            "required": ["ticket_id", "file_name", "size"],
+        }
+    },
+    responses={
+        201: OpenApiResponse(
+            description="Upload started.",
+            examples={
+                "example": {
+                    "upload_id": 1,
+                    "ticket_id": 123,
+                    "file_name": "ct-series.dcm",
+                    "status": "Receiving",
+                    "error": None,
+                    "offset": 0,
+                    "size": 52428800,
+                    "chunk_size": 5242880,
+                }
+            },
+        ),
+        400: OpenApiResponse(description="Missing parameters or invalid size."),
+        404: OpenApiResponse(description="Ticket not found."),
+    },
+)
+class ChunkedUploadView(WorkflowView):
+
+    def post(self, request):
+
+        data = request.data
+
+        try:
+            ticket_id = data["ticket_id"]
+            file_name = str(data["file_name"])
+            size = int(data["size"])
+        except KeyError as e:
+            return Response(
+                f"missing key: {e.__str__()}",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+        except (TypeError, ValueError):
+            return Response("size must be an integer", status=rest_framework.status.HTTP_400_BAD_REQUEST)
+        if not 0 < size <= settings.IMAGE_CHUNKED_UPLOAD_MAX_SIZE:
+            return Response(
+                f"size must be between 1 and {settings.IMAGE_CHUNKED_UPLOAD_MAX_SIZE} bytes",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            ticket = self.workflow.tickets(request.user.appuser.hospital).get(id=ticket_id)
+        except (Ticket.DoesNotExist, ValueError) as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+
+        upload = open_chunked_upload(ticket, request.user.appuser.worker, file_name, size)
+
+        return Response(
+            {**serialize_uploads([upload], self.workflow)[0], "chunk_size": settings.IMAGE_UPLOAD_CHUNK_SIZE},
+            status=rest_framework.status.HTTP_201_CREATED,
+        )
+
+
+@extend_schema(
+    summary="Send Image Chunk",
+    description=(
+        "`GET` gives the status of a chunked upload, with the `offset` to send next while it is "
+        "`Receiving`. `PUT` appends the raw request body (`application/octet-stream`) at the "
+        "offset given by the `Upload-Offset` header, which must be the current one."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="Upload-Offset",
+            location=OpenApiParameter.HEADER,
+            description="Offset of the chunk in the file (PUT only).",
+            required=False,
+            type=int,
+        ),
+    ],
+    request={"application/octet-stream": {"type": "string", "format": "binary"}},
+    responses={
+        200: OpenApiResponse(description="Upload status, with the new offset."),
+        400: OpenApiResponse(description="Missing offset, empty, oversized or truncated chunk."),
+        404: OpenApiResponse(description="Upload not found."),
+        409: OpenApiResponse(description="The chunk is not at the current offset, or the upload is not receiving."),
+    },
+)
+class UploadChunkView(UploadStatusView):
+
+    def put(self, request, id):
+
+        try:
+            upload = self.uploads(request).get(id=id)
+        except ImageUpload.DoesNotExist as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+        if upload.status != "Receiving":
+            return Response(f"the upload is {upload.status}", status=rest_framework.status.HTTP_409_CONFLICT)
+
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (KeyError, ValueError):
+            return Response(
+                "an integer Upload-Offset header is required",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+        if not 0 < length <= settings.IMAGE_UPLOAD_CHUNK_SIZE:
+            return Response(
+                f"chunks must hold between 1 and {settings.IMAGE_UPLOAD_CHUNK_SIZE} bytes",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+        if offset < 0 or offset + length > upload.size:
+            return Response(
+                f"the chunk does not fit in the {upload.size} bytes announced",
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            upload = receive_chunk(upload.id, offset, request.stream, length)
+        except UploadOffsetMismatch as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            serialize_uploads([upload], self.workflow)[0],
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    summary="Complete Chunked Image Upload",
+    description=(
+        "Once every byte is received, have the file stored in the background and attached "
+        "to the ticket's result; poll `dashboard/upload_status/<upload_id>` until it is `Stored`."
+    ),
+    request=None,
+    responses={
+        202: OpenApiResponse(description="File complete, being stored."),
+        404: OpenApiResponse(description="Upload not found."),
+        409: OpenApiResponse(description="Bytes are missing, or the upload is not receiving."),
+    },
+)
+class CompleteChunkedUploadView(UploadStatusView):
+
+    def post(self, request, id):
+
+        with transaction.atomic():
+            try:
+                upload = self.uploads(request).select_for_update().get(id=id)
+            except ImageUpload.DoesNotExist as e:
+                return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+            if upload.status != "Receiving":
+                return Response(
+                    f"the upload is {upload.status}",
+                    status=rest_framework.status.HTTP_409_CONFLICT,
+                )
+            if upload.received != upload.size:
+                return Response(
+                    f"received {upload.received} of {upload.size} bytes",
+                    status=rest_framework.status.HTTP_409_CONFLICT,
+                )
+            complete_chunked_upload(upload)
+
+        return Response(
+            serialize_uploads([upload], self.workflow)[0],
+            status=rest_framework.status.HTTP_202_ACCEPTED,
+        )
+
+
+@extend_schema(
+    summary="Delete Image",
+    description="Delete an image from a result written by the current worker.",
+    responses={
+        200: OpenApiResponse(description="Image deleted successfully."),
+        404: OpenApiResponse(description="Image not found or not authorized to delete."),
+    },
+)
+class DelImageView(WorkflowView):
+
+    def delete(self, request, id):
+
+        try:
+            image = self.workflow.worker_image(id, request.user.appuser.worker)
+        except self.workflow.image_model.DoesNotExist:
+            return Response(
+                {"message": "Image not found or not authorized to delete"},
+                status=rest_framework.status.HTTP_404_NOT_FOUND,
+            )
+
+        # the stored file is removed in the background, see doctor.media
+        image.delete()
+        ConsultationTimeline.invalidate(getattr(image, self.workflow.result_field).ticket.consultation_id)
+
+        return Response(
+            {"message": "Image deleted successfully"},
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    summary="Get Result",
+    description=(
+        "Observations of the result of a ticket. Departments with images answer "
+        "`[images, observations]`, the others the list of observations."
+    ),
+    responses={
+        200: OpenApiResponse(
+            description="Success",
+            examples={
+                "example": [
+                    [{"id": 1, "image": "https://example.com/img.jpg"}],
+                    [{"id": 1, "title": "Blood Test", "notes": "Normal levels"}],
+                ]
+            },
+        ),
+        404: OpenApiResponse(description="No result for this ticket."),
+    },
+)
+class GetResultView(WorkflowView):
+
+    def get(self, request, ticket_id):
+
+        workflow = self.workflow
+        try:
+            result = workflow.detailed_result(request.user.appuser.hospital, ticket_id)
+        except workflow.result_model.DoesNotExist as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+
+        observations = workflow.observation_serializer(result.observations, many=True).data
+        if not workflow.has_images:
+            return Response(observations, status=rest_framework.status.HTTP_200_OK)
+
+        return Response(
+            [workflow.image_serializer(result.images, many=True).data, observations],
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    summary="List Patients",
+    description="Retrieve a paginated list of patients for the current user's hospital.",
+    parameters=[
+        OpenApiParameter(
+            name="page",
+            location=OpenApiParameter.QUERY,
+            description="Page number for pagination.",
+            required=False,
+            type=int,
+        ),
+        *LISTING_PARAMETERS,
+    ],
+    responses={
+        200: OpenApiResponse(description="List of patients."),
+        400: OpenApiResponse(description="Invalid page or request."),
+    },
+)
+class GetPatientListView(WorkflowView):
+
+    def get(self, request):
+        patients = hospital_patients(request.user.appuser.hospital)
+
+        try:
+            patients_list, meta = paginate_listing(
+                request,
+                patients,
+                "user__user__last_name",
+                f"patients:{request.user.appuser.hospital_id}",
+                page_ordering=("user__user__last_name", "id"),
+            )
+        except ValueError as e:
+            return Response(
+                {"error": e.__str__()},
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        patient_ser = PatientSerializer(
+            patients_list,
+            omit=PATIENT_LIST_OMIT,
+            expand=["user.user"],
+            many=True,
+        )
+
+        return Response(
+            {
+                **meta,
+                "results": patient_ser.data,
+            },
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    summary="Get Patient by NSS",
+    description="Retrieve detailed information about a patient by their NSS (National Social Security) number.",
+    responses={
+        200: PatientSerializer,
+        404: OpenApiResponse(description="Patient not found"),
+    },
+)
+class GetPatientByNSSView(WorkflowView):
+
+    def get(self, request, nss):
+
+        try:
+            patient = Patient.objects.select_related("user__user").get(user__nss=nss)
+        except Patient.DoesNotExist as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+
+        patient_ser = PatientSerializer(
+            patient,
+            omit=PATIENT_OMIT,
+            expand=["user.user"],
+        )
+
+        return Response(
+            patient_ser.data,
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    summary="Get Ticket History",
+    description="Retrieve a paginated list of the department's closed tickets in the worker's hospital.",
+    responses={
+        200: TicketSerializer(many=True),
+        400: OpenApiResponse(description="Invalid page parameter"),
+    },
+    parameters=[
+        OpenApiParameter(
+            name="page",
+            location=OpenApiParameter.QUERY,
+            description="Page number for paginated results (default is 1)",
+            required=False,
+            type=int,
+        ),
+        *LISTING_PARAMETERS,
+    ],
+)
+class GetTicketHistoryView(WorkflowView):
+
+    def get(self, request):
+        tickets = closed_tickets(request.user.appuser.hospital, self.ticket_type)
+
+        try:
+            tickets_list, meta = paginate_listing(
+                request,
+                tickets,
+                "-created_at",
+                f"ticket_history:{request.user.appuser.hospital_id}:{self.ticket_type}",
+                page_ordering=("id",),
+            )
+        except ValueError as e:
+            return Response(
+                {"error": e.__str__()},
+                status=rest_framework.status.HTTP_400_BAD_REQUEST,
+            )
+
+        ticket_ser = TicketSerializer(
+            tickets_list,
+            fields=TICKET_HISTORY_FIELDS,
+            expand=TICKET_PARTIES,
+            context={"workers": resolve_ticket_workers(tickets_list)},
+            many=True,
+        )
+
+        return Response(
+            {
+                **meta,
+                "results": ticket_ser.data,
+            },
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    summary="Get Ticket by ID",
+    description="Retrieve detailed information about one of the department's closed tickets.",
+    responses={
+        200: TicketSerializer,
+        404: OpenApiResponse(description="Ticket not found"),
+    },
+)
+class GetTicketByIDView(WorkflowView):
+
+    def get(self, request, id):
+
+        try:
+            ticket = closed_tickets(request.user.appuser.hospital, self.ticket_type).get(id=id)
+        except Ticket.DoesNotExist as e:
+            return Response(e.__str__(), status=rest_framework.status.HTTP_404_NOT_FOUND)
+
+        ticket_ser = TicketSerializer(
+            ticket,
+            omit=CLOSED_TICKET_OMIT,
+            expand=TICKET_PARTIES,
+            context={"workers": resolve_ticket_workers([ticket])},
+        )
+
+        return Response(
+            ticket_ser.data,
+            status=rest_framework.status.HTTP_200_OK,
+        )
+
+
+def workflow_urlpatterns(ticket_type):
+    """The URLs of the department handling `ticket_type` tickets."""
+    workflow = get_workflow(ticket_type)
+    options = {"ticket_type": ticket_type, "permission_classes": [workflow.permission]}
+
+    urlpatterns = [
+        path('dashboard/get_open_tickets', view= GetOpenTicketsView.as_view(**options)),
+        path('dashboard/events', view= TicketEventsView.as_view(ticket_type=ticket_type, role=workflow.role)),
+        path('dashboard/events/token', view= TicketEventsTokenView.as_view(**options)),
+        path('dashboard/claim_ticket', view= ClaimTicketView.as_view(**options)),
+        path('dashboard/renew_lease/<int:id>', view= RenewLeaseView.as_view(permission_classes=[workflow.permission])),
+        path('dashboard/release_ticket/<int:id>', view= ReleaseTicketView.as_view(permission_classes=[workflow.permission])),
+        path('dashboard/submit_result', view= SubmitResultView.as_view(**options)),
+        path('dashboard/submit_results', view= SubmitResultsView.as_view(**options)),
+    ]
+    if workflow.has_images:
+        urlpatterns += [
+            path('dashboard/add_image', view= AddImageView.as_view(**options)),
+            path('dashboard/add_images', view= AddImagesView.as_view(**options)),
+            path('dashboard/upload_status', view= UploadStatusesView.as_view(**options)),
+            path('dashboard/upload_status/<int:id>', view= UploadStatusView.as_view(**options)),
+            path('dashboard/chunked_upload', view= ChunkedUploadView.as_view(**options)),
+            path('dashboard/chunked_upload/<int:id>', view= UploadChunkView.as_view(**options)),
+            path('dashboard/chunked_upload/<int:id>/complete', view= CompleteChunkedUploadView.as_view(**options)),
+            path('dashboard/del_image/<int:id>', view= DelImageView.as_view(**options)),
+        ]
+    urlpatterns += [
+        path('dashboard/get_result/<int:ticket_id>', view= GetResultView.as_view(**options)),
+        path('get_patients_list', view= GetPatientListView.as_view(**options)),
+        path('get_patient/<str:nss>', view= GetPatientByNSSView.as_view(**options)),
+        path('get_ticket_history', view= GetTicketHistoryView.as_view(**options)),
+        path('get_ticket/<int:id>', view= GetTicketByIDView.as_view(**options)),
+    ]
+    return urlpatterns
@@ -1,5 +1,8 @@
 from django.urls import path,include
-from admins.views import AdminOnlyView,CreatePatientView,CreateWorkerView,DeleteUser,GetPatientsList,GetWorkersList,ModifyPatientView,ModifyWorkerView,GenerateQRView,getUserView,ModifyMyUser
+from admins.views import AdminOnlyView,CreatePatientView,CreateWorkerView,DeleteUser,GetWorkersList,ModifyPatientView,ModifyWorkerView,GenerateQRView,getUserView,ModifyMyUser
+from users.views import PatientListView,SearchPatientsView
+from GestionDPI.permissions import IsAdmin
+from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -12,7 +15,8 @@ urlpatterns = [
     path('modifyworker/<int:pk>', ModifyWorkerView.as_view(), name='worker_modify'),
     path('modifymyuser', ModifyMyUser.as_view(), name='myuser_modify'),
     path('myuser', getUserView.as_view(), name='user_info'),
-    path('patients',GetPatientsList.as_view(),name ='get_patients'),
+    path('patients',PatientListView.as_view(permission_classes=[IsAuthenticated, IsAdmin]),name ='get_patients'),
+    path('patients/search',SearchPatientsView.as_view(permission_classes=[IsAuthenticated, IsAdmin]),name ='admin_search_patients'),
     path('workers',GetWorkersList.as_view(),name ='get_workers'),
     path('getqr',GenerateQRView.as_view(),name='generate_qr')
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -7,21 +7,26 @@ from django.http import JsonResponse
 from datetime import datetime, timedelta
 from django.utils.timezone import now
 from users.models import AppUser,Patient,Worker,Hospital
+from GestionDPI.storage import media_url, save_uploaded_image
 from doctor.models import Consultation
-from django.db.models.functions import TruncMonth
 from django.db.models import Count
 from collections import defaultdict
-from calendar import month_name
 from django.contrib.auth.models import User
 from rest_framework import status
 import qrcode
 from django.http import HttpResponse
 import io
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiResponse
+from GestionDPI.stats import PERIODS, labelled_time_series
+from django.core.cache import cache
+from django.conf import settings
 
 @extend_schema(
     tags=['Admin Dashboard'],
     description='Get admin dashboard data including counts, statistics, and recent activity',
+    parameters=[
+        OpenApiParameter(name='period', type=str, location=OpenApiParameter.QUERY, required=False, enum=['month', 'week', 'day'], description='Stats bucket size (default month)')
+    ],
     responses={
         200: {
             'type': 'object',
@@ -65,7 +70,7 @@ class AdminOnlyView(APIView):
           'address': user.appuser.address,
           'phone_number':user.appuser.phone_number,
           'email':user.email,
-          'profile_image':user.appuser.image.url,
+          'profile_image':media_url(user.appuser.image),
           'workers_count':workercount,
           'patients_count':patientcount
         }
@@ -92,45 +97,24 @@ class AdminOnlyView(APIView):
               'phone_number': patient.phone_number,
               'emergency_contact_name':patient.patient.emergency_contact_name,
               'emergency_contact_phone':patient.patient.emergency_contact_phone,
-              'profile_image':patient.image.url
+              'profile_image':media_url(patient.image)
           }
           for patient in recent_patients
         ]
        
-        current_month = now()
-        six_months_ago = current_month - timedelta(days=6 * 30)
-        
-        patient_stats = (
-            AppUser.objects.filter(role='Patient', created_at__gte=six_months_ago,hospital=request.user.appuser.hospital)
-            .annotate(month=TruncMonth('created_at'))
-            .values('month')
-            .annotate(count=Count('id'))
-            .order_by('month')
+        period = request.query_params.get('period', 'month')
+        if period not in PERIODS:
+            return JsonResponse({'error': f"{period} is not a valid period."}, status=400)
+        hospital = request.user.appuser.hospital
+        stats_list = cache.get_or_set(
+            f"hospital_stats:{hospital.id}:{period}",
+            lambda: labelled_time_series({
+                'patients': (AppUser.objects.filter(role='Patient', hospital=hospital), 'created_at'),
+                'consultations': (Consultation.objects.filter(doctor__user__hospital=hospital), 'created_at'),
+            }, period=period),
+            settings.DASHBOARD_STATS_CACHE_TIMEOUT
         )
 
-        consultation_stats = (
-            Consultation.objects.filter(created_at__gte=six_months_ago)
-            .annotate(month=TruncMonth('created_at'))
-            .values('month')
-            .annotate(count=Count('id'))
-            .order_by('month')
-        )
-        stats_list =[]
-        for i in range(6):
-          stats_list.append({
-          month_name[(six_months_ago + timedelta(days=30 * i)).month]: {
-              'patients': next(
-                  (entry['count'] for entry in patient_stats if entry['month'].month == (six_months_ago + timedelta(days=31 * i)).month),
-                  0
-              ),
-              'consultations': next(
-                  (entry['count'] for entry in consultation_stats if entry['month'].month == (six_months_ago + timedelta(days=31 * i)).month),
-                  0
-              ),
-          }
-        
-        })
-
         top_doctors = (
           Consultation.objects.filter().values('doctor') 
           .annotate(consultation_count=Count('id'))  
@@ -145,7 +129,7 @@ class AdminOnlyView(APIView):
                 'user_id':doctor.user.id, 
                 'name': f"{doctor.user.user.first_name} {doctor.user.user.last_name}",
                 'role': f"Doctor@{doctor.speciality}",
-                'profile_image':doctor.user.image.url
+                'profile_image':media_url(doctor.user.image)
             }
             for doctor in doctors
         ]
@@ -313,65 +297,6 @@ class CreateWorkerView(APIView):
           return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return JsonResponse({'message': 'User created successfully', 'user_id': appuser.id}, status=201)
 
-@extend_schema(
-    tags=['Patient Management'],
-    description='Get list of all patients in the hospital',
-    responses={
-        200: {
-            'type': 'object',
-            'properties': {
-                'patients': {
-                    'type': 'array',
-                    'items': {
-                        'type': 'object',
-                        'properties': {
-                            'user_id': {'type': 'integer'},
-                            'name': {'type': 'string'},
-                            'created_at': {'type': 'string', 'format': 'date-time'},
-                            'nss': {'type': 'string'},
-                            'email': {'type': 'string'},
-                            'address': {'type': 'string'},
-                            'phone_number': {'type': 'string'},
-                            'emergency_contact_name': {'type': 'string'},
-                            'emergency_contact_phone': {'type': 'string'},
-                            'consultation_count': {'type': 'integer'},
-                            'profile_image': {'type': 'string'}
-                        }
-                    }
-                }
-            }
-        }
-    }
-)
-class GetPatientsList(APIView):
-    permission_classes = [IsAuthenticated, IsAdmin]
-
-    def get(self, request):
-        patients = AppUser.objects.filter(role='Patient',hospital=request.user.appuser.hospital)
-        patients_serialized=[]
-        for patient in patients:
-          consultation_count = patient.patient.consultation_set.count()
-          patients_serialized.append(
-          {
-              'user_id':patient.id,
-              'name': f"{patient.user.first_name} {patient.user.last_name}",
-              'created_at': patient.created_at,
-              'nss':patient.nss,
-              'email': patient.user.email,
-              'address': patient.address,
-              'phone_number': patient.phone_number,
-              'emergency_contact_name':patient.patient.emergency_contact_name,
-              'emergency_contact_phone':patient.patient.emergency_contact_phone,
-              'consultation_count':consultation_count,
-              'profile_image':patient.image.url
-              
-          }
-          
-        )
-       
-       
-        return JsonResponse({"patients":patients_serialized}, status=200)
-      
 @extend_schema(
     tags=['Worker Management'],
     description='Get list of all workers in the hospital',
@@ -419,7 +344,7 @@ class GetWorkersList(APIView):
               'nss':worker.nss,
               'address': worker.address,
               'created_at': worker.created_at,
-              'profile_image':worker.image.url,
+              'profile_image':media_url(worker.image),
               'gender':worker.gender
           }
           for worker in workers
@@ -521,7 +446,7 @@ class ModifyPatientView(APIView):
           user = appuser.user
           
           if file:
-             appuser.image = file     
+             appuser.image = save_uploaded_image(file, 'users')
        
           if(first_name):
               user.first_name=first_name
@@ -619,7 +544,7 @@ class ModifyWorkerView(APIView):
           appuser = AppUser.objects.get(pk=pk)
           user = appuser.user
           if file:    
-             appuser.image = file  
+             appuser.image = save_uploaded_image(file, 'users')
           if(first_name):
               user.first_name=first_name
           if(last_name):
@@ -685,7 +610,7 @@ class getPatientView(APIView):
           "nss" :app_user.nss,
           "address" : app_user.address,
           "phone_number" :app_user.phone_number,
-          "profile_image":app_user.image.url
+          "profile_image":media_url(app_user.image)
 
         }
         return JsonResponse(data)
@@ -731,7 +656,7 @@ class ModifyMyUser(APIView):
         file = request.FILES.get('image')  
         
         if file:
-            app_user.image = file  
+            app_user.image = save_uploaded_image(file, 'users')
         if first_name:
             app_user.user.first_name = first_name
         if hospital_name:
@@ -838,7 +763,7 @@ class getUserView(APIView):
           "nss" :app_user.nss,
           "address" : app_user.address,
           "phone_number" :app_user.phone_number,
-          "profile_image":app_user.image.url
+          "profile_image":media_url(app_user.image)
 
         }
         return JsonResponse(data)
\ No newline at end of file
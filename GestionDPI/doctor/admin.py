@@ -1,5 +1,5 @@
 from django.contrib import admin
-from doctor.models import Consultation, Prescription, Medicine,PrescriptionDetail,RadioImage,LabImage,LabObservation,RadioObservation,NursingObservation,NursingResult,RadioResult,LabResult,Ticket
+from doctor.models import Consultation, Prescription, Medicine,PrescriptionDetail,RadioImage,LabImage,LabObservation,RadioObservation,NursingObservation,NursingResult,RadioResult,LabResult,Ticket,PatientDPI
 # Register your models here.
 
 admin.site.register(Consultation)
@@ -15,4 +15,4 @@ admin.site.register(LabImage)
 admin.site.register(LabObservation)
 admin.site.register(RadioObservation)
 admin.site.register(NursingObservation)
-
+admin.site.register(PatientDPI)
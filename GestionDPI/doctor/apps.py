@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DoctorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'doctor'
+
+    def ready(self):
+        from doctor.dpi import connect_dpi_invalidation
+        from doctor.media import connect_media_deletions
+        connect_dpi_invalidation()
+        connect_media_deletions()
@@ -0,0 +1,88 @@
+import logging
+import os
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+from GestionDPI.storage import media_url
+
+logger = logging.getLogger(__name__)
+
+# 16 and 32 bit grey images (digital radiographs), scaled down to 8 bit
+_DEEP_GREY_MODES = ('I', 'I;16', 'I;16B', 'I;16L')
+
+
+def _web_ready(source):
+    source = ImageOps.exif_transpose(source)
+    if source.mode in _DEEP_GREY_MODES:
+        # stretch the used range (often 10 or 12 bits) over 8 bits
+        source = source.convert('I')
+        high = source.getextrema()[1]
+        scale = 255 / high if high > 255 else 1
+        return source.point(lambda value: value * scale).convert('L')
+    if source.mode not in ('RGB', 'L'):
+        return source.convert('RGB')
+    return source
+
+
+def render_variants(path):
+    """
+    Render the `IMAGE_VARIANTS` of an image file as JPEG files next to it.
+    Returns {variant name: path}, empty when Pillow cannot read the file.
+    """
+    base = os.path.splitext(path)[0]
+    rendered = {}
+    try:
+        with Image.open(path) as source:
+            source = _web_ready(source)
+            for name, options in settings.IMAGE_VARIANTS.items():
+                variant = source.copy()
+                if options['size']:
+                    variant.thumbnail((options['size'], options['size']), Image.LANCZOS)
+                rendered[name] = f"{base}_{name}.jpg"
+                variant.save(rendered[name], 'JPEG', quality=options['quality'], optimize=True, progressive=True)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as e:
+        logger.warning("No variants for %s: %s", path, e)
+        discard_variants(rendered)
+        return {}
+    return rendered
+
+
+def discard_variants(rendered):
+    for path in rendered.values():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def store_variants(storage, path, image):
+    """
+    Render the variants of an image file and store them next to its stored
+    original `image`, as `<public id>_<variant>`. Returns {variant name:
+    stored value} for the image's `variants` field; variants that cannot be
+    rendered or stored are left out and served as the original.
+    """
+    folder, _, name = image.public_id.rpartition('/')
+    if storage.prefix:
+        # the backend prefixes the folder again
+        folder = folder[len(storage.prefix) + 1:]
+    rendered = render_variants(path)
+    variants = {}
+    try:
+        for variant, variant_path in rendered.items():
+            try:
+                variants[variant] = storage.save(variant_path, folder, name=f"{name}_{variant}").get_prep_value()
+            except Exception:
+                logger.exception("Variant %s of %s could not be stored", variant, image.public_id)
+    finally:
+        discard_variants(rendered)
+    return variants
+
+
+def variant_urls(image_row):
+    """URL of each variant of a LabImage/RadioImage, the original's for missing ones."""
+    field = type(image_row)._meta.get_field('image')
+    original = media_url(image_row.image)
+    return {
+        name: media_url(field.to_python(image_row.variants[name])) if name in image_row.variants else original
+        for name in settings.IMAGE_VARIANTS
+    }
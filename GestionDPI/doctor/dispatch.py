@@ -0,0 +1,116 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from doctor.models import Ticket
+
+
+class TicketLeased(Exception):
+    """The ticket is leased to another worker."""
+
+
+def dispatch_order(queryset):
+    """
+    Order tickets for dispatch by their effective age.
+
+    A ticket waits as if it had been created `TICKET_AGING_SECONDS` later per
+    priority level below Critical (`Ticket.dispatch_at`, stored so that an
+    index serves this order), so a Low ticket goes before a new Critical one
+    once it has waited two aging steps longer, and no ticket starves.
+    """
+    return queryset.order_by('dispatch_at', 'id')
+
+
+def claimable_tickets(hospital_id, type, at=None):
+    """Open tickets of a type in a hospital that nobody holds a live lease on."""
+    return Ticket.objects.filter(hospital_id=hospital_id, type=type, status='Open').filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=at or now())
+    )
+
+
+def _lease(ticket_id, worker, until, condition=Q()):
+    return Ticket.objects.filter(condition, id=ticket_id).update(claimed_by=worker, lease_expires_at=until)
+
+
+def claim_next_ticket(worker, type):
+    """
+    Lease the next ticket of a type to a worker, or return None.
+
+    A worker holding a live lease on a ticket of this type gets it back
+    (with the lease extended) instead of a second one. Otherwise the best
+    claimable ticket in dispatch order is locked with
+    `SELECT ... FOR UPDATE SKIP LOCKED`, read in index order so that only
+    that row is locked, and concurrent claimers each skip the rows the
+    others are taking instead of queuing behind them. On
+    databases without SKIP LOCKED, the claim is a conditional UPDATE on
+    the first few candidates, retried on the next one when another claimer
+    won the race.
+    """
+    current = now()
+    until = current + timedelta(seconds=settings.TICKET_LEASE_SECONDS)
+    hospital_id = worker.user.hospital_id
+
+    with transaction.atomic():
+        held = Ticket.objects.filter(
+            claimed_by=worker, type=type, status='Open', lease_expires_at__gt=current
+        ).order_by('id').first()
+        if held is not None:
+            _lease(held.id, worker, until)
+            return Ticket.objects.get(id=held.id)
+
+        candidates = dispatch_order(claimable_tickets(hospital_id, type, current))
+        if connection.features.has_select_for_update_skip_locked:
+            ticket = candidates.select_for_update(skip_locked=True).first()
+            if ticket is None:
+                return None
+            _lease(ticket.id, worker, until)
+            return Ticket.objects.get(id=ticket.id)
+
+        for ticket_id in candidates.values_list('id', flat=True)[:settings.TICKET_CLAIM_CANDIDATES]:
+            still_claimable = Q(status='Open') & (Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=current))
+            if _lease(ticket_id, worker, until, still_claimable):
+                return Ticket.objects.get(id=ticket_id)
+    return None
+
+
+def renew_lease(worker, ticket_id):
+    """Extend a live lease of the worker; False when it has expired or is not theirs."""
+    until = now() + timedelta(seconds=settings.TICKET_LEASE_SECONDS)
+    live = Q(claimed_by=worker, status='Open', lease_expires_at__gt=now())
+    return bool(_lease(ticket_id, worker, until, live))
+
+
+def release_ticket(worker, ticket_id):
+    """Give a claimed ticket back to the queue; False when the worker does not hold it."""
+    return bool(Ticket.objects.filter(id=ticket_id, claimed_by=worker, status='Open').update(
+        claimed_by=None, lease_expires_at=None
+    ))
+
+
+def lock_ticket_for_result(ticket_id, hospital, type, worker):
+    """
+    Lock a ticket of the worker's hospital to record its result; call within
+    a transaction. Raises `Ticket.DoesNotExist`, or `TicketLeased` when
+    another worker holds a live lease on it.
+    """
+    ticket = Ticket.objects.select_for_update().get(id=ticket_id, hospital=hospital, type=type)
+    check_lease(ticket, worker)
+    return ticket
+
+
+def check_lease(ticket, worker, at=None):
+    """Raise `TicketLeased` if another worker holds a live lease on the ticket."""
+    if (
+        ticket.claimed_by_id not in (None, worker.id)
+        and ticket.lease_expires_at is not None
+        and ticket.lease_expires_at > (at or now())
+    ):
+        raise TicketLeased(f"Ticket {ticket.id} is being handled by another worker")
+
+
+def close_ticket(ticket):
+    ticket.status = 'Closed'
+    ticket.claimed_by = None
+    ticket.lease_expires_at = None
+    ticket.save()
@@ -0,0 +1,121 @@
+import json
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import DurationField, ExpressionWrapper, F, OuterRef, Subquery
+from django.db.models.signals import post_save
+from doctor.models import Consultation, Prescription, PatientDPI
+
+# fields of a doctor's User copied into the DPI rows
+DOCTOR_FIELDS = {'first_name', 'last_name'}
+
+
+def dpi_consultations(patient):
+    """
+    Consultation rows of a patient's DPI.
+
+    The latest prescription status and the stay duration are computed by the
+    database and the doctor is joined, so a page of rows is a single query.
+    """
+    last_prescription = Prescription.objects.filter(consultation=OuterRef('pk')).order_by('-id')
+    return (
+        Consultation.objects.filter(patient=patient)
+        .select_related('doctor__user__user')
+        .annotate(
+            sgph=Subquery(last_prescription.values('status')[:1]),
+            duration=ExpressionWrapper(F('archived_at') - F('created_at'), output_field=DurationField()),
+        )
+    )
+
+
+def serialize_dpi_consultation(consultation):
+    if consultation.archived and consultation.duration is not None:
+        lasted_for = consultation.duration.days
+    else:
+        lasted_for = "-----"
+    doctor = consultation.doctor.user.user
+    return {
+        "consultation_id": consultation.id,
+        "archived": consultation.archived,
+        "date": consultation.created_at,
+        "doctor_name": f"{doctor.first_name} {doctor.last_name}",
+        "lasted_for": lasted_for,
+        "sgph": consultation.sgph or "-----",
+        "reason": consultation.reason,
+        "priority": consultation.priority,
+        "resume": consultation.resume
+    }
+
+
+def _to_json(row):
+    # store exactly what JsonResponse would send, so cached rows sort and compare consistently
+    return json.loads(json.dumps(row, cls=DjangoJSONEncoder))
+
+
+def _sort_rows(rows):
+    rows.sort(key=lambda row: (row['date'], row['consultation_id']), reverse=True)
+
+
+def _needs_rebuild(dpi):
+    # never built, or invalidated by invalidate_doctor_dpis
+    return dpi is None or 'consultations_list' not in dpi.document
+
+
+def rebuild_patient_dpi(patient):
+    """Recompute a patient's whole DPI document and bump its version."""
+    with transaction.atomic():
+        dpi, _ = PatientDPI.objects.select_for_update().get_or_create(patient=patient)
+        rows = [_to_json(serialize_dpi_consultation(c)) for c in dpi_consultations(patient)]
+        _sort_rows(rows)
+        dpi.document = {'consultations_list': rows}
+        dpi.version += 1
+        dpi.save()
+    return dpi
+
+
+def refresh_dpi_consultation(consultation_id):
+    """
+    Recompute the single DPI row of a consultation after it was created,
+    archived, or got a prescription or a result.
+    """
+    consultation = Consultation.objects.get(id=consultation_id)
+    with transaction.atomic():
+        dpi = PatientDPI.objects.select_for_update().filter(patient_id=consultation.patient_id).first()
+        if _needs_rebuild(dpi):
+            return rebuild_patient_dpi(consultation.patient)
+
+        row = _to_json(serialize_dpi_consultation(
+            dpi_consultations(consultation.patient_id).get(id=consultation.id)
+        ))
+        rows = [r for r in dpi.document.get('consultations_list', []) if r['consultation_id'] != consultation.id]
+        rows.append(row)
+        _sort_rows(rows)
+        dpi.document = {'consultations_list': rows}
+        dpi.version += 1
+        dpi.save()
+    return dpi
+
+
+def get_patient_dpi(patient):
+    """Return the materialized DPI of a patient, building it on first access."""
+    dpi = PatientDPI.objects.filter(patient=patient).first()
+    if _needs_rebuild(dpi):
+        dpi = rebuild_patient_dpi(patient)
+    return dpi
+
+
+def invalidate_doctor_dpis(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    `post_save` receiver of `User`: the DPIs listing a consultation of a
+    renamed doctor are emptied and their version bumped with one UPDATE,
+    so their ETags change and they are rebuilt on their next read.
+    """
+    if raw or created or (update_fields is not None and not DOCTOR_FIELDS & set(update_fields)):
+        return
+    PatientDPI.objects.filter(patient__consultation__doctor__user__user=instance).update(
+        document={}, version=F('version') + 1
+    )
+
+
+def connect_dpi_invalidation():
+    post_save.connect(invalidate_doctor_dpis, sender=User, dispatch_uid="dpi_invalidation:auth.User")
@@ -0,0 +1,405 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Case, F, Value, When
+from django.utils.timezone import now
+from doctor.derivatives import store_variants
+from doctor.models import ImageAsset, ImageUpload, MediaDeletion
+from doctor.timeline import ConsultationTimeline
+from doctor.workflow import get_workflow
+from GestionDPI.storage import get_image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# bytes read from the request at a time when receiving a chunk
+_CHUNK_READ_SIZE = 64 * 1024
+
+# upload id -> (bytes hashed, SHA-256 state) of the chunked uploads this
+# process receives; hash states cannot be stored, see `receive_chunk`
+_chunk_digests = {}
+
+
+class UploadOffsetMismatch(Exception):
+    """A chunk does not start where the received bytes of its upload end."""
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_INGEST_WORKERS, thread_name_prefix='image-ingest'
+            )
+        return _executor
+
+
+def stage_file(uploaded_file):
+    """
+    Write an uploaded file to the staging directory chunk by chunk, hashing
+    it on the way; returns its path and SHA-256 hex digest.
+    """
+    path = staging_path(uploaded_file.name)
+    digest = hashlib.sha256()
+    with open(path, 'wb') as staged:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            staged.write(chunk)
+    return path, digest.hexdigest()
+
+
+def _chunk_digest(upload):
+    """
+    SHA-256 state of the bytes received for a chunked upload: the one kept
+    by this process, else (its previous chunks were received by another
+    process, or a restarted one) rebuilt from the staged file once.
+    """
+    received, digest = _chunk_digests.pop(upload.id, (None, None))
+    if received == upload.received:
+        return digest
+    digest = hashlib.sha256()
+    with open(upload.staged_path, 'rb') as staged:
+        remaining = upload.received
+        while remaining > 0:
+            data = staged.read(min(_CHUNK_READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+    return digest
+
+
+def queue_uploads(ticket, worker, uploaded_files):
+    """
+    Stage images for a ticket's result and have them stored together once
+    the current transaction commits. Returns the pending `ImageUpload`s in
+    the order of the files.
+    """
+    uploads = []
+    for uploaded_file in uploaded_files:
+        path, sha256 = stage_file(uploaded_file)
+        uploads.append(ImageUpload(
+            ticket=ticket, worker=worker, file_name=uploaded_file.name[:255], staged_path=path, sha256=sha256
+        ))
+    ImageUpload.objects.bulk_create(uploads)
+    # read the ids back, bulk_create does not return them on MySQL
+    ids = dict(
+        ImageUpload.objects.filter(staged_path__in=[upload.staged_path for upload in uploads])
+        .values_list('staged_path', 'id')
+    )
+    for upload in uploads:
+        upload.id = ids[upload.staged_path]
+    upload_ids = [upload.id for upload in uploads]
+    transaction.on_commit(lambda: schedule(upload_ids))
+    return uploads
+
+
+def queue_upload(ticket, worker, uploaded_file):
+    return queue_uploads(ticket, worker, [uploaded_file])[0]
+
+
+def staging_path(file_name):
+    # private to the server's user, the default root is in the shared temporary directory
+    os.makedirs(settings.IMAGE_UPLOAD_STAGING_ROOT, mode=0o700, exist_ok=True)
+    extension = os.path.splitext(file_name)[1].lower()
+    return os.path.join(settings.IMAGE_UPLOAD_STAGING_ROOT, f"{uuid.uuid4().hex}{extension}")
+
+
+def open_chunked_upload(ticket, worker, file_name, size):
+    """Start receiving a file of `size` bytes in chunks; returns the `Receiving` upload."""
+    path = staging_path(file_name)
+    open(path, 'wb').close()
+    return ImageUpload.objects.create(
+        ticket=ticket, worker=worker, file_name=file_name[:255], staged_path=path,
+        status='Receiving', size=size,
+    )
+
+
+def receive_chunk(upload_id, offset, stream, length):
+    """
+    Append `length` bytes read from `stream` to a `Receiving` upload, at
+    `offset`. The chunk is spooled to its own file first, `_CHUNK_READ_SIZE`
+    bytes at a time, so a slow client neither fills the memory nor holds the
+    upload's row lock; a chunk that does not start where the received bytes
+    end (sent twice, or after a lost one) raises `UploadOffsetMismatch`.
+
+    Chunks arrive in order, so the file is hashed as they are appended and
+    its SHA-256 is stored with the last one. Returns the upload.
+    """
+    upload = ImageUpload.objects.get(id=upload_id)
+    part_path = f"{upload.staged_path}.{uuid.uuid4().hex}.part"
+    try:
+        with open(part_path, 'wb') as part:
+            remaining = length
+            while remaining > 0:
+                data = stream.read(min(_CHUNK_READ_SIZE, remaining))
+                if not data:
+                    raise ValueError(f"chunk ended {remaining} bytes early")
+                part.write(data)
+                remaining -= len(data)
+        with transaction.atomic():
+            upload = ImageUpload.objects.select_for_update().get(id=upload_id)
+            if upload.status != 'Receiving' or upload.received != offset:
+                raise UploadOffsetMismatch(f"expected a chunk at offset {upload.received}")
+            digest = _chunk_digest(upload)
+            with open(part_path, 'rb') as part, open(upload.staged_path, 'r+b') as staged:
+                # a chunk stored by a request whose transaction failed is overwritten
+                staged.seek(offset)
+                for data in iter(lambda: part.read(_CHUNK_READ_SIZE), b''):
+                    digest.update(data)
+                    staged.write(data)
+                staged.truncate()
+            upload.received = offset + length
+            if upload.received == upload.size:
+                upload.sha256 = digest.hexdigest()
+            else:
+                # checked against `received` by the next chunk, in case this transaction fails
+                _chunk_digests[upload.id] = (upload.received, digest)
+            upload.save(update_fields=['received', 'sha256', 'updated_at'])
+    finally:
+        _discard(part_path)
+    return upload
+
+
+def complete_chunked_upload(upload):
+    """Have a fully received upload stored once the current transaction commits."""
+    upload.status = 'Pending'
+    upload.save(update_fields=['status', 'updated_at'])
+    transaction.on_commit(lambda: schedule([upload.id]))
+    return upload
+
+
+def expire_chunked_uploads():
+    """
+    Fail the uploads left `Receiving` for `IMAGE_CHUNKED_UPLOAD_EXPIRY`
+    seconds and discard their files; returns how many expired.
+    """
+    uploads = list(ImageUpload.objects.filter(
+        status='Receiving', updated_at__lt=now() - timedelta(seconds=settings.IMAGE_CHUNKED_UPLOAD_EXPIRY)
+    ))
+    for upload in uploads:
+        _discard(upload.staged_path)
+        _chunk_digests.pop(upload.id, None)
+    ImageUpload.objects.filter(id__in=[upload.id for upload in uploads]).update(
+        status='Failed', error='upload expired before it was completed', updated_at=now()
+    )
+    return len(uploads)
+
+
+def schedule(upload_ids):
+    if settings.IMAGE_INGEST_EAGER:
+        ingest_uploads(upload_ids)
+    else:
+        get_executor().submit(_run, upload_ids)
+
+
+def _run(upload_ids):
+    close_old_connections()
+    try:
+        ingest_uploads(upload_ids)
+    except Exception:
+        logger.exception("Image uploads %s could not be ingested", upload_ids)
+    finally:
+        # pool threads keep their own connections, do not leak them
+        connections.close_all()
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _store(storage, upload):
+    """
+    Push a staged file to the storage backend, retrying with exponential
+    backoff. Returns the stored resource, or None with `upload.error` set
+    once the attempts are exhausted. Runs without touching the database.
+    """
+    folder = get_workflow(upload.ticket.type).type.lower()
+    while True:
+        upload.attempts += 1
+        try:
+            return storage.save(upload.staged_path, folder)
+        except Exception as e:
+            if upload.attempts >= settings.IMAGE_INGEST_ATTEMPTS:
+                upload.error = e.__str__()[:1000]
+                return None
+            time.sleep(settings.IMAGE_INGEST_RETRY_DELAY * 2 ** (upload.attempts - 1))
+
+
+def _content(upload):
+    """What identifies an upload's file: its patient and hash, the upload itself when it has no hash."""
+    return (upload.ticket.consultation.patient_id, upload.sha256) if upload.sha256 else upload.id
+
+
+def _attach(workflow, result, entries):
+    """
+    Add `(upload, (image, variants, asset))` entries to a result, one row
+    per asset: an asset the result already shows is not added again.
+    Returns the image id of each upload and the ids of the assets added.
+    """
+    assets = {asset.id for _, (_, _, asset) in entries if asset is not None}
+    rows = dict(
+        workflow.image_model.objects.filter(**{workflow.result_field: result}, asset_id__in=assets)
+        .values_list('asset_id', 'id')
+    ) if assets else {}
+    new_images, positions = [], {}
+    for upload, image in entries:
+        asset = image[2]
+        position = upload.id if asset is None else ('asset', asset.id)
+        if (asset is None or asset.id not in rows) and position not in positions:
+            positions[position] = len(new_images)
+            new_images.append(image)
+    created = workflow.add_images(result, new_images) if new_images else []
+
+    image_ids = {}
+    for upload, (_, _, asset) in entries:
+        if asset is not None and asset.id in rows:
+            image_ids[upload.id] = rows[asset.id]
+        else:
+            image_ids[upload.id] = created[positions[upload.id if asset is None else ('asset', asset.id)]].id
+    return image_ids, [asset.id for _, _, asset in new_images if asset is not None]
+
+
+def ingest_uploads(upload_ids):
+    """
+    Store pending uploads and attach them to their tickets' results.
+
+    Files are deduplicated per patient by content (see `ImageAsset`): only
+    the first upload of a content the patient has no asset for is sent to
+    the storage backend, the others reuse the asset, and a result already
+    showing an asset is not given it twice. The files are pushed
+    concurrently by at most `IMAGE_BATCH_UPLOAD_WORKERS` threads, each also
+    rendering and storing the file's variants (see doctor.derivatives).
+    Then, in one transaction, the assets are created and locked, each
+    ticket's result is resolved once, the images are bulk inserted, the
+    asset references counted and the uploads marked Stored or Failed with
+    one UPDATE per row batch. An upload whose asset lost its last image
+    meanwhile is scheduled again. Uploads that are no longer pending are
+    left alone, so they can be scheduled twice. Returns the processed
+    uploads.
+    """
+    uploads = list(
+        ImageUpload.objects.select_related('ticket__consultation', 'worker')
+        .filter(id__in=upload_ids, status='Pending')
+        .order_by('id')
+    )
+    if not uploads:
+        return []
+
+    keys = {_content(upload) for upload in uploads if upload.sha256}
+    patients, hashes = {patient for patient, _ in keys}, {sha256 for _, sha256 in keys}
+    known = set(
+        ImageAsset.objects.filter(patient_id__in=patients, sha256__in=hashes).values_list('patient_id', 'sha256')
+    ) if keys else set()
+    originals = {}
+    for upload in uploads:
+        if _content(upload) not in known:
+            originals.setdefault(_content(upload), upload)
+
+    storage = get_image_storage()
+
+    def store(upload):
+        resource = _store(storage, upload)
+        if resource is None:
+            return None
+        return resource, store_variants(storage, upload.staged_path, resource)
+
+    stored = {}
+    if originals:
+        workers = min(settings.IMAGE_BATCH_UPLOAD_WORKERS, len(originals))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-store') as pool:
+            stored = dict(zip(originals, pool.map(store, originals.values())))
+
+    retry, by_ticket, references = [], {}, {}
+    with transaction.atomic():
+        new_assets = [
+            ImageAsset(patient_id=content[0], sha256=content[1], image=outcome[0], variants=outcome[1])
+            for content, outcome in stored.items() if isinstance(content, tuple) and outcome is not None
+        ]
+        if new_assets:
+            # an ingestion storing the same content concurrently may win, its asset is kept
+            ImageAsset.objects.bulk_create(new_assets, ignore_conflicts=True)
+        # locked so that their last image cannot be deleted while they get new ones
+        assets = {
+            (asset.patient_id, asset.sha256): asset
+            for asset in ImageAsset.objects.select_for_update().filter(patient_id__in=patients, sha256__in=hashes)
+        } if keys else {}
+
+        field = ImageAsset._meta.get_field('image')
+        unused = [
+            outcome for content, outcome in stored.items()
+            if isinstance(content, tuple) and outcome is not None and (
+                content not in assets or field.get_prep_value(assets[content].image) != field.get_prep_value(outcome[0])
+            )
+        ]
+        if unused:
+            MediaDeletion.objects.bulk_create([
+                MediaDeletion(image=image)
+                for resource, variants in unused for image in [resource, *variants.values()]
+            ])
+            from doctor.media import schedule_drain  # doctor.media uses the ingestion pool
+            transaction.on_commit(schedule_drain)
+
+        for upload in uploads:
+            content = _content(upload)
+            upload.updated_at = now()
+            if content in assets:
+                asset = assets[content]
+                image = (asset.image, asset.variants, asset)
+            elif stored.get(content) is not None and not isinstance(content, tuple):
+                image = (*stored[content], None)
+            elif content in stored and stored[content] is None:
+                # this file, or the first one with its content, could not be stored
+                upload.status = 'Failed'
+                upload.error = originals[content].error
+                continue
+            else:
+                # its asset lost its last image meanwhile
+                retry.append(upload)
+                continue
+            by_ticket.setdefault(upload.ticket_id, []).append((upload, image))
+
+        for entries in by_ticket.values():
+            ticket, worker = entries[0][0].ticket, entries[0][0].worker
+            workflow = get_workflow(ticket.type)
+            result = workflow.result_of(ticket, worker)
+            image_ids, added = _attach(workflow, result, entries)
+            for upload, _ in entries:
+                upload.status = 'Stored'
+                upload.image_id = image_ids[upload.id]
+                upload.error = None
+            for asset_id in added:
+                references[asset_id] = references.get(asset_id, 0) + 1
+        if references:
+            ImageAsset.objects.filter(id__in=references).update(references=F('references') + Case(
+                *[When(id=asset_id, then=Value(count)) for asset_id, count in references.items()],
+                default=Value(0),
+            ))
+        ImageUpload.objects.bulk_update(uploads, ['status', 'attempts', 'image_id', 'error', 'updated_at'])
+
+    processed = [upload for upload in uploads if upload not in retry]
+    for upload in processed:
+        _discard(upload.staged_path)
+    for consultation_id in sorted({upload.ticket.consultation_id for upload in processed}):
+        ConsultationTimeline.invalidate(consultation_id)
+    if retry:
+        schedule([upload.id for upload in retry])
+    return processed
+
+
+def ingest_upload(upload_id):
+    """Store one pending upload; None when it is not pending."""
+    uploads = ingest_uploads([upload_id])
+    return uploads[0] if uploads else None
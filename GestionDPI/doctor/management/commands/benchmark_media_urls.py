@@ -0,0 +1,39 @@
+import timeit
+from cloudinary import CloudinaryResource
+from django.core.management.base import BaseCommand
+from GestionDPI.storage import _cloudinary_url, media_url
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the profile image URLs of a list response built with `image.url` and with "
+        "the memoized `media_url` (no database needed)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="rows of the simulated response")
+        parser.add_argument('--avatars', type=int, default=20, help="distinct images among the rows")
+        parser.add_argument('--repeat', type=int, default=20, help="responses timed")
+
+    def handle(self, *args, **options):
+        rows, avatars, repeat = options['rows'], max(options['avatars'], 1), options['repeat']
+        # mostly the shared default avatar, as in the worker and patient lists
+        images = [
+            CloudinaryResource('default_user', type='upload', resource_type='image') if i % 2 == 0
+            else CloudinaryResource(f'users/avatar{i % avatars}', format='jpg', version=1700000000, resource_type='image')
+            for i in range(rows)
+        ]
+        _cloudinary_url.cache_clear()
+
+        def uncached():
+            return [image.url for image in images]
+
+        def memoized():
+            return [media_url(image) for image in images]
+
+        assert uncached() == memoized()
+        for name, build in (('image.url', uncached), ('media_url', memoized)):
+            seconds = min(timeit.repeat(build, number=1, repeat=repeat))
+            self.stdout.write(f"{name:<10} {seconds * 1e6 / rows:8.2f} us/row  {seconds * 1e3:8.2f} ms/response")
+        info = _cloudinary_url.cache_info()
+        self.stdout.write(self.style.SUCCESS(f"{info.hits} hits, {info.misses} misses over {rows} rows x {repeat + 1} responses"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from doctor.media import drain_media_deletions
+
+
+class Command(BaseCommand):
+    help = "Delete the images queued in the media deletion outbox from the storage backend (run it periodically to retry failures)"
+
+    def handle(self, *args, **options):
+        deleted, failed = drain_media_deletions()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} images, {failed} to retry"))
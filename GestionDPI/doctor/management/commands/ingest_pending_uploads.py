@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from doctor.ingest import expire_chunked_uploads, ingest_upload
+from doctor.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the result images left pending by a stopped server and expire stale chunked "
+        "uploads (run it before the server starts again)"
+    )
+
+    def handle(self, *args, **options):
+        statuses = {'Stored': 0, 'Failed': 0}
+        for upload_id in ImageUpload.objects.filter(status='Pending').order_by('id').values_list('id', flat=True):
+            upload = ingest_upload(upload_id)
+            if upload is not None:
+                statuses[upload.status] += 1
+        expired = expire_chunked_uploads()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {statuses['Stored']} images, {statuses['Failed']} failed, {expired} unfinished uploads expired"
+        ))
@@ -0,0 +1,157 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.utils.timezone import now
+from doctor.ingest import get_executor
+from doctor.models import ImageAsset, MediaDeletion
+from doctor.workflow import WORKFLOWS
+from GestionDPI.storage import storage_for
+from users.models import AppUser
+
+logger = logging.getLogger(__name__)
+
+_drain_scheduled = False
+_drain_lock = threading.Lock()
+# (timer, due time) of the next drain retrying failed deletions
+_retry = None
+
+
+def record_media_deletion(sender, instance, **kwargs):
+    """
+    `post_delete` receiver of the models holding stored images: queue the
+    image for deletion in the transaction deleting the row, cascades
+    included, so the outbox never misses an image nor deletes one whose
+    row is kept by a rollback. An image sharing an `ImageAsset` releases it
+    instead, and the asset's files go with its last image.
+    """
+    if getattr(instance, 'asset_id', None) is not None:
+        release_image_asset(instance.asset_id)
+        return
+    field = sender._meta.get_field('image')
+    image = field.to_python(instance.image)
+    if not image:
+        return
+    default = field.get_default()
+    # shared default images belong to nobody
+    if default and image.public_id == field.to_python(default).public_id:
+        return
+    variants = getattr(instance, 'variants', None) or {}
+    # a cascade deleting an asset reaches it through its images too
+    MediaDeletion.objects.bulk_create(
+        [MediaDeletion(image=image)] + [MediaDeletion(image=variant) for variant in variants.values()],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(schedule_drain)
+
+
+def release_image_asset(asset_id):
+    """Drop a reference to an asset, deleting it with its last one."""
+    # the UPDATE locks the asset, an ingestion reusing it waits for this transaction
+    ImageAsset.objects.filter(id=asset_id, references__gt=0).update(references=F('references') - 1)
+    ImageAsset.objects.filter(id=asset_id, references=0).delete()
+
+
+def connect_media_deletions():
+    models = [workflow.image_model for workflow in WORKFLOWS.values() if workflow.has_images]
+    for model in [*models, ImageAsset, AppUser]:
+        post_delete.connect(
+            record_media_deletion, sender=model, dispatch_uid=f"media_deletion:{model._meta.label}"
+        )
+
+
+def schedule_drain():
+    """Drain the outbox in the background, once however many deletions were queued."""
+    global _drain_scheduled
+    if settings.MEDIA_DELETION_EAGER:
+        drain_media_deletions()
+        return
+    with _drain_lock:
+        if _drain_scheduled:
+            return
+        _drain_scheduled = True
+    get_executor().submit(_run)
+
+
+def _run():
+    global _drain_scheduled
+    with _drain_lock:
+        _drain_scheduled = False
+    close_old_connections()
+    try:
+        _, failed = drain_media_deletions()
+        if failed:
+            schedule_retry()
+    except Exception:
+        logger.exception("Media deletions could not be drained")
+    finally:
+        connections.close_all()
+
+
+def schedule_retry():
+    """
+    Drain again when the earliest failed deletion is due. The timer lives in
+    this process; the `drain_media_deletions` command catches up on the
+    retries of a stopped server.
+    """
+    global _retry
+    due = MediaDeletion.objects.filter(
+        attempts__gt=0, attempts__lt=settings.MEDIA_DELETION_ATTEMPTS
+    ).order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+    if due is None:
+        return
+    with _drain_lock:
+        if _retry is not None and _retry[0].is_alive() and _retry[1] <= due:
+            return
+        if _retry is not None:
+            _retry[0].cancel()
+        timer = threading.Timer(max((due - now()).total_seconds(), 0), schedule_drain)
+        timer.daemon = True
+        _retry = (timer, due)
+    timer.start()
+
+
+def drain_media_deletions():
+    """
+    Delete the due images of the outbox from the backends holding them, in batches
+    of `MEDIA_DELETION_BATCH_SIZE`. A failed batch is retried after
+    `MEDIA_DELETION_RETRY_DELAY` seconds, doubled on each attempt, and left
+    in the outbox for inspection after `MEDIA_DELETION_ATTEMPTS` attempts.
+    Concurrent drainers skip each other's batches where the database
+    supports it. Returns the number of deleted and failed images.
+    """
+    deleted = failed = 0
+    while True:
+        with transaction.atomic():
+            due = MediaDeletion.objects.filter(
+                attempts__lt=settings.MEDIA_DELETION_ATTEMPTS, next_attempt_at__lte=now()
+            ).order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            batch = list(due[:settings.MEDIA_DELETION_BATCH_SIZE])
+            if not batch:
+                break
+            by_storage = {}
+            for deletion in batch:
+                by_storage.setdefault(storage_for(deletion.image), []).append(deletion.image)
+            try:
+                for storage, images in by_storage.items():
+                    storage.delete_many(images)
+            except Exception as e:
+                current = now()
+                for deletion in batch:
+                    deletion.attempts += 1
+                    deletion.next_attempt_at = current + timedelta(
+                        seconds=settings.MEDIA_DELETION_RETRY_DELAY * 2 ** (deletion.attempts - 1)
+                    )
+                    deletion.last_error = e.__str__()[:1000]
+                MediaDeletion.objects.bulk_update(batch, ['attempts', 'next_attempt_at', 'last_error'])
+                failed += len(batch)
+                # the backend is failing, the next run picks the batch up again
+                break
+            MediaDeletion.objects.filter(id__in=[deletion.id for deletion in batch]).delete()
+            deleted += len(batch)
+    return deleted, failed
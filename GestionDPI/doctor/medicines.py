@@ -0,0 +1,141 @@
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from doctor.models import Medicine
+
+CACHE_PREFIX = 'medicine_id:'
+
+
+def medicine_key(name):
+    """Catalog key of a medicine name: trimmed, single-spaced, lowercase."""
+    return Medicine.normalize_name(name)
+
+
+def resolve_medicine_ids(names):
+    """
+    Map medicine names to catalog ids, creating the missing catalog rows.
+
+    Ids come from the cache first; the remaining names cost one lookup query
+    and, if some are new, one bulk insert and one re-read. Returns
+    `{medicine_key(name): id}`.
+    """
+    display = {}
+    for name in names:
+        display.setdefault(medicine_key(name), ' '.join(name.split())[:100])
+
+    cached = cache.get_many([CACHE_PREFIX + key for key in display])
+    ids = {key[len(CACHE_PREFIX):]: medicine_id for key, medicine_id in cached.items()}
+
+    missing = [key for key in display if key not in ids]
+    if not missing:
+        return ids
+    found = list(Medicine.objects.filter(key__in=missing).values_list('key', 'id', 'name'))
+
+    new = [key for key in missing if key not in {key for key, _, _ in found}]
+    created = []
+    if new:
+        # a concurrent request may insert the same medicine, keep whichever row wins
+        Medicine.objects.bulk_create([Medicine(key=key, name=display[key]) for key in new], ignore_conflicts=True)
+        created = list(Medicine.objects.filter(key__in=new).values_list('key', 'id', 'name'))
+    ids.update((key, medicine_id) for key, medicine_id, _ in found + created)
+
+    def publish():
+        cache.set_many(
+            {CACHE_PREFIX + key: medicine_id for key, medicine_id, _ in found + created},
+            settings.MEDICINE_ID_CACHE_TIMEOUT,
+        )
+        medicine_index.add((medicine_id, name) for _, medicine_id, name in created)
+    # the rows read or created here may belong to the caller's transaction and
+    # vanish with it, so they are only cached once it commits
+    transaction.on_commit(publish)
+    return ids
+
+
+class MedicineIndex:
+    """
+    In-process prefix index over the medicine catalog, for autocompletion.
+
+    Every word of every medicine name is kept in a sorted array of
+    `(word_suffix, name, id, first_word)` entries, so a query is a binary
+    search plus a short scan and never touches the database. The catalog is loaded on the
+    first search; afterwards, at most every `MEDICINE_INDEX_REFRESH_INTERVAL`
+    seconds, the medicines above the highest id read from the database, less
+    `MEDICINE_INDEX_RESCAN_IDS`, are fetched, which also picks up rows whose
+    lower id was committed late. Medicines created by this process are added
+    right away, without moving that watermark.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._entries = []
+            self._ids = set()
+            self._max_id = 0
+            self._loaded = False
+            self._refreshed_at = 0.0
+
+    @staticmethod
+    def _entries_of(medicine_id, name):
+        # "acide acetylsalicylique" is found by "aci" and by "acet"
+        key = medicine_key(name)
+        words = key.split(' ')
+        return [(' '.join(words[i:]), name, medicine_id, i == 0) for i in range(len(words))]
+
+    def _insert(self, medicines):
+        """Copy-on-write insert, so searches keep reading a consistent array."""
+        entries = []
+        for medicine_id, name in medicines:
+            if medicine_id not in self._ids:
+                self._ids.add(medicine_id)
+                entries.extend(self._entries_of(medicine_id, name))
+        if entries:
+            self._entries = sorted(self._entries + entries)
+
+    def add(self, medicines):
+        """Index `(id, name)` pairs of newly created medicines."""
+        with self._lock:
+            if self._loaded:
+                self._insert(medicines)
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and self._loaded and time.monotonic() - self._refreshed_at < settings.MEDICINE_INDEX_REFRESH_INTERVAL:
+                return
+            medicines = list(Medicine.objects.filter(
+                id__gt=self._max_id - settings.MEDICINE_INDEX_RESCAN_IDS
+            ).values_list('id', 'name'))
+            self._insert(medicines)
+            self._max_id = max([self._max_id] + [medicine_id for medicine_id, _ in medicines])
+            self._loaded = True
+            self._refreshed_at = time.monotonic()
+
+    def search(self, query, limit=10):
+        """
+        Medicines with a word starting with `query`, as `[(id, name)]`; names
+        starting with the query come first, then alphabetical order.
+        """
+        prefix = medicine_key(query)
+        if not prefix:
+            return []
+        self.refresh()
+
+        entries = self._entries
+        matches = {}
+        for i in range(bisect_left(entries, (prefix,)), len(entries)):
+            term, name, medicine_id, first_word = entries[i]
+            if not term.startswith(prefix):
+                break
+            rank = 0 if first_word else 1
+            if medicine_id not in matches or rank < matches[medicine_id][0]:
+                matches[medicine_id] = (rank, name.lower(), medicine_id, name)
+        ranked = sorted(matches.values())
+        return [(medicine_id, name) for _, _, medicine_id, name in ranked[:limit]]
+
+
+medicine_index = MedicineIndex()
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:33
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0012_labresult_created_at_nursingresult_created_at_and_more'),
+        ('users', '0008_appuser_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientDPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('document', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='users.patient')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def deduplicate_medicines(apps, schema_editor):
+    Medicine = apps.get_model('doctor', 'Medicine')
+    PrescriptionDetail = apps.get_model('doctor', 'PrescriptionDetail')
+
+    canonical = {}
+    for medicine in Medicine.objects.order_by('id'):
+        key = ' '.join(medicine.name.split()).lower()
+        if key in canonical:
+            PrescriptionDetail.objects.filter(medicine_id=medicine.id).update(medicine_id=canonical[key])
+            medicine.delete()
+        else:
+            canonical[key] = medicine.id
+            medicine.key = key
+            medicine.save(update_fields=['key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0013_patientdpi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='key',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.RunPython(deduplicate_medicines, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='medicine',
+            name='key',
+            field=models.CharField(editable=False, max_length=100, unique=True),
+        ),
+    ]
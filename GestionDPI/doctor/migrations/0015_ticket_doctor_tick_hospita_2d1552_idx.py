@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0014_medicine_key'),
+        ('users', '0009_patientsearchterm_patientsearchtrigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['hospital', 'type', 'status', 'priority', 'created_at'], name='doctor_tick_hospita_2d1552_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0015_ticket_doctor_tick_hospita_2d1552_idx'),
+        ('users', '0009_patientsearchterm_patientsearchtrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_tickets', to='users.worker'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
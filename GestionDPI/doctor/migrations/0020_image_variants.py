@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0019_mediadeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='radioimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0020_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='received',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='status',
+            field=models.CharField(choices=[('Receiving', 'Receiving'), ('Pending', 'Pending'), ('Stored', 'Stored'), ('Failed', 'Failed')], default='Pending', max_length=10),
+        ),
+    ]
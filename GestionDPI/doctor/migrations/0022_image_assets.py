@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:28
+
+import cloudinary.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0021_chunked_uploads'),
+        ('users', '0009_patientsearchterm_patientsearchtrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('image', cloudinary.models.CloudinaryField(max_length=255, verbose_name='image')),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.patient')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='labimage',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='doctor.imageasset'),
+        ),
+        migrations.AddField(
+            model_name='radioimage',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='doctor.imageasset'),
+        ),
+        migrations.AddConstraint(
+            model_name='imageasset',
+            constraint=models.UniqueConstraint(fields=('patient', 'sha256'), name='unique_patient_image_content'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+def rank_priorities(apps, schema_editor):
+    Ticket = apps.get_model('doctor', 'Ticket')
+    # Low tickets keep the default rank
+    Ticket.objects.filter(priority='Critical').update(priority_rank=0)
+    Ticket.objects.filter(priority='Medium').update(priority_rank=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0022_image_assets'),
+        ('users', '0009_patientsearchterm_patientsearchtrigram'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='doctor_tick_hospita_2d1552_idx',
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.RunPython(rank_priorities, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['hospital', 'type', 'status', 'priority_rank', 'created_at'], name='doctor_tick_hospita_e02476_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:10
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def schedule_dispatch(apps, schema_editor):
+    Ticket = apps.get_model('doctor', 'Ticket')
+    for rank in (0, 1, 2):
+        Ticket.objects.filter(priority_rank=rank).update(
+            dispatch_at=F('created_at') + timedelta(seconds=settings.TICKET_AGING_SECONDS * rank)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0023_ticket_priority_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='dispatch_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(schedule_dispatch, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ticket',
+            name='dispatch_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['hospital', 'type', 'status', 'dispatch_at'], name='doctor_tick_hospita_1e2de8_idx'),
+        ),
+    ]
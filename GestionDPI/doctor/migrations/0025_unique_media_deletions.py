@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:20
+
+import cloudinary.models
+from django.db import migrations
+from django.db.models import Min
+
+
+def drop_duplicate_deletions(apps, schema_editor):
+    MediaDeletion = apps.get_model('doctor', 'MediaDeletion')
+    first = MediaDeletion.objects.values('image').annotate(first=Min('id')).values_list('first', flat=True)
+    MediaDeletion.objects.exclude(id__in=list(first)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0024_ticket_dispatch_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_deletions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='mediadeletion',
+            name='image',
+            field=cloudinary.models.CloudinaryField(max_length=255, unique=True, verbose_name='image'),
+        ),
+    ]
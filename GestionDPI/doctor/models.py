@@ -1,8 +1,11 @@
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
 from users.models import Patient,Worker,Hospital
 from cloudinary.models import CloudinaryField
 from django.core.exceptions import ValidationError
 from django.utils.timezone import now
+from django.core.serializers.json import DjangoJSONEncoder
 # Create your models here.
 # Consultation Model
 class Consultation(models.Model):
@@ -33,6 +36,16 @@ class Consultation(models.Model):
 
 class Medicine(models.Model):
     name = models.CharField(max_length=100)
+    # normalized name (see doctor.medicines.medicine_key), one catalog row per medicine
+    key = models.CharField(max_length=100, unique=True, editable=False)
+
+    @staticmethod
+    def normalize_name(name):
+        return ' '.join((name or '').split()).lower()[:100]
+
+    def save(self, *args, **kwargs):
+        self.key = self.normalize_name(self.name)
+        super().save(*args, **kwargs)
 
 
 class Prescription(models.Model):
@@ -76,6 +89,8 @@ class Ticket(models.Model):
         ('Medium', 'Medium'),
         ('Critical', 'Critical')
     ]
+    # rank of a priority in the queues, most urgent first
+    PRIORITY_RANKS = {'Critical': 0, 'Medium': 1, 'Low': 2}
     STATUS_CHOICES = [
         ('Open', 'Open'),
         ('Closed', 'Closed')
@@ -84,8 +99,25 @@ class Ticket(models.Model):
     title = models.CharField(max_length=50)
     description = models.TextField(max_length=255)
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES)
+    # PRIORITY_RANKS[priority], set on save so that an index can order the queues
+    priority_rank = models.PositiveSmallIntegerField(default=2, editable=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default= 'Open')
     created_at = models.DateTimeField(auto_now_add=True)
+    # created_at delayed by TICKET_AGING_SECONDS per priority rank, set on save
+    # so that an index can order the claims, see doctor.dispatch
+    dispatch_at = models.DateTimeField(editable=False)
+    # lease of the worker currently handling the ticket, see doctor.dispatch
+    claimed_by = models.ForeignKey(Worker, on_delete=models.SET_NULL, blank=True, null=True, related_name='claimed_tickets')
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    class Meta:
+        # open ticket queues, see doctor.tickets
+        indexes = [
+            models.Index(fields=['hospital', 'type', 'status', 'priority_rank', 'created_at']),
+            # claims, see doctor.dispatch
+            models.Index(fields=['hospital', 'type', 'status', 'dispatch_at']),
+            # ticket histories walked by cursor
+            models.Index(fields=['hospital', 'type', 'status', 'created_at']),
+        ]
     def clean(self):
         if self.type not in dict(self.TYPE_CHOICES)  :
             raise ValidationError({'type': f"{self.type} is not a valid choice."})
@@ -94,7 +126,13 @@ class Ticket(models.Model):
         if  self.status not in dict(self.STATUS_CHOICES):
             raise ValidationError({'status': f"{self.status} is not a valid choice."})
     def save(self, *args, **kwargs):
+        if self.created_at is None:
+            self.created_at = now()
+        self.dispatch_at = self.created_at + timedelta(
+            seconds=settings.TICKET_AGING_SECONDS * self.PRIORITY_RANKS.get(self.priority, 2)
+        )
         self.full_clean() 
+        self.priority_rank = self.PRIORITY_RANKS[self.priority]
         super().save(*args, **kwargs)
     
     
@@ -104,7 +142,11 @@ class LabResult(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 class LabImage(models.Model):
     labresult = models.ForeignKey(LabResult, on_delete=models.CASCADE)
-    image = CloudinaryField('image')  
+    image = CloudinaryField('image')
+    # derivative name -> stored image, see doctor.derivatives
+    variants = models.JSONField(default=dict, blank=True)
+    # stored file shared with the same patient's identical images, None for older images
+    asset = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, blank=True, null=True)
     
 class LabObservation(models.Model):
     labresult = models.ForeignKey(LabResult, on_delete=models.CASCADE)
@@ -118,7 +160,11 @@ class RadioResult(models.Model):
   
 class RadioImage(models.Model):
     radioresult = models.ForeignKey(RadioResult, on_delete=models.CASCADE)
-    image = CloudinaryField('image')    
+    image = CloudinaryField('image')
+    # derivative name -> stored image, see doctor.derivatives
+    variants = models.JSONField(default=dict, blank=True)
+    # stored file shared with the same patient's identical images, None for older images
+    asset = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, blank=True, null=True)
     
 class RadioObservation(models.Model):
     radioresult = models.ForeignKey(RadioResult, on_delete=models.CASCADE)
@@ -134,3 +180,65 @@ class NursingObservation(models.Model):
     title = models.CharField(max_length=80)  
     notes = models.TextField(max_length=255, blank=True,null=True)  
     
+
+class ImageUpload(models.Model):
+    """An image received for a ticket's result, stored in the background by doctor.ingest"""
+    STATUS_CHOICES = [
+        ('Receiving', 'Receiving'),
+        ('Pending', 'Pending'),
+        ('Stored', 'Stored'),
+        ('Failed', 'Failed')
+    ]
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE)
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    staged_path = models.CharField(max_length=255)
+    # hex digest of the content, computed while it is staged
+    sha256 = models.CharField(max_length=64, blank=True, null=True)
+    # announced and received bytes of a file sent in chunks while it is Receiving
+    size = models.PositiveBigIntegerField(blank=True, null=True)
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # id of the LabImage/RadioImage created once stored, per the ticket type
+    image_id = models.PositiveIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ImageAsset(models.Model):
+    """
+    A stored image file with its variants, shared by the result images of a
+    patient having the same content (doctor.ingest); its files are deleted
+    with the last image referencing it (doctor.media)
+    """
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    sha256 = models.CharField(max_length=64)
+    image = CloudinaryField('image')
+    variants = models.JSONField(default=dict, blank=True)
+    # LabImage/RadioImage rows using the asset
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['patient', 'sha256'], name='unique_patient_image_content')]
+
+
+class MediaDeletion(models.Model):
+    """A stored image whose row was deleted, removed from the storage backend by doctor.media"""
+    # queued once however many deleted rows shared the file
+    image = CloudinaryField('image', unique=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [models.Index(fields=['attempts', 'next_attempt_at'])]
+
+
+class PatientDPI(models.Model):
+    """Materialized DPI consultation history of a patient, kept up to date by doctor.dpi"""
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE)
+    version = models.PositiveIntegerField(default=0)
+    document = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
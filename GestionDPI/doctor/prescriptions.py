@@ -0,0 +1,132 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import textwrap
+from datetime import date
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from PIL import Image, ImageDraw, ImageFont
+from doctor.models import Prescription, PrescriptionDetail
+
+RENDER_FORMATS = {
+    'pdf': ('PDF', 'application/pdf'),
+    'png': ('PNG', 'image/png'),
+}
+
+# A4 at 150 dpi
+PAGE_SIZE = (1240, 1754)
+MARGIN = 90
+LINE_WIDTH = 70
+
+
+def prescriptions_for_print():
+    """
+    Prescriptions with everything printed on them: the consultation, patient,
+    doctor and hospital are joined and the detail lines are prefetched with
+    their medicine, so a prescription is loaded in two queries.
+    """
+    return Prescription.objects.select_related(
+        'consultation__patient__user__user',
+        'consultation__patient__user__hospital',
+        'consultation__doctor__user__user',
+    ).prefetch_related(
+        Prefetch(
+            'prescriptiondetail_set',
+            queryset=PrescriptionDetail.objects.select_related('medicine').order_by('id'),
+        )
+    )
+
+
+def prescription_document(prescription):
+    """Printable content of a prescription loaded with `prescriptions_for_print`."""
+    consultation = prescription.consultation
+    patient = consultation.patient.user
+    doctor = consultation.doctor
+    return {
+        "prescription_id": prescription.id,
+        "hospital_name": patient.hospital.name,
+        "doctor_name": f"{doctor.user.user.first_name} {doctor.user.user.last_name}",
+        "speciality": doctor.speciality,
+        "patient_name": f"{patient.user.first_name} {patient.user.last_name}",
+        "age": date.today().year - patient.date_of_birth.year,
+        "gender": patient.gender,
+        "date": prescription.created_at,
+        "medications": [
+            f"- {detail.medicine.name} {detail.dosage} {detail.frequency} for {detail.duration} {detail.instructions}"
+            for detail in prescription.prescriptiondetail_set.all()
+        ],
+        "notes": prescription.notes,
+    }
+
+
+def content_hash(document):
+    raw = json.dumps(document, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _draw(document):
+    page = Image.new('RGB', PAGE_SIZE, 'white')
+    draw = ImageDraw.Draw(page)
+    title = ImageFont.load_default(size=44)
+    body = ImageFont.load_default(size=28)
+
+    y = MARGIN
+    def write(text, font=body, gap=12):
+        nonlocal y
+        for line in textwrap.wrap(text, LINE_WIDTH) or ['']:
+            draw.text((MARGIN, y), line, fill='black', font=font)
+            y += font.size + gap
+
+    write(document['hospital_name'], title, gap=30)
+    write(f"Dr. {document['doctor_name']} - {document['speciality']}")
+    write(f"Date: {document['date']:%Y-%m-%d}", gap=40)
+    write(f"Patient: {document['patient_name']}")
+    write(f"Age: {document['age']}    Gender: {document['gender']}", gap=40)
+    draw.line((MARGIN, y, PAGE_SIZE[0] - MARGIN, y), fill='black', width=2)
+    y += 30
+    for medication in document['medications']:
+        write(medication)
+    if document['notes']:
+        y += 30
+        write(f"Notes: {document['notes']}")
+    return page
+
+
+def render_prescription(prescription, fmt='pdf'):
+    """
+    Rendered prescription opened for reading, drawn only when its content changed.
+
+    Renders are stored as `<PRESCRIPTION_RENDER_ROOT>/<id>-<content hash>.<fmt>`,
+    so a reprint is a file read and any change of the printed content (a new
+    detail line, a renamed patient...) gives a new file; older renders of the
+    prescription are removed. The file is opened before a concurrent render
+    of newer content can remove it, the caller reads it through the handle.
+    """
+    pil_format, _ = RENDER_FORMATS[fmt]
+    document = prescription_document(prescription)
+    root = settings.PRESCRIPTION_RENDER_ROOT
+    path = os.path.join(root, f"{prescription.id}-{content_hash(document)}.{fmt}")
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        pass
+
+    # private to the server's user, the default root is in the shared temporary directory
+    os.makedirs(root, mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=root, suffix=f'.{fmt}.tmp')
+    with os.fdopen(fd, 'wb') as tmp:
+        _draw(document).save(tmp, format=pil_format, resolution=150)
+    rendered = open(tmp_path, 'rb')
+    # atomic, so concurrent reprints never read a partial file
+    os.replace(tmp_path, path)
+
+    for old in glob.glob(os.path.join(root, f"{prescription.id}-*.{fmt}")):
+        if old != path:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+    return rendered
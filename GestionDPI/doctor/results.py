@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from doctor.dispatch import check_lease
+from doctor.dpi import refresh_dpi_consultation
+from doctor.models import LabObservation, Ticket
+from doctor.timeline import ConsultationTimeline
+from doctor.workflow import get_workflow
+from GestionDPI.events import publish_ticket_event
+
+TITLE_MAX_LENGTH = LabObservation._meta.get_field('title').max_length
+
+
+def parse_observations(data):
+    """
+    Validate a batch of `{"ticket_id", "title", "notes"}` observations.
+    Raises ValueError with a message for the client.
+    """
+    if not isinstance(data, list) or not data:
+        raise ValueError("observations must be a non-empty list")
+    if len(data) > settings.RESULT_BATCH_MAX_OBSERVATIONS:
+        raise ValueError(f"at most {settings.RESULT_BATCH_MAX_OBSERVATIONS} observations per batch")
+    observations = []
+    for i, item in enumerate(data):
+        if not isinstance(item, dict) or not isinstance(item.get("ticket_id"), int) or not isinstance(item.get("title"), str):
+            raise ValueError(f"observation {i} needs an integer ticket_id and a title")
+        if len(item["title"]) > TITLE_MAX_LENGTH:
+            raise ValueError(f"observation {i} title is longer than {TITLE_MAX_LENGTH} characters")
+        notes = item.get("notes")
+        if notes is not None and not isinstance(notes, str):
+            raise ValueError(f"observation {i} notes must be a string")
+        observations.append((item["ticket_id"], item["title"], notes))
+    return observations
+
+
+def submit_results(worker, type, observations):
+    """
+    Record a batch of observations on tickets of a type and close them.
+
+    Everything happens in one transaction and a fixed number of queries
+    whatever the batch size: the tickets are locked in one query (in id
+    order, so concurrent batches cannot deadlock), missing result rows are
+    bulk inserted and read back, the observations are bulk inserted and the
+    tickets closed with one UPDATE. Raises `Ticket.DoesNotExist` if a ticket
+    is not of this type or not in the worker's hospital, and `TicketLeased`
+    if another worker holds a lease on one. Returns the closed ticket ids.
+    """
+    workflow = get_workflow(type)
+    result_model, worker_field = workflow.result_model, workflow.worker_field
+    observation_model, result_field = workflow.observation_model, workflow.result_field
+    ticket_ids = sorted({ticket_id for ticket_id, _, _ in observations})
+
+    with transaction.atomic():
+        tickets = list(
+            Ticket.objects.select_for_update()
+            .filter(id__in=ticket_ids, hospital_id=worker.user.hospital_id, type=type)
+            .order_by('id')
+        )
+        missing = set(ticket_ids) - {ticket.id for ticket in tickets}
+        if missing:
+            raise Ticket.DoesNotExist(f"No {type} ticket {', '.join(map(str, sorted(missing)))} in this hospital")
+        current = now()
+        for ticket in tickets:
+            check_lease(ticket, worker, current)
+
+        results = dict(result_model.objects.filter(ticket_id__in=ticket_ids).values_list('ticket_id', 'id'))
+        new = [ticket_id for ticket_id in ticket_ids if ticket_id not in results]
+        if new:
+            # the tickets are locked, so no concurrent request can insert these results
+            result_model.objects.bulk_create([
+                result_model(ticket_id=ticket_id, **{worker_field: worker}) for ticket_id in new
+            ])
+            # read the ids back, bulk_create does not return them on MySQL
+            results.update(result_model.objects.filter(ticket_id__in=new).values_list('ticket_id', 'id'))
+
+        observation_model.objects.bulk_create([
+            observation_model(title=title, notes=notes, **{f'{result_field}_id': results[ticket_id]})
+            for ticket_id, title, notes in observations
+        ])
+        Ticket.objects.filter(id__in=ticket_ids).update(status='Closed', claimed_by=None, lease_expires_at=None)
+
+        for ticket in tickets:
+            ticket.status = 'Closed'
+            publish_ticket_event('ticket_closed', ticket)
+
+    for consultation_id in sorted({ticket.consultation_id for ticket in tickets}):
+        ConsultationTimeline.invalidate(consultation_id)
+        refresh_dpi_consultation(consultation_id)
+    return ticket_ids
@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import *
 from users.serializers import WorkerSerializer, PatientSerializer
 from rest_flex_fields import FlexFieldsModelSerializer
+from doctor.derivatives import variant_urls
+from GestionDPI.serializers import MediaUrlField
 
 
 class ConsultationSerializer(FlexFieldsModelSerializer):
@@ -58,6 +60,13 @@ class TicketSerializer(FlexFieldsModelSerializer):
         expandable_fields = {"consultation": ConsultationSerializer, "labresult": LabResultSerializer}
         
     def get_worker(self, obj):
+        # precomputed for whole pages by doctor.tickets.resolve_ticket_workers
+        workers = self.context.get('workers')
+        if workers is not None:
+            worker = workers.get(obj.id) if obj.status == 'Closed' else None
+            if worker is None:
+                return None
+            return WorkerSerializer(worker, fields=['id', 'user.id', 'user.user', 'user.role'], expand= ['user.user']).data
         if obj.status == 'Closed':
             if obj.type== 'Lab' and hasattr(obj, 'labresult') and obj.labresult is not None:
                 return WorkerSerializer(obj.labresult.labtechnician, fields=['id', 'user.id', 'user.user', 'user.role'], expand= ['user.user']).data
@@ -79,13 +88,21 @@ class LabObservationSerializer(FlexFieldsModelSerializer):
         ]
 
 class LabImageSerializer(FlexFieldsModelSerializer):
+
+    image = MediaUrlField()
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = LabImage
         fields = [
             "id",
-            "image"
+            "image",
+            "variants"
         ]
 
+    def get_variants(self, obj):
+        return variant_urls(obj)
+
 class RadioObservationSerializer(FlexFieldsModelSerializer):
     class Meta:
         model = RadioObservation
@@ -96,16 +113,24 @@ class RadioObservationSerializer(FlexFieldsModelSerializer):
         ]
 
 class RadioImageSerializer(FlexFieldsModelSerializer):
+
+    image = MediaUrlField()
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = RadioImage
         fields = [
             "id",
-            "image"
+            "image",
+            "variants"
         ]
+
+    def get_variants(self, obj):
+        return variant_urls(obj)
         
 class NursingObservationSerializer(FlexFieldsModelSerializer):
     class Meta:
-        model = RadioObservation
+        model = NursingObservation
         fields = [
             "id",
             "title",
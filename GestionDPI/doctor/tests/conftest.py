@@ -1,12 +1,21 @@
 import pytest
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from datetime import datetime
 from django.utils.timezone import make_aware
 from users.models import AppUser, Patient, Worker
-from doctor.models import Consultation, Hospital
-import os
-from django.conf import settings
+from doctor.models import Consultation, Hospital, Ticket
+from django.core.cache import cache
+from doctor.medicines import medicine_index
+from GestionDPI.storage import get_image_storage
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache and medicine index"""
+    cache.clear()
+    medicine_index.reset()
 
 @pytest.fixture
 def api_client():
@@ -118,4 +127,72 @@ def test_consultation(db, test_doctor, test_patient):
         reason='Test consultation',
         archived=False,
         resume=''
-    )
\ No newline at end of file
+    )
+
+def _create_worker(hospital, password, username, role, nss, speciality):
+    user = User.objects.create_user(
+        username=username,
+        email=f'{username}@test.com',
+        password=password,
+        first_name='Test',
+        last_name=role
+    )
+    app_user = AppUser.objects.create(
+        user=user,
+        role=role,
+        hospital=hospital,
+        nss=nss,
+        phone_number='555555555',
+        address='Worker Address',
+        date_of_birth=make_aware(datetime(1985, 1, 1)),
+        place_of_birth="alger",
+        gender='Male'
+    )
+    return Worker.objects.create(user=app_user, speciality=speciality)
+
+@pytest.fixture
+def test_labtechnician(db, test_password, test_hospital):
+    """Create test lab technician worker"""
+    return _create_worker(test_hospital, test_password, 'testlab', 'LabTechnician', '777', 'Biology')
+
+@pytest.fixture
+def test_radiologist(db, test_password, test_hospital):
+    """Create test radiologist worker"""
+    return _create_worker(test_hospital, test_password, 'testradio', 'Radiologist', '666', 'Imaging')
+
+@pytest.fixture
+def test_nurse(db, test_password, test_hospital):
+    """Create test nurse worker"""
+    return _create_worker(test_hospital, test_password, 'testnurse', 'Nurse', '555', 'Care')
+
+def open_ticket(consultation, type, priority, title, age=0):
+    """Open a ticket on the consultation, created `age` minutes ago"""
+    ticket = Ticket.objects.create(
+        consultation=consultation,
+        hospital=consultation.doctor.user.hospital,
+        type=type,
+        title=title,
+        description='test',
+        priority=priority,
+    )
+    Ticket.objects.filter(id=ticket.id).update(
+        created_at=ticket.created_at - timedelta(minutes=age), dispatch_at=ticket.dispatch_at - timedelta(minutes=age)
+    )
+    return ticket
+
+@pytest.fixture
+def local_storage(settings, tmp_path):
+    """Store images on disk under tmp_path, ingesting and deleting them in the request thread"""
+    settings.IMAGE_STORAGE_BACKEND = 'GestionDPI.storage.LocalImageStorage'
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.IMAGE_UPLOAD_STAGING_ROOT = str(tmp_path / 'staging')
+    settings.IMAGE_INGEST_EAGER = True
+    settings.IMAGE_INGEST_RETRY_DELAY = 0
+    settings.MEDIA_DELETION_EAGER = True
+    get_image_storage.cache_clear()
+    yield settings
+    get_image_storage.cache_clear()
+
+def radiograph(name='chest.png', content=b'\x89PNG fake radiograph'):
+    """An uploaded PNG file"""
+    return SimpleUploadedFile(name, content, content_type='image/png')
@@ -0,0 +1,105 @@
+import os
+from datetime import timedelta
+import pytest
+from django.utils.timezone import now
+from rest_framework import status
+from doctor.ingest import expire_chunked_uploads
+from doctor.models import ImageUpload, RadioImage, RadioResult
+from doctor.tests.conftest import open_ticket
+from GestionDPI.storage import get_image_storage
+
+SERIES = bytes(range(256)) * 40
+
+
+def send_chunk(api_client, upload_id, offset, chunk):
+    return api_client.generic(
+        'PUT', f'/radio/dashboard/chunked_upload/{upload_id}', chunk,
+        content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+    )
+
+
+@pytest.mark.django_db
+class TestChunkedUpload:
+    @pytest.fixture
+    def ticket(self, local_storage, api_client, test_consultation, test_radiologist):
+        local_storage.IMAGE_UPLOAD_CHUNK_SIZE = 4096
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        return open_ticket(test_consultation, 'Radio', 'Medium', 'CT scan')
+
+    def start(self, api_client, ticket, size=len(SERIES)):
+        response = api_client.post(
+            '/radio/dashboard/chunked_upload', {'ticket_id': ticket.id, 'file_name': 'series.png', 'size': size}, format='json'
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.json()
+
+    def test_interrupted_upload_resumes_and_is_attached(
+        self, ticket, api_client, test_radiologist, local_storage, django_capture_on_commit_callbacks
+    ):
+        started = self.start(api_client, ticket)
+        assert (started['status'], started['offset'], started['chunk_size']) == ('Receiving', 0, 4096)
+        upload_id = started['upload_id']
+
+        assert send_chunk(api_client, upload_id, 0, SERIES[:4096]).json()['offset'] == 4096
+        assert send_chunk(api_client, upload_id, 4096, SERIES[4096:8192]).status_code == status.HTTP_200_OK
+        # after a dropped connection the client asks where to resume
+        assert api_client.get(f'/radio/dashboard/chunked_upload/{upload_id}').json()['offset'] == 8192
+        # a chunk sent again is refused, the file is left as is
+        response = send_chunk(api_client, upload_id, 4096, SERIES[4096:8192])
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.json() == "expected a chunk at offset 8192"
+
+        response = api_client.post(f'/radio/dashboard/chunked_upload/{upload_id}/complete')
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.json() == f"received 8192 of {len(SERIES)} bytes"
+
+        send_chunk(api_client, upload_id, 8192, SERIES[8192:])
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/radio/dashboard/chunked_upload/{upload_id}/complete')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+        upload = ImageUpload.objects.get(id=upload_id)
+        assert upload.status == 'Stored'
+        image = RadioImage.objects.get(id=upload.image_id)
+        assert image.radioresult == RadioResult.objects.get(ticket=ticket, radiologist=test_radiologist)
+        with open(get_image_storage().path(image.image), 'rb') as stored:
+            assert stored.read() == SERIES
+        assert os.listdir(local_storage.IMAGE_UPLOAD_STAGING_ROOT) == []
+
+    def test_chunks_are_bounded(self, ticket, api_client):
+        upload_id = self.start(api_client, ticket)['upload_id']
+
+        assert send_chunk(api_client, upload_id, 0, SERIES[:4097]).status_code == status.HTTP_400_BAD_REQUEST
+        assert send_chunk(api_client, upload_id, len(SERIES) - 10, SERIES[:20]).status_code == status.HTTP_400_BAD_REQUEST
+        response = api_client.put(f'/radio/dashboard/chunked_upload/{upload_id}', SERIES[:10], content_type='application/octet-stream')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert ImageUpload.objects.get(id=upload_id).received == 0
+
+        response = api_client.post(
+            '/radio/dashboard/chunked_upload', {'ticket_id': ticket.id, 'file_name': 'series.png', 'size': 0}, format='json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_uploads_are_private_to_the_worker(self, ticket, api_client, test_labtechnician):
+        upload_id = self.start(api_client, ticket)['upload_id']
+
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        assert api_client.generic(
+            'PUT', f'/lab/dashboard/chunked_upload/{upload_id}', SERIES[:10],
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0',
+        ).status_code == status.HTTP_404_NOT_FOUND
+        assert api_client.post(f'/lab/dashboard/chunked_upload/{upload_id}/complete').status_code == status.HTTP_404_NOT_FOUND
+
+    def test_abandoned_uploads_expire(self, ticket, api_client):
+        upload_id = self.start(api_client, ticket)['upload_id']
+        send_chunk(api_client, upload_id, 0, SERIES[:4096])
+        staged = ImageUpload.objects.get(id=upload_id).staged_path
+
+        assert expire_chunked_uploads() == 0
+        ImageUpload.objects.filter(id=upload_id).update(updated_at=now() - timedelta(days=2))
+        assert expire_chunked_uploads() == 1
+
+        upload = ImageUpload.objects.get(id=upload_id)
+        assert upload.status == 'Failed'
+        assert not os.path.exists(staged)
+        assert send_chunk(api_client, upload_id, 4096, SERIES[4096:8192]).json() == "the upload is Failed"
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import pytest
+from django.contrib.auth.models import User
+from rest_framework import status
+from doctor.ingest import _chunk_digests, ingest_uploads, queue_uploads
+from doctor.models import Consultation, ImageAsset, ImageUpload, MediaDeletion, RadioImage, RadioResult
+from doctor.tests.test_chunked_upload import send_chunk
+from doctor.tests.conftest import open_ticket, radiograph
+from users.models import AppUser, Patient
+
+SCAN = b'\x89PNG the same chest x-ray'
+
+
+def stored_files(settings):
+    root = os.path.join(settings.MEDIA_ROOT, 'local')
+    return sorted(os.path.join(path, name) for path, _, names in os.walk(root) for name in names)
+
+
+def ingest(ticket, worker, *files):
+    uploads = queue_uploads(ticket, worker, files)
+    ingest_uploads([upload.id for upload in uploads])
+    return list(ImageUpload.objects.filter(id__in=[upload.id for upload in uploads]).order_by('id'))
+
+
+def other_consultation(consultation, test_password):
+    user = User.objects.create_user(username='otherpatient', password=test_password)
+    app_user = AppUser.objects.create(
+        user=user, role='Patient', hospital=consultation.patient.user.hospital, nss='998', phone_number='123456789',
+        address='Patient Address', date_of_birth=consultation.patient.user.date_of_birth, place_of_birth='oran', gender='Male',
+    )
+    patient = Patient.objects.create(user=app_user)
+    return Consultation.objects.create(patient=patient, doctor=consultation.doctor, priority='Low', reason='Other', resume='')
+
+
+@pytest.mark.django_db
+class TestImageDeduplication:
+    @pytest.fixture(autouse=True)
+    def lazy_ingestion(self, local_storage):
+        local_storage.IMAGE_INGEST_EAGER = False
+
+    def test_uploads_are_hashed_while_staged(self, test_consultation, test_radiologist):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        upload = queue_uploads(ticket, test_radiologist, [radiograph(content=SCAN)])[0]
+        assert ImageUpload.objects.get(id=upload.id).sha256 == hashlib.sha256(SCAN).hexdigest()
+
+    def test_same_file_twice_on_a_result_is_stored_once(self, local_storage, test_consultation, test_radiologist):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        first, second = ingest(ticket, test_radiologist, radiograph('a.png', SCAN), radiograph('b.png', SCAN))
+        third, = ingest(ticket, test_radiologist, radiograph('c.png', SCAN))
+
+        assert {first.status, second.status, third.status} == {'Stored'}
+        assert first.image_id == second.image_id == third.image_id
+        image = RadioImage.objects.get(radioresult__ticket=ticket)
+        asset = ImageAsset.objects.get()
+        assert (image.asset, asset.references) == (asset, 1)
+        assert image.image.public_id == asset.image.public_id
+        # the image and its variants
+        assert len(stored_files(local_storage)) == 1 + len(asset.variants)
+
+    def test_same_file_on_another_ticket_shares_the_asset(
+        self, local_storage, api_client, test_consultation, test_radiologist, django_capture_on_commit_callbacks
+    ):
+        first_ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        second_ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'follow-up x-ray')
+        ingest(first_ticket, test_radiologist, radiograph(content=SCAN))
+        files = stored_files(local_storage)
+        ingest(second_ticket, test_radiologist, radiograph(content=SCAN))
+
+        first, second = RadioImage.objects.order_by('id')
+        assert (first.radioresult.ticket, second.radioresult.ticket) == (first_ticket, second_ticket)
+        assert first.asset_id == second.asset_id
+        assert ImageAsset.objects.get().references == 2
+        assert stored_files(local_storage) == files
+
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        with django_capture_on_commit_callbacks(execute=True):
+            assert api_client.delete(f'/radio/dashboard/del_image/{first.id}').status_code == status.HTTP_200_OK
+        assert ImageAsset.objects.get().references == 1
+        assert not MediaDeletion.objects.exists()
+        assert stored_files(local_storage) == files
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert api_client.delete(f'/radio/dashboard/del_image/{second.id}').status_code == status.HTTP_200_OK
+        assert not ImageAsset.objects.exists()
+        assert stored_files(local_storage) == []
+
+    def test_cascading_deletes_queue_shared_files_once(self, local_storage, test_consultation, test_radiologist):
+        """Deleting the patient deletes the asset twice, through its images and directly"""
+        ingest(open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray'), test_radiologist, radiograph(content=SCAN))
+        ingest(open_ticket(test_consultation, 'Radio', 'Medium', 'follow-up x-ray'), test_radiologist, radiograph(content=SCAN))
+        asset = ImageAsset.objects.get()
+
+        test_consultation.patient.user.user.delete()
+
+        queued = [image.public_id for image in MediaDeletion.objects.values_list('image', flat=True)]
+        assert len(queued) == len(set(queued)) == 1 + len(asset.variants)
+
+    def test_other_patients_do_not_share_files(self, local_storage, test_consultation, test_radiologist, test_password):
+        ingest(open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray'), test_radiologist, radiograph(content=SCAN))
+        other = other_consultation(test_consultation, test_password)
+        ingest(open_ticket(other, 'Radio', 'Medium', 'x-ray'), test_radiologist, radiograph(content=SCAN))
+
+        assert ImageAsset.objects.count() == 2
+        assert set(ImageAsset.objects.values_list('references', flat=True)) == {1}
+        assert len({image.image.public_id for image in RadioImage.objects.all()}) == 2
+
+    def test_chunked_upload_is_hashed_as_received(
+        self, local_storage, api_client, test_consultation, test_radiologist, django_capture_on_commit_callbacks
+    ):
+        local_storage.IMAGE_INGEST_EAGER = True
+        ingest(open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray'), test_radiologist, radiograph(content=SCAN))
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'CT scan')
+        api_client.force_authenticate(user=test_radiologist.user.user)
+
+        response = api_client.post(
+            '/radio/dashboard/chunked_upload', {'ticket_id': ticket.id, 'file_name': 'series.png', 'size': len(SCAN)}, format='json'
+        )
+        upload_id = response.json()['upload_id']
+        send_chunk(api_client, upload_id, 0, SCAN[:5])
+        assert _chunk_digests[upload_id][0] == 5
+        send_chunk(api_client, upload_id, 5, SCAN[5:10])
+        # the next chunk reaches a process that did not receive the first ones
+        _chunk_digests.clear()
+        send_chunk(api_client, upload_id, 10, SCAN[10:])
+        assert ImageUpload.objects.get(id=upload_id).sha256 == hashlib.sha256(SCAN).hexdigest()
+        assert upload_id not in _chunk_digests
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(f'/radio/dashboard/chunked_upload/{upload_id}/complete')
+        upload = ImageUpload.objects.get(id=upload_id)
+        assert upload.status == 'Stored'
+        assert RadioImage.objects.get(id=upload.image_id).radioresult == RadioResult.objects.get(ticket=ticket)
+        assert ImageAsset.objects.get().references == 2
@@ -0,0 +1,90 @@
+import io
+import os
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from rest_framework import status
+from doctor.models import MediaDeletion, RadioImage
+from doctor.tests.conftest import open_ticket, radiograph
+from GestionDPI.storage import get_image_storage
+
+
+def png(width, height, mode='RGB'):
+    content = io.BytesIO()
+    Image.new(mode, (width, height)).save(content, 'PNG')
+    return SimpleUploadedFile('chest.png', content.getvalue(), content_type='image/png')
+
+
+def upload(api_client, ticket, image):
+    response = api_client.post('/radio/dashboard/add_image', {'ticket_id': ticket.id, 'image': image}, format='multipart')
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+
+@pytest.mark.django_db
+class TestImageVariants:
+    @pytest.fixture(autouse=True)
+    def radiologist_client(self, api_client, test_radiologist):
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        return api_client
+
+    def test_variants_are_stored_next_to_the_original(
+        self, local_storage, api_client, test_consultation, django_capture_on_commit_callbacks
+    ):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        with django_capture_on_commit_callbacks(execute=True):
+            upload(api_client, ticket, png(2048, 1536))
+        image = RadioImage.objects.get()
+
+        assert set(image.variants) == {'thumbnail', 'preview', 'full'}
+        field = RadioImage._meta.get_field('image')
+        sizes = {}
+        for name, value in image.variants.items():
+            variant = field.to_python(value)
+            assert variant.public_id == f"{image.image.public_id}_{name}"
+            with Image.open(get_image_storage().path(variant)) as stored:
+                assert stored.format == 'JPEG'
+                sizes[name] = stored.size
+        assert sizes == {'thumbnail': (256, 192), 'preview': (1024, 768), 'full': (2048, 1536)}
+        assert os.listdir(local_storage.IMAGE_UPLOAD_STAGING_ROOT) == []
+
+        images, _ = api_client.get(f'/radio/dashboard/get_result/{ticket.id}').json()
+        assert images[0]['variants']['thumbnail'] == f"/media/{image.image.public_id}_thumbnail.jpg"
+
+    def test_deep_radiographs_get_8_bit_variants(
+        self, local_storage, api_client, test_consultation, django_capture_on_commit_callbacks
+    ):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        with django_capture_on_commit_callbacks(execute=True):
+            upload(api_client, ticket, png(300, 300, 'I;16'))
+        image = RadioImage.objects.get()
+
+        variant = RadioImage._meta.get_field('image').to_python(image.variants['thumbnail'])
+        with Image.open(get_image_storage().path(variant)) as stored:
+            assert (stored.mode, stored.size) == ('L', (256, 256))
+
+    def test_unreadable_images_are_served_as_the_original(
+        self, local_storage, api_client, test_consultation, django_capture_on_commit_callbacks
+    ):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        with django_capture_on_commit_callbacks(execute=True):
+            upload(api_client, ticket, radiograph())
+        image = RadioImage.objects.get()
+
+        assert image.variants == {}
+        original = f"/media/{image.image.public_id}.png"
+        images, _ = api_client.get(f'/radio/dashboard/get_result/{ticket.id}').json()
+        assert images[0]['variants'] == {'thumbnail': original, 'preview': original, 'full': original}
+
+    def test_variants_are_deleted_with_the_image(
+        self, local_storage, api_client, test_consultation, django_capture_on_commit_callbacks
+    ):
+        local_storage.MEDIA_DELETION_EAGER = False
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        with django_capture_on_commit_callbacks(execute=True):
+            upload(api_client, ticket, png(400, 400))
+        image = RadioImage.objects.get()
+
+        api_client.delete(f'/radio/dashboard/del_image/{image.id}')
+        queued = sorted(deletion.image.public_id for deletion in MediaDeletion.objects.all())
+        public_id = image.image.public_id
+        assert queued == sorted([public_id] + [f"{public_id}_{name}" for name in ('full', 'preview', 'thumbnail')])
@@ -0,0 +1,133 @@
+import pytest
+import threading
+from datetime import timedelta
+from django.db import connection, connections, transaction
+from django.utils.timezone import now
+from rest_framework import status
+from doctor.dispatch import claim_next_ticket, claimable_tickets, dispatch_order
+from doctor.models import LabResult, Ticket
+from doctor.tests.conftest import _create_worker, open_ticket
+
+
+@pytest.fixture
+def other_labtechnician(test_hospital, test_password):
+    return _create_worker(test_hospital, test_password, 'otherlab', 'LabTechnician', '778', 'Biology')
+
+
+@pytest.mark.django_db
+class TestTicketDispatch:
+    def test_claims_follow_priority_with_aging(self, settings, test_consultation, test_labtechnician, other_labtechnician):
+        """Each claim leases a different ticket; old Low tickets overtake new Critical ones"""
+        settings.TICKET_AGING_SECONDS = 30 * 60
+        open_ticket(test_consultation, 'Lab', 'Critical', 'new critical', age=5)
+        open_ticket(test_consultation, 'Lab', 'Low', 'starving low', age=90)
+        open_ticket(test_consultation, 'Lab', 'Medium', 'recent medium', age=10)
+        open_ticket(test_consultation, 'Radio', 'Critical', 'radio')
+
+        first = claim_next_ticket(test_labtechnician, 'Lab')
+        second = claim_next_ticket(other_labtechnician, 'Lab')
+        assert (first.title, second.title) == ('starving low', 'new critical')
+        assert first.claimed_by == test_labtechnician
+        assert first.lease_expires_at > now()
+
+        # a worker holding a lease gets it back instead of a second ticket
+        assert claim_next_ticket(test_labtechnician, 'Lab').id == first.id
+
+        third = _create_worker(test_consultation.doctor.user.hospital, 'x', 'thirdlab', 'LabTechnician', '779', 'Biology')
+        assert claim_next_ticket(third, 'Lab').title == 'recent medium'
+        fourth = _create_worker(test_consultation.doctor.user.hospital, 'x', 'fourthlab', 'LabTechnician', '780', 'Biology')
+        assert claim_next_ticket(fourth, 'Lab') is None
+
+    def test_skip_locked_claims_follow_dispatch_order(self, monkeypatch, test_consultation, test_labtechnician, other_labtechnician):
+        """The SKIP LOCKED branch takes the tickets in dispatch order, one per claimer"""
+        monkeypatch.setattr(connection.features, 'has_select_for_update_skip_locked', True)
+        open_ticket(test_consultation, 'Lab', 'Critical', 'new critical', age=5)
+        open_ticket(test_consultation, 'Lab', 'Low', 'starving low', age=90)
+
+        assert claim_next_ticket(test_labtechnician, 'Lab').title == 'starving low'
+        assert claim_next_ticket(other_labtechnician, 'Lab').title == 'new critical'
+
+    @pytest.mark.skipif(connection.vendor != 'sqlite', reason="reads SQLite's query plan")
+    def test_claims_are_read_in_index_order(self, test_consultation):
+        """The claim's ORDER BY is served by the index, so SKIP LOCKED only locks the row it takes"""
+        open_ticket(test_consultation, 'Lab', 'Low', 'low')
+        candidates = dispatch_order(claimable_tickets(test_consultation.doctor.user.hospital_id, 'Lab'))
+        sql, params = candidates[:1].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        assert 'doctor_tick_hospita_1e2de8_idx' in plan
+        assert 'TEMP B-TREE FOR ORDER BY' not in plan
+
+    def test_expired_leases_return_to_the_queue(self, test_consultation, test_labtechnician, other_labtechnician):
+        ticket = open_ticket(test_consultation, 'Lab', 'Low', 'only one')
+        assert claim_next_ticket(test_labtechnician, 'Lab').id == ticket.id
+        assert claim_next_ticket(other_labtechnician, 'Lab') is None
+
+        Ticket.objects.filter(id=ticket.id).update(lease_expires_at=now() - timedelta(seconds=1))
+        assert claim_next_ticket(other_labtechnician, 'Lab').claimed_by == other_labtechnician
+
+    def test_claim_renew_release_and_submit(self, api_client, test_consultation, test_labtechnician, other_labtechnician):
+        ticket = open_ticket(test_consultation, 'Lab', 'Medium', 'blood test')
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+
+        response = api_client.post('/lab/dashboard/claim_ticket')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['ticket_id'] == ticket.id
+        assert api_client.post(f'/lab/dashboard/renew_lease/{ticket.id}').status_code == status.HTTP_200_OK
+        assert api_client.post(f'/lab/dashboard/release_ticket/{ticket.id}').status_code == status.HTTP_200_OK
+        assert api_client.post(f'/lab/dashboard/renew_lease/{ticket.id}').status_code == status.HTTP_409_CONFLICT
+
+        api_client.force_authenticate(user=other_labtechnician.user.user)
+        assert api_client.post('/lab/dashboard/claim_ticket').json()['ticket_id'] == ticket.id
+
+        # the ticket is leased to the other technician
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        response = api_client.post('/lab/dashboard/submit_result', {'ticket_id': ticket.id, 'title': 'NFS'}, format='json')
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert not LabResult.objects.exists()
+
+        api_client.force_authenticate(user=other_labtechnician.user.user)
+        response = api_client.post('/lab/dashboard/submit_result', {'ticket_id': ticket.id, 'title': 'NFS'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        ticket.refresh_from_db()
+        assert (ticket.status, ticket.claimed_by, ticket.lease_expires_at) == ('Closed', None, None)
+        assert LabResult.objects.get().labtechnician == other_labtechnician
+        assert api_client.post('/lab/dashboard/claim_ticket').status_code == status.HTTP_204_NO_CONTENT
+
+    def test_submit_result_rejects_other_ticket_types(self, api_client, test_consultation, test_labtechnician):
+        ticket = open_ticket(test_consultation, 'Radio', 'Low', 'x-ray')
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+
+        response = api_client.post('/lab/dashboard/submit_result', {'ticket_id': ticket.id, 'title': 'NFS'}, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(not connection.features.has_select_for_update_skip_locked, reason="needs SELECT ... SKIP LOCKED")
+def test_concurrent_claims_skip_the_locked_ticket(test_consultation, test_labtechnician, other_labtechnician):
+    """A claimer racing an uncommitted claim takes the next ticket instead of finding the queue empty"""
+    first = open_ticket(test_consultation, 'Lab', 'Critical', 'first', age=10)
+    second = open_ticket(test_consultation, 'Lab', 'Critical', 'second')
+    claimed, release, claims = threading.Event(), threading.Event(), {}
+
+    def hold_claim():
+        try:
+            with transaction.atomic():
+                claims['held'] = claim_next_ticket(test_labtechnician, 'Lab')
+                claimed.set()
+                release.wait(10)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=hold_claim)
+    thread.start()
+    try:
+        assert claimed.wait(10)
+        claims['raced'] = claim_next_ticket(other_labtechnician, 'Lab')
+    finally:
+        release.set()
+        thread.join()
+
+    assert claims['held'].id == first.id
+    assert claims['raced'] is not None and claims['raced'].id == second.id
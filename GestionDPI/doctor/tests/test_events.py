@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import pytest
+from django.test import AsyncClient, RequestFactory
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from GestionDPI.events import EventStreamToken, InProcessBroker, get_broker, ticket_channel
+from GestionDPI.views import authenticate_stream
+from doctor.models import Ticket
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+
+
+@pytest.fixture
+def recording_broker(settings):
+    settings.TICKET_EVENTS_BROKER = 'doctor.tests.test_events.RecordingBroker'
+    get_broker.cache_clear()
+    yield get_broker()
+    get_broker.cache_clear()
+
+
+def test_in_process_broker_delivers_across_threads():
+    """Events published from a worker thread reach subscribers of the channel only"""
+    broker = InProcessBroker()
+
+    async def listen():
+        with broker.subscribe('tickets:1:Lab') as lab, broker.subscribe('tickets:1:Radio') as radio:
+            thread = threading.Thread(target=broker.publish, args=('tickets:1:Lab', {'event': 'ticket_closed', 'ticket_id': 4}))
+            thread.start()
+            event = await asyncio.wait_for(lab.get(), 1)
+            thread.join()
+            assert radio.queue.empty()
+            return event
+
+    assert asyncio.run(listen()) == {'event': 'ticket_closed', 'ticket_id': 4, 'id': 1}
+    assert broker._subscriptions == {}
+
+
+def test_in_process_broker_resyncs_slow_subscribers():
+    broker = InProcessBroker(maxsize=2)
+
+    async def listen():
+        subscription = broker.subscribe('tickets:1:Lab')
+        for i in range(3):
+            broker.publish('tickets:1:Lab', {'event': 'ticket_closed', 'ticket_id': i})
+        await asyncio.sleep(0)
+        return [await subscription.get() for _ in range(subscription.queue.qsize())]
+
+    assert asyncio.run(listen()) == [{'event': 'resync'}]
+    assert broker._subscriptions == {}
+
+
+def test_event_stream_requires_a_token():
+    response = asyncio.run(AsyncClient().get('/lab/dashboard/events'))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_event_stream_is_not_served_under_wsgi(client):
+    assert client.get('/lab/dashboard/events').status_code == status.HTTP_501_NOT_IMPLEMENTED
+
+
+@pytest.mark.django_db
+class TestTicketEvents:
+    def test_ticket_created_and_closed_are_published_on_commit(
+        self, recording_broker, authenticated_doctor_client, api_client, test_consultation, test_labtechnician,
+        django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_doctor_client.post(reverse('create_ticket'), {
+                'consultation_id': test_consultation.id,
+                'priority': 'Critical',
+                'type': 'Lab',
+                'title': 'Blood test',
+                'description': 'NFS',
+            }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        ticket = Ticket.objects.get(id=response.json()['ticket_id'])
+        channel = ticket_channel(ticket.hospital_id, 'Lab')
+        [(published_channel, created)] = recording_broker.published
+        assert published_channel == channel
+        assert created['event'] == 'ticket_created'
+        assert created['ticket_id'] == ticket.id
+        assert created['priority'] == 'Critical'
+
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post('/lab/dashboard/submit_result', {'ticket_id': ticket.id, 'title': 'NFS', 'notes': 'ok'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert recording_broker.published[1] == (channel, {'event': 'ticket_closed', 'ticket_id': ticket.id})
+
+    def test_stream_tokens_open_one_stream_only(self, api_client, test_labtechnician, settings):
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        response = api_client.post('/lab/dashboard/events/token')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['expires_in'] == 60
+        token = response.json()['token']
+        user = test_labtechnician.user.user
+
+        def authenticate(ticket_type, **params):
+            return authenticate_stream(RequestFactory().get('/lab/dashboard/events', params), ticket_type)
+
+        assert authenticate('Lab', token=token) == test_labtechnician.user
+        assert authenticate('Radio', token=token) is None
+        # access tokens stay out of URLs, stream tokens cannot call the API
+        assert authenticate('Lab', token=str(AccessToken.for_user(user))) is None
+        api_client.force_authenticate(user=None)
+        assert api_client.get('/lab/get_ticket_history', HTTP_AUTHORIZATION=f'Bearer {token}').status_code == status.HTTP_401_UNAUTHORIZED
+
+        settings.TICKET_EVENTS_TOKEN_LIFETIME = -settings.TICKET_EVENTS_TOKEN_LIFETIME
+        assert authenticate('Lab', token=str(EventStreamToken.for_stream(user, 'Lab'))) is None
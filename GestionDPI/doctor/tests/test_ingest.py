@@ -0,0 +1,136 @@
+import itertools
+import os
+import threading
+import time
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from doctor.ingest import ingest_uploads, queue_uploads
+from doctor.models import ImageUpload, RadioImage, RadioResult
+from doctor.tests.conftest import open_ticket, radiograph
+from GestionDPI.storage import LocalImageStorage, get_image_storage
+
+
+class BrokenStorage:
+    def save(self, path, folder, name=None):
+        raise ConnectionError("storage unreachable")
+
+
+class SlowStorage(LocalImageStorage):
+    """Local storage recording how many files are stored at the same time."""
+    lock = threading.Lock()
+    in_flight = 0
+    most_in_flight = 0
+
+    def save(self, path, folder, name=None):
+        with self.lock:
+            SlowStorage.in_flight += 1
+            SlowStorage.most_in_flight = max(SlowStorage.most_in_flight, SlowStorage.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            SlowStorage.in_flight -= 1
+        return super().save(path, folder, name)
+
+
+@pytest.mark.django_db
+class TestImageIngestion:
+    def test_upload_is_acknowledged_then_stored(
+        self, local_storage, api_client, test_consultation, test_radiologist, django_capture_on_commit_callbacks
+    ):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        api_client.force_authenticate(user=test_radiologist.user.user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post('/radio/dashboard/add_image', {'ticket_id': ticket.id, 'image': radiograph()}, format='multipart')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.json()['status'] == 'Pending'
+
+        response = api_client.get(f"/radio/dashboard/upload_status/{response.json()['upload_id']}")
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        assert body['status'] == 'Stored'
+        image = RadioImage.objects.get(id=body['image_id'])
+        assert image.radioresult.ticket == ticket
+        assert image.radioresult.radiologist == test_radiologist
+        assert body['image_url'] == f"/media/{image.image.public_id}.png"
+
+        stored = get_image_storage().path(image.image)
+        with open(stored, 'rb') as f:
+            assert f.read() == b'\x89PNG fake radiograph'
+        assert os.listdir(local_storage.IMAGE_UPLOAD_STAGING_ROOT) == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.delete(f'/radio/dashboard/del_image/{image.id}')
+        assert response.status_code == status.HTTP_200_OK
+        assert not os.path.exists(stored)
+
+    def test_upload_fails_after_its_attempts(
+        self, local_storage, api_client, test_consultation, test_radiologist, django_capture_on_commit_callbacks
+    ):
+        local_storage.IMAGE_STORAGE_BACKEND = 'doctor.tests.test_ingest.BrokenStorage'
+        local_storage.IMAGE_INGEST_ATTEMPTS = 2
+        get_image_storage.cache_clear()
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        api_client.force_authenticate(user=test_radiologist.user.user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post('/radio/dashboard/add_image', {'ticket_id': ticket.id, 'image': radiograph()}, format='multipart')
+
+        upload = ImageUpload.objects.get(id=response.json()['upload_id'])
+        assert (upload.status, upload.attempts, upload.error) == ('Failed', 2, 'storage unreachable')
+        assert not RadioImage.objects.exists()
+        assert os.listdir(local_storage.IMAGE_UPLOAD_STAGING_ROOT) == []
+
+    def test_upload_status_is_private_to_the_worker(self, local_storage, api_client, test_consultation, test_radiologist, test_labtechnician):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'x-ray')
+        upload = ImageUpload.objects.create(ticket=ticket, worker=test_radiologist, file_name='chest.png', staged_path='/nowhere')
+
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        assert api_client.get(f'/lab/dashboard/upload_status/{upload.id}').status_code == status.HTTP_404_NOT_FOUND
+        # lab technicians cannot send images to radiology tickets
+        response = api_client.post('/lab/dashboard/add_image', {'ticket_id': ticket.id, 'image': radiograph()}, format='multipart')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_series_upload_reports_each_file(
+        self, local_storage, api_client, test_consultation, test_radiologist, django_capture_on_commit_callbacks
+    ):
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'CT scan')
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        files = [radiograph(f'slice{i}.png', f'slice {i}'.encode()) for i in range(4)] + [radiograph('empty.png', b'')]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post('/radio/dashboard/add_images', {'ticket_id': ticket.id, 'images': files}, format='multipart')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        outcomes = response.json()['uploads']
+        assert [outcome['file_name'] for outcome in outcomes] == ['slice0.png', 'slice1.png', 'slice2.png', 'slice3.png', 'empty.png']
+        assert [outcome['status'] for outcome in outcomes] == ['Pending'] * 4 + ['Rejected']
+
+        ids = ','.join(str(outcome['upload_id']) for outcome in outcomes[:4])
+        statuses = api_client.get(f'/radio/dashboard/upload_status?ids={ids}').json()
+        assert [entry['status'] for entry in statuses] == ['Stored'] * 4
+        result = RadioResult.objects.get(ticket=ticket)
+        assert sorted(entry['image_id'] for entry in statuses) == sorted(result.radioimage_set.values_list('id', flat=True))
+
+    def test_series_is_stored_concurrently_in_bounded_queries(self, local_storage, test_consultation, test_radiologist):
+        local_storage.IMAGE_STORAGE_BACKEND = 'doctor.tests.test_ingest.SlowStorage'
+        local_storage.IMAGE_BATCH_UPLOAD_WORKERS = 3
+        get_image_storage.cache_clear()
+        SlowStorage.most_in_flight = 0
+        ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'CT scan')
+        slices = itertools.count()
+
+        def ingest(count):
+            local_storage.IMAGE_INGEST_EAGER = False
+            files = [radiograph(f'slice{i}.png', f'slice {i}'.encode()) for i in itertools.islice(slices, count)]
+            uploads = queue_uploads(ticket, test_radiologist, files)
+            with CaptureQueriesContext(connection) as queries:
+                ingest_uploads([upload.id for upload in uploads])
+            return len(queries)
+
+        ingest(1)  # creates the result
+        single = ingest(1)
+        assert ingest(8) == single
+        assert SlowStorage.most_in_flight == 3
+        assert RadioImage.objects.filter(radioresult__ticket=ticket).count() == 10
+        assert set(ImageUpload.objects.values_list('status', flat=True)) == {'Stored'}
@@ -0,0 +1,106 @@
+import os
+from datetime import timedelta
+import pytest
+from django.db import transaction
+from django.utils.timezone import now
+from rest_framework import status
+from doctor import media
+from doctor.media import drain_media_deletions
+from doctor.models import MediaDeletion, RadioImage, RadioResult
+from doctor.tests.conftest import open_ticket
+from GestionDPI.storage import LocalImageStorage, get_image_storage
+
+
+class FailingDeletes(LocalImageStorage):
+    def delete_many(self, images):
+        raise ConnectionError("storage unreachable")
+
+
+@pytest.fixture
+def radio_result(local_storage, test_consultation, test_radiologist):
+    local_storage.MEDIA_DELETION_EAGER = False
+    ticket = open_ticket(test_consultation, 'Radio', 'Medium', 'CT scan')
+    return RadioResult.objects.create(ticket=ticket, radiologist=test_radiologist)
+
+
+def store_image(tmp_path, result, name):
+    source = tmp_path / name
+    source.write_bytes(b'\x89PNG slice')
+    image = RadioImage.objects.create(radioresult=result, image=get_image_storage().save(str(source), 'radio'))
+    return image, get_image_storage().path(image.image)
+
+
+@pytest.mark.django_db
+class TestMediaDeletion:
+    def test_delete_image_defers_the_storage_deletion(self, tmp_path, radio_result, api_client, test_radiologist):
+        image, path = store_image(tmp_path, radio_result, 'slice.png')
+        api_client.force_authenticate(user=test_radiologist.user.user)
+
+        response = api_client.delete(f'/radio/dashboard/del_image/{image.id}')
+        assert response.status_code == status.HTTP_200_OK
+        assert not RadioImage.objects.exists()
+        assert os.path.exists(path)
+        assert MediaDeletion.objects.get().image.public_id == image.image.public_id
+
+        assert drain_media_deletions() == (1, 0)
+        assert not os.path.exists(path)
+        assert not MediaDeletion.objects.exists()
+
+    def test_cascading_deletes_fill_the_outbox(self, tmp_path, radio_result, test_radiologist):
+        paths = [store_image(tmp_path, radio_result, f'slice{i}.png')[1] for i in range(3)]
+
+        # what DeleteUser does; the radiologist's default profile image is shared and kept
+        test_radiologist.user.user.delete()
+        assert MediaDeletion.objects.count() == 3
+
+        assert drain_media_deletions() == (3, 0)
+        assert not any(os.path.exists(path) for path in paths)
+
+    def test_rolled_back_deletes_keep_their_images(self, tmp_path, radio_result):
+        image, _ = store_image(tmp_path, radio_result, 'slice.png')
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                image.delete()
+                raise RuntimeError("abort")
+        assert not MediaDeletion.objects.exists()
+
+    def test_failed_batches_are_retried_with_backoff(self, tmp_path, radio_result, local_storage):
+        local_storage.MEDIA_DELETION_ATTEMPTS = 2
+        image, path = store_image(tmp_path, radio_result, 'slice.png')
+        image.delete()
+
+        local_storage.IMAGE_STORAGE_BACKEND = 'doctor.tests.test_media.FailingDeletes'
+        get_image_storage.cache_clear()
+        assert drain_media_deletions() == (0, 1)
+        deletion = MediaDeletion.objects.get()
+        assert (deletion.attempts, deletion.last_error) == (1, 'storage unreachable')
+        assert deletion.next_attempt_at > now()
+        # not due yet
+        assert drain_media_deletions() == (0, 0)
+
+        MediaDeletion.objects.update(next_attempt_at=now() - timedelta(seconds=1))
+        assert drain_media_deletions() == (0, 1)
+        MediaDeletion.objects.update(next_attempt_at=now() - timedelta(seconds=1))
+        # out of attempts, left for inspection
+        assert drain_media_deletions() == (0, 0)
+        assert os.path.exists(path)
+
+    def test_failed_drains_schedule_a_retry(self, tmp_path, radio_result, local_storage, mocker):
+        """The server drains again when the failed batch is due, without new deletions"""
+        image, _ = store_image(tmp_path, radio_result, 'slice.png')
+        image.delete()
+        local_storage.IMAGE_STORAGE_BACKEND = 'doctor.tests.test_media.FailingDeletes'
+        get_image_storage.cache_clear()
+        timer = mocker.patch('doctor.media.threading.Timer')
+        mocker.patch.object(media, '_retry', None)
+        mocker.patch('doctor.media.connections.close_all')
+
+        media._run()
+
+        (delay, drain), _ = timer.call_args
+        assert delay == pytest.approx(local_storage.MEDIA_DELETION_RETRY_DELAY, abs=5)
+        assert drain is media.schedule_drain
+        timer.return_value.start.assert_called_once()
+        # a later failure keeps the earlier timer
+        media.schedule_retry()
+        assert timer.call_count == 1
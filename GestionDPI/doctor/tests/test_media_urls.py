@@ -0,0 +1,63 @@
+import pytest
+from cloudinary import CloudinaryResource
+from django.core.management import call_command
+from django.urls import reverse
+from doctor.tests.conftest import open_ticket
+from users.models import AppUser
+from GestionDPI.storage import _cloudinary_url, media_url
+
+
+@pytest.fixture
+def url_cache():
+    _cloudinary_url.cache_clear()
+    yield _cloudinary_url
+    _cloudinary_url.cache_clear()
+
+
+class TestMediaUrl:
+    def test_matches_cloudinary_urls(self, url_cache):
+        avatar = CloudinaryResource('users/avatar', format='jpg', version=1700000000, resource_type='image')
+        assert media_url(avatar) == avatar.url
+        assert media_url(avatar, width=64, crop='fill') == avatar.build_url(width=64, crop='fill')
+        assert media_url(None) is None
+
+    def test_urls_are_built_once_per_image_and_transformation(self, url_cache):
+        for _ in range(3):
+            media_url(CloudinaryResource('default_user', resource_type='image'))
+            media_url(CloudinaryResource('default_user', resource_type='image'), width=64)
+            # a new version is a new URL
+            media_url(CloudinaryResource('default_user', version=2, resource_type='image'))
+        assert (url_cache.cache_info().misses, url_cache.cache_info().hits) == (3, 6)
+
+    def test_chained_transformations_are_not_memoized(self, url_cache):
+        avatar = CloudinaryResource('users/avatar', resource_type='image')
+        transformation = [{'width': 64, 'crop': 'fill'}, {'radius': 'max'}]
+        assert media_url(avatar, transformation=transformation) == avatar.build_url(transformation=transformation)
+        assert url_cache.cache_info().currsize == 0
+
+    def test_benchmark(self, url_cache, capsys):
+        call_command('benchmark_media_urls', rows=50, avatars=5, repeat=2)
+        assert "media_url" in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_patient_list_profile_images(url_cache, authenticated_doctor_client, test_patient):
+    response = authenticated_doctor_client.get(reverse('patients_list'))
+    assert response.status_code == 200
+    image = AppUser.objects.get(id=test_patient['app_user'].id).image
+    assert {row['profile_image'] for row in response.json()['patients']} == {image.url}
+
+
+@pytest.mark.django_db
+def test_ticket_queue_avatars(url_cache, api_client, test_labtechnician, test_consultation, test_patient, test_doctor):
+    for i in range(3):
+        open_ticket(test_consultation, 'Lab', 'Medium', f'ticket {i}')
+    api_client.force_authenticate(user=test_labtechnician.user.user)
+
+    tickets = api_client.get('/lab/dashboard/get_open_tickets').json()
+    patient = AppUser.objects.get(id=test_patient['app_user'].id).image
+    doctor = AppUser.objects.get(id=test_doctor['app_user'].id).image
+    assert {ticket['consultation']['patient']['user']['image'] for ticket in tickets} == {patient.url}
+    assert {ticket['consultation']['doctor']['user']['image'] for ticket in tickets} == {doctor.url}
+    # one URL built per avatar
+    assert url_cache.cache_info().misses == len({patient.public_id, doctor.public_id})
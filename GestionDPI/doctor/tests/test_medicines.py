@@ -0,0 +1,127 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from doctor.models import Medicine, Prescription, PrescriptionDetail
+from doctor.medicines import CACHE_PREFIX, medicine_index, resolve_medicine_ids
+
+
+def medicine(name, dosage='500mg'):
+    return {'name': name, 'dosage': dosage, 'duration': '7 days', 'frequency': '3/day', 'instructions': 'after meals'}
+
+
+@pytest.mark.django_db
+class TestMedicineCatalog:
+    def test_resolve_medicine_ids_deduplicates_names(self, django_assert_num_queries, django_capture_on_commit_callbacks):
+        """Names differing by case or spacing share one catalog row"""
+        existing = Medicine.objects.create(name='Doliprane')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ids = resolve_medicine_ids(['doliprane ', 'Amoxicilline', '  AMOXICILLINE'])
+        assert ids == {'doliprane': existing.id, 'amoxicilline': Medicine.objects.get(key='amoxicilline').id}
+        assert Medicine.objects.count() == 2
+        assert Medicine.objects.get(key='amoxicilline').name == 'Amoxicilline'
+
+        with django_assert_num_queries(0):
+            assert resolve_medicine_ids(['Doliprane', 'amoxicilline']) == ids
+
+    def test_rolled_back_medicines_are_not_cached(self, django_capture_on_commit_callbacks):
+        """Ids of catalog rows created by a transaction that rolls back never reach the cache"""
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(ValueError):
+                with transaction.atomic():
+                    resolve_medicine_ids(['Amoxicilline'])
+                    # read back from the same transaction
+                    resolve_medicine_ids(['AMOXICILLINE'])
+                    raise ValueError('detail insert failed')
+        assert not Medicine.objects.exists()
+        assert cache.get(CACHE_PREFIX + 'amoxicilline') is None
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ids = resolve_medicine_ids(['Amoxicilline'])
+        assert ids == {'amoxicilline': Medicine.objects.get().id}
+        assert cache.get(CACHE_PREFIX + 'amoxicilline') == ids['amoxicilline']
+
+    def test_create_prescription_writes_details_in_bulk(
+        self, authenticated_doctor_client, test_consultation
+    ):
+        """CreatePrescriptionView reuses catalog medicines and inserts all details at once"""
+        Medicine.objects.create(name='Doliprane')
+        url = reverse('create_prescription')
+        payload = {
+            'consultation_id': test_consultation.id,
+            'notes': 'notes',
+            'medicines_list': [medicine('Doliprane'), medicine('Ibuprofene'), medicine('doliprane', '1g')],
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_doctor_client.post(url, payload, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        inserts = [q['sql'].split('(')[0] for q in queries if q['sql'].startswith('INSERT')]
+        assert sum('"doctor_prescriptiondetail"' in sql for sql in inserts) == 1
+        assert sum('"doctor_medicine"' in sql for sql in inserts) == 1
+
+        prescription = Prescription.objects.get(id=response.json()['prescription_id'])
+        assert prescription.consultation == test_consultation
+        details = PrescriptionDetail.objects.filter(prescription=prescription).select_related('medicine').order_by('id')
+        assert [(d.medicine.name, d.dosage) for d in details] == [('Doliprane', '500mg'), ('Ibuprofene', '500mg'), ('Doliprane', '1g')]
+        assert Medicine.objects.count() == 2
+
+    def test_create_prescription_rejects_incomplete_medicines(self, authenticated_doctor_client, test_consultation):
+        url = reverse('create_prescription')
+        response = authenticated_doctor_client.post(url, {
+            'consultation_id': test_consultation.id,
+            'notes': 'notes',
+            'medicines_list': [{'name': 'Doliprane'}],
+        }, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Prescription.objects.exists()
+
+    def test_search_medicines_is_served_from_the_index(
+        self, authenticated_doctor_client, django_assert_num_queries, django_capture_on_commit_callbacks
+    ):
+        """SearchMedicinesView matches word prefixes without querying the catalog"""
+        for name in ['Paracetamol', 'Acide acetylsalicylique', 'Amoxicilline', 'Ibuprofene']:
+            Medicine.objects.create(name=name)
+        url = reverse('search_medicines')
+
+        response = authenticated_doctor_client.get(url, {'q': 'a'})
+        assert [m['name'] for m in response.json()['medicines']] == ['Acide acetylsalicylique', 'Amoxicilline']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            resolve_medicine_ids(['Paroxetine'])
+        with django_assert_num_queries(0):
+            response = authenticated_doctor_client.get(url, {'q': ' PAR', 'limit': 5})
+        assert [m['name'] for m in response.json()['medicines']] == ['Paracetamol', 'Paroxetine']
+
+        response = authenticated_doctor_client.get(url, {'q': 'acet'})
+        assert response.json()['medicines'] == [{'id': Medicine.objects.get(key='acide acetylsalicylique').id, 'name': 'Acide acetylsalicylique'}]
+
+    def test_medicine_index_picks_up_medicines_from_other_processes(self, settings):
+        settings.MEDICINE_INDEX_REFRESH_INTERVAL = 0
+        Medicine.objects.create(name='Paracetamol')
+        assert medicine_index.search('para') == [(Medicine.objects.get().id, 'Paracetamol')]
+
+        Medicine.objects.create(name='Parapsyllium')
+        assert [name for _, name in medicine_index.search('para')] == ['Paracetamol', 'Parapsyllium']
+
+    def test_medicine_index_does_not_skip_lower_ids(self, settings):
+        """Medicines added locally or committed late with a lower id are still fetched"""
+        settings.MEDICINE_INDEX_REFRESH_INTERVAL = 0
+        medicine_index.search('a')
+
+        # another process creates Amoxicillin, then this one creates Ibuprofen
+        Medicine.objects.create(name='Amoxicillin')
+        ibuprofen = Medicine.objects.create(name='Ibuprofen')
+        medicine_index.add([(ibuprofen.id, ibuprofen.name)])
+        medicine_index.refresh(force=True)
+        assert [name for _, name in medicine_index.search('amox')] == ['Amoxicillin']
+
+        # an id allocated before Paracetamol's, committed after it was indexed
+        Medicine.objects.create(id=ibuprofen.id + 5, name='Paracetamol')
+        medicine_index.search('para')
+        Medicine.objects.create(id=ibuprofen.id + 2, name='Paroxetine')
+        assert [name for _, name in medicine_index.search('par')] == ['Paracetamol', 'Paroxetine']
@@ -0,0 +1,84 @@
+import os
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from doctor.models import Medicine, Prescription, PrescriptionDetail
+from doctor.prescriptions import render_prescription, prescriptions_for_print
+
+
+@pytest.fixture
+def test_prescription(test_consultation):
+    prescription = Prescription.objects.create(consultation=test_consultation, status='Pending', notes='Drink water')
+    for name, dosage in [('Doliprane', '1g'), ('Ibuprofene', '400mg')]:
+        PrescriptionDetail.objects.create(
+            prescription=prescription, medicine=Medicine.objects.create(name=name),
+            dosage=dosage, duration='5 days', frequency='3/day', instructions='after meals'
+        )
+    return prescription
+
+
+@pytest.fixture
+def render_root(settings, tmp_path):
+    settings.PRESCRIPTION_RENDER_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.django_db
+class TestPrescriptionViews:
+    def test_get_prescription_in_constant_queries(self, authenticated_doctor_client, test_prescription, django_assert_num_queries):
+        """GetPrescriptionView loads the prescription and its details in two queries"""
+        url = reverse('get_prescription', args=[test_prescription.id])
+        with django_assert_num_queries(2):
+            response = authenticated_doctor_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data['patient_name'] == 'Test Patient'
+        assert data['doctor_name'] == 'Test Doctor'
+        assert data['medications'] == (
+            "- Doliprane 1g 3/day for 5 days after meals\n"
+            "- Ibuprofene 400mg 3/day for 5 days after meals"
+        )
+
+        response = authenticated_doctor_client.get(reverse('get_prescription', args=[0]))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_print_prescription_is_cached_by_content(self, authenticated_doctor_client, test_prescription, render_root):
+        """Reprints reuse the rendered file until the printed content changes"""
+        url = reverse('print_prescription', args=[test_prescription.id])
+
+        response = authenticated_doctor_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/pdf'
+        assert b''.join(response.streaming_content).startswith(b'%PDF')
+        [first] = os.listdir(render_root)
+        mtime = os.path.getmtime(render_root / first)
+
+        response = authenticated_doctor_client.get(url)
+        b''.join(response.streaming_content)
+        assert os.listdir(render_root) == [first]
+        assert os.path.getmtime(render_root / first) == mtime
+
+        test_prescription.notes = 'Drink more water'
+        test_prescription.save()
+        response = authenticated_doctor_client.get(url)
+        b''.join(response.streaming_content)
+        [second] = os.listdir(render_root)
+        assert second != first and second.startswith(f'{test_prescription.id}-')
+
+        response = authenticated_doctor_client.get(url, {'output': 'png'})
+        assert response['Content-Type'] == 'image/png'
+        assert b''.join(response.streaming_content).startswith(b'\x89PNG')
+
+        response = authenticated_doctor_client.get(url, {'output': 'docx'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_renders_stay_readable_when_replaced(self, test_prescription, render_root):
+        """A render replaced by a newer one before it is read is still served whole"""
+        with render_prescription(prescriptions_for_print().get(id=test_prescription.id)) as served:
+            test_prescription.notes = 'Drink more water'
+            test_prescription.save()
+            with render_prescription(prescriptions_for_print().get(id=test_prescription.id)) as newer:
+                newer.read()
+            assert len(os.listdir(render_root)) == 1
+            assert served.read().startswith(b'%PDF')
@@ -0,0 +1,55 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from doctor.models import LabObservation, LabResult, Ticket
+from doctor.tests.conftest import open_ticket
+
+
+@pytest.mark.django_db
+class TestBatchResults:
+    def test_submit_results_in_bounded_queries(self, api_client, test_labtechnician, test_consultation):
+        """A panel of observations over several tickets costs as many queries as a single observation"""
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        url = '/lab/dashboard/submit_results'
+
+        def submit(tickets, per_ticket):
+            observations = [
+                {'ticket_id': ticket.id, 'title': f'analyte {j}', 'notes': 'normal'}
+                for ticket in tickets for j in range(per_ticket)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.post(url, {'observations': observations}, format='json')
+            assert response.status_code == status.HTTP_200_OK
+            return response.json(), len(queries)
+
+        submit([open_ticket(test_consultation, 'Lab', 'Low', 'warm up')], 1)
+        _, single = submit([open_ticket(test_consultation, 'Lab', 'Low', 'single')], 1)
+
+        tickets = [open_ticket(test_consultation, 'Lab', 'Low', f'panel {i}') for i in range(5)]
+        LabResult.objects.create(ticket=tickets[0], labtechnician=test_labtechnician)
+        data, panel = submit(tickets, 20)
+
+        assert panel == single
+        assert data == {'closed_tickets': [t.id for t in tickets], 'observations': 100}
+        assert LabResult.objects.filter(ticket__in=tickets).count() == 5
+        assert LabObservation.objects.filter(labresult__ticket__in=tickets).count() == 100
+        assert LabObservation.objects.filter(labresult__ticket=tickets[0]).count() == 20
+        assert set(Ticket.objects.values_list('status', flat=True)) == {'Closed'}
+
+    def test_submit_results_is_all_or_nothing(self, api_client, test_radiologist, test_consultation):
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        radio = open_ticket(test_consultation, 'Radio', 'Low', 'x-ray')
+        lab = open_ticket(test_consultation, 'Lab', 'Low', 'blood')
+
+        response = api_client.post('/radio/dashboard/submit_results', {'observations': [
+            {'ticket_id': radio.id, 'title': 'chest'},
+            {'ticket_id': lab.id, 'title': 'chest'},
+        ]}, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        radio.refresh_from_db()
+        assert radio.status == 'Open'
+
+        for observations in [[], [{'ticket_id': radio.id}], [{'ticket_id': radio.id, 'title': 'x' * 81}]]:
+            response = api_client.post('/radio/dashboard/submit_results', {'observations': observations}, format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,97 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+from users.models import AppUser, Patient, Hospital
+from users.models import PatientSearchTerm
+from users.search import search_patients, rebuild_index
+from users.views import PatientListView, SearchPatientsView
+
+
+def create_patient(hospital, first_name, last_name, nss, phone_number):
+    user = User.objects.create_user(username=f'{first_name}_{last_name}', first_name=first_name, last_name=last_name)
+    app_user = AppUser.objects.create(
+        user=user, role='Patient', hospital=hospital, nss=nss, phone_number=phone_number,
+        address='a', date_of_birth='1990-01-01', place_of_birth='alger', gender='Male'
+    )
+    # indexed on save
+    return Patient.objects.create(user=app_user, emergency_contact_name='e', emergency_contact_phone='0', medical_condition='')
+
+
+@pytest.mark.django_db
+class TestPatientSearch:
+    @pytest.fixture
+    def patients(self, test_hospital):
+        return {
+            'amine': create_patient(test_hospital, 'Amine', 'Benali', '1850101', '0550 12 34 56'),
+            'amina': create_patient(test_hospital, 'Amina', 'Kaci', '2900505', '0661 98 76 54'),
+            'karim': create_patient(test_hospital, 'Karim', 'Bélaid', '1770303', '0770 11 22 33'),
+        }
+
+    def test_prefix_search_ranks_exact_matches_first(self, test_hospital, patients):
+        ranked = [patient_id for patient_id, _ in search_patients(test_hospital, 'amin')]
+        assert set(ranked[:2]) == {patients['amine'].id, patients['amina'].id}
+
+        ranked = [patient_id for patient_id, _ in search_patients(test_hospital, 'amina')]
+        assert ranked[0] == patients['amina'].id
+
+    def test_nss_phone_and_accents(self, test_hospital, patients):
+        assert search_patients(test_hospital, '2900')[0][0] == patients['amina'].id
+        assert search_patients(test_hospital, '0770112233')[0][0] == patients['karim'].id
+        assert search_patients(test_hospital, 'belaid')[0][0] == patients['karim'].id
+
+    def test_fuzzy_search_tolerates_typos(self, test_hospital, patients):
+        assert search_patients(test_hospital, 'benalli')[0][0] == patients['amine'].id
+
+    def test_search_is_hospital_scoped_and_follows_updates(self, test_hospital, patients):
+        other = Hospital.objects.create(name='Other Hospital')
+        create_patient(other, 'Amine', 'Other', '3000000', '0')
+        assert all(
+            patient_id != Patient.objects.get(user__nss='3000000').id
+            for patient_id, _ in search_patients(test_hospital, 'amine')
+        )
+
+        patient = patients['karim']
+        patient.user.user.last_name = 'Haddad'
+        patient.user.user.save()
+        assert search_patients(test_hospital, 'haddad')[0][0] == patient.id
+        patient.user.phone_number = '0555 00 00 00'
+        patient.user.save(update_fields=['phone_number'])
+        assert search_patients(test_hospital, '0555000000')[0][0] == patient.id
+        assert rebuild_index() == 4
+
+    def test_exact_matches_survive_the_candidate_cap(self, test_hospital, patients):
+        for i in range(30):
+            create_patient(test_hospital, f'Aminetou{i}', 'Saidi', f'4{i:06}', '0')
+        amine = create_patient(test_hospital, 'Amine', 'Zerrouki', '5000000', '0')
+        # 1 result looks at 20 candidate patients out of the 32 matching
+        assert search_patients(test_hospital, 'amine zerrouki', limit=1)[0][0] == amine.id
+
+    def test_profile_updates_are_indexed(self, api_client, test_patient, test_hospital):
+        api_client.force_authenticate(user=test_patient['user'])
+        response = api_client.patch(reverse('EditPatientProfile'), {'last_name': 'Mansouri'}, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert search_patients(test_hospital, 'mansouri')[0][0] == test_patient['patient'].id
+
+        # logins save the user without touching the index
+        terms = list(PatientSearchTerm.objects.values_list('id', flat=True))
+        test_patient['user'].save(update_fields=['last_login'])
+        assert list(PatientSearchTerm.objects.values_list('id', flat=True)) == terms
+
+    def test_search_view(self, authenticated_doctor_client, patients, django_assert_max_num_queries):
+        with django_assert_max_num_queries(4):
+            response = authenticated_doctor_client.get(reverse('search_patients'), {'q': 'kaci', 'fields': 'name,nss'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['patients'][0]['name'] == 'Amina Kaci'
+
+    def test_doctors_and_admins_share_the_views_not_the_permissions(self, authenticated_doctor_client, patients):
+        for name in ('patients_list', 'search_patients'):
+            assert authenticated_doctor_client.get(reverse(name), {'q': 'kaci'}).status_code == status.HTTP_200_OK
+        for name in ('get_patients', 'admin_search_patients'):
+            assert authenticated_doctor_client.get(reverse(name), {'q': 'kaci'}).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_views_require_authentication_without_route_permissions(self, patients):
+        request = APIRequestFactory().get('/patients', {'q': 'kaci'})
+        for view in (PatientListView, SearchPatientsView):
+            assert view.as_view()(request).status_code == status.HTTP_401_UNAUTHORIZED
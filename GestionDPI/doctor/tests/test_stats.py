@@ -0,0 +1,52 @@
+import pytest
+from datetime import date, datetime
+from django.utils.timezone import make_aware
+from doctor.models import Consultation
+from GestionDPI.stats import bucket_starts, time_series, labelled_time_series
+
+
+def test_month_buckets_cross_year_without_gaps():
+    """Month buckets follow the calendar, not 30/31-day offsets"""
+    assert bucket_starts('month', 6, end=date(2025, 3, 31)) == [
+        date(2024, 10, 1), date(2024, 11, 1), date(2024, 12, 1),
+        date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1),
+    ]
+
+
+def test_week_and_day_buckets():
+    """Weeks start on Monday and days are consecutive"""
+    assert bucket_starts('week', 2, end=date(2025, 1, 1)) == [date(2024, 12, 23), date(2024, 12, 30)]
+    assert bucket_starts('day', 3, end=date(2025, 3, 1)) == [date(2025, 2, 27), date(2025, 2, 28), date(2025, 3, 1)]
+
+
+def test_invalid_period():
+    with pytest.raises(ValueError):
+        bucket_starts('year', 3)
+
+
+@pytest.mark.django_db
+def test_time_series_is_gap_filled(test_consultation, test_doctor, test_patient, django_assert_num_queries):
+    """Each metric is one grouped query and empty buckets are 0"""
+    for created_at in (datetime(2025, 1, 31, 23), datetime(2025, 3, 1), datetime(2025, 3, 15), datetime(2024, 1, 1)):
+        consultation = Consultation.objects.create(
+            patient=test_patient['patient'], doctor=test_doctor['worker'],
+            priority='Low', reason='stats', resume=''
+        )
+        Consultation.objects.filter(id=consultation.id).update(created_at=make_aware(created_at))
+    Consultation.objects.filter(id=test_consultation.id).update(created_at=make_aware(datetime(2025, 2, 10)))
+
+    with django_assert_num_queries(2):
+        series = time_series({
+            'consultations': (Consultation.objects.all(), 'created_at'),
+            'archived': (Consultation.objects.filter(archived=True), 'created_at'),
+        }, end=date(2025, 3, 31), count=4)
+
+    assert series == [
+        (date(2024, 12, 1), {'consultations': 0, 'archived': 0}),
+        (date(2025, 1, 1), {'consultations': 1, 'archived': 0}),
+        (date(2025, 2, 1), {'consultations': 1, 'archived': 0}),
+        (date(2025, 3, 1), {'consultations': 2, 'archived': 0}),
+    ]
+    assert labelled_time_series(
+        {'consultations': (Consultation.objects.all(), 'created_at')}, end=date(2025, 3, 31), count=2
+    ) == [{'February': {'consultations': 1}}, {'March': {'consultations': 2}}]
@@ -0,0 +1,160 @@
+import os
+import pytest
+from cloudinary import CloudinaryResource
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from doctor.media import drain_media_deletions
+from doctor.models import LabImage, LabResult, MediaDeletion
+from doctor.tests.conftest import open_ticket, radiograph
+from users.models import AppUser
+from GestionDPI.storage import S3ImageStorage, get_image_storage, media_url, storage_for
+
+CONTENT = bytes(range(100))
+
+
+@pytest.fixture
+def stored(local_storage, tmp_path):
+    source = tmp_path / 'slice.png'
+    source.write_bytes(CONTENT)
+    image = get_image_storage().save(str(source), 'radio')
+    return image, media_url(image)
+
+
+@pytest.mark.django_db
+class TestLocalMediaFiles:
+    def test_whole_file(self, stored, client):
+        image, url = stored
+        assert url == f"/media/{image.public_id}.png"
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert b''.join(response.streaming_content) == CONTENT
+        assert (response['Content-Type'], response['Accept-Ranges']) == ('image/png', 'bytes')
+
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    @pytest.mark.parametrize('header, first, last', [
+        ('bytes=10-19', 10, 19),
+        ('bytes=90-', 90, 99),
+        ('bytes=-5', 95, 99),
+        ('bytes=95-500', 95, 99),
+    ])
+    def test_byte_ranges(self, stored, client, header, first, last):
+        response = client.get(stored[1], HTTP_RANGE=header)
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert b''.join(response.streaming_content) == CONTENT[first:last + 1]
+        assert response['Content-Range'] == f"bytes {first}-{last}/100"
+        assert response['Content-Length'] == str(last - first + 1)
+
+    def test_unserved_ranges(self, stored, client):
+        response = client.get(stored[1], HTTP_RANGE='bytes=100-')
+        assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response['Content-Range'] == 'bytes */100'
+        # several ranges, or a copy changed since, get the whole file
+        assert client.get(stored[1], HTTP_RANGE='bytes=0-1,5-6').status_code == status.HTTP_200_OK
+        response = client.get(stored[1], HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=http_date(0))
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_only_local_images_are_served(self, stored, client, local_storage):
+        prescriptions = os.path.join(local_storage.MEDIA_ROOT, 'prescriptions')
+        os.makedirs(prescriptions)
+        open(os.path.join(prescriptions, '1.pdf'), 'wb').close()
+        assert client.get('/media/local/../prescriptions/1.pdf').status_code == status.HTTP_404_NOT_FOUND
+        assert client.get('/media/local/radio/missing.png').status_code == status.HTTP_404_NOT_FOUND
+
+    def test_results_link_to_local_images(self, stored, client, api_client, test_consultation, test_labtechnician):
+        image, url = stored
+        ticket = open_ticket(test_consultation, 'Lab', 'Low', 'blood test')
+        LabImage.objects.create(labresult=LabResult.objects.create(ticket=ticket, labtechnician=test_labtechnician), image=image)
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+
+        images, _ = api_client.get(f'/lab/dashboard/get_result/{ticket.id}').json()
+        assert images[0]['image'] == url
+        assert client.get(images[0]['image']).status_code == status.HTTP_200_OK
+
+    @pytest.mark.parametrize('mode, header, value', [
+        ('x-accel-redirect', 'X-Accel-Redirect', '/protected-media/{public_id}.png'),
+        ('x-sendfile', 'X-Sendfile', '{media_root}/{public_id}.png'),
+    ])
+    def test_web_server_sends_the_file(self, stored, client, local_storage, mode, header, value):
+        local_storage.MEDIA_SENDFILE = mode
+        image, url = stored
+        response = client.get(url, HTTP_RANGE='bytes=0-1')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == b''
+        assert response[header] == value.format(public_id=image.public_id, media_root=local_storage.MEDIA_ROOT)
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, path, bucket, key, ExtraArgs):
+        with open(path, 'rb') as f:
+            self.objects[bucket, key] = (f.read(), ExtraArgs['ContentType'])
+
+    def delete_objects(self, Bucket, Delete):
+        for entry in Delete['Objects']:
+            self.objects.pop((Bucket, entry['Key']), None)
+        return {}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.example/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+class FakeS3Storage(S3ImageStorage):
+    def create_client(self):
+        return FakeS3()
+
+
+@pytest.mark.django_db
+class TestBackendSelection:
+    @pytest.fixture
+    def s3_storage(self, local_storage):
+        local_storage.IMAGE_STORAGE_BACKEND = 'doctor.tests.test_storage.FakeS3Storage'
+        local_storage.IMAGE_S3_BUCKET = 'dpi-images'
+        get_image_storage.cache_clear()
+        return get_image_storage()
+
+    def test_s3_images(self, s3_storage, tmp_path, local_storage):
+        source = tmp_path / 'slice.png'
+        source.write_bytes(CONTENT)
+        image = s3_storage.save(str(source), 'radio')
+
+        key = image.public_id.removeprefix('s3/') + '.png'
+        assert s3_storage.client.objects == {('dpi-images', key): (CONTENT, 'image/png')}
+        assert media_url(image) == f"https://s3.example/dpi-images/{key}?expires=21600"
+        local_storage.IMAGE_S3_PUBLIC_URL = 'https://cdn.example/images/'
+        assert media_url(image) == f"https://cdn.example/images/{key}"
+
+        s3_storage.delete_many([image])
+        assert s3_storage.client.objects == {}
+
+    def test_images_stay_with_the_backend_holding_them(self, stored, s3_storage, mocker):
+        local_image, local_url = stored
+        cloudinary_image = CloudinaryResource('radio/legacy', format='jpg', version=1700000000, resource_type='image')
+
+        assert storage_for(local_image).url(local_image) == local_url
+        assert media_url(cloudinary_image) == cloudinary_image.url
+
+        delete_resources = mocker.patch('cloudinary.api.delete_resources')
+        MediaDeletion.objects.bulk_create([MediaDeletion(image=local_image), MediaDeletion(image=cloudinary_image)])
+        assert drain_media_deletions() == (2, 0)
+        assert not os.path.exists(storage_for(local_image).path(local_image))
+        delete_resources.assert_called_once_with(['radio/legacy'], resource_type='image', type='upload', invalidate=True)
+
+    def test_profile_images_use_the_configured_backend(self, local_storage, authenticated_doctor_client, test_doctor):
+        response = authenticated_doctor_client.patch(reverse('myuser_modify'), {'image': radiograph('me.png')}, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+
+        image = AppUser.objects.get(id=test_doctor['app_user'].id).image
+        assert image.public_id.startswith('local/users/')
+        with open(get_image_storage().path(image), 'rb') as f:
+            assert f.read() == b'\x89PNG fake radiograph'
+
+    def test_patients_update_their_profile_image(self, local_storage, api_client, test_patient):
+        api_client.force_authenticate(user=test_patient['user'])
+        response = api_client.patch(reverse('EditPatientProfile'), {'image': radiograph('me.png')}, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert AppUser.objects.get(id=test_patient['app_user'].id).image.public_id.startswith('local/users/')
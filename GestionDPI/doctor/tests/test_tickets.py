@@ -0,0 +1,154 @@
+import pytest
+from django.db import connection
+from rest_framework import status
+from doctor.models import Consultation, LabResult, Ticket
+from doctor.tickets import open_tickets
+from doctor.tests.conftest import open_ticket
+
+
+@pytest.mark.django_db
+class TestOpenTicketQueue:
+    @pytest.mark.parametrize('url, type, worker', [
+        ('/lab/dashboard/get_open_tickets', 'Lab', 'test_labtechnician'),
+        ('/radio/dashboard/get_open_tickets', 'Radio', 'test_radiologist'),
+        ('/nurse/dashboard/get_open_tickets', 'Nursing', 'test_nurse'),
+    ])
+    def test_open_tickets_are_ordered_by_priority_then_age(
+        self, request, api_client, test_consultation, url, type, worker
+    ):
+        """The queue is most urgent first, oldest first within a priority"""
+        api_client.force_authenticate(user=request.getfixturevalue(worker).user.user)
+        open_ticket(test_consultation, type, 'Low', 'old low', age=30)
+        open_ticket(test_consultation, type, 'Critical', 'new critical', age=1)
+        open_ticket(test_consultation, type, 'Medium', 'medium', age=10)
+        open_ticket(test_consultation, type, 'Critical', 'old critical', age=20)
+        open_ticket(test_consultation, 'Lab' if type != 'Lab' else 'Radio', 'Critical', 'other type')
+
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [t['title'] for t in response.json()] == ['old critical', 'new critical', 'medium', 'old low']
+
+    @pytest.mark.skipif(connection.vendor != 'sqlite', reason="reads SQLite's query plan")
+    def test_open_tickets_are_read_in_index_order(self, test_consultation):
+        """The queue's ORDER BY is served by the index instead of sorting the whole queue"""
+        open_ticket(test_consultation, 'Lab', 'Low', 'low')
+        queue = open_tickets(test_consultation.doctor.user.hospital, 'Lab')
+        sql, params = queue.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        assert 'doctor_tick_hospita_e02476_idx' in plan
+        assert 'TEMP B-TREE FOR ORDER BY' not in plan
+
+    def test_open_tickets_load_in_constant_queries(
+        self, api_client, test_labtechnician, test_consultation, test_patient, test_doctor, django_assert_num_queries
+    ):
+        """Expanding consultations, patients and doctors costs the same for 1 or 10 tickets"""
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        for i in range(10):
+            consultation = Consultation.objects.create(
+                patient=test_patient['patient'], doctor=test_doctor['worker'], priority='Low', reason=f'reason {i}'
+            )
+            open_ticket(consultation, 'Lab', 'Medium', f'ticket {i}')
+
+        # the tickets with their whole chain, then the consultation counts
+        with django_assert_num_queries(2):
+            response = api_client.get('/lab/dashboard/get_open_tickets')
+
+        tickets = response.json()
+        assert len(tickets) == 10
+        patient = tickets[0]['consultation']['patient']
+        assert patient['consultation_count'] == 11
+        assert patient['user']['user']['first_name'] == 'Test'
+        assert tickets[0]['consultation']['doctor']['user']['user']['last_name'] == 'Doctor'
+
+
+@pytest.mark.django_db
+class TestClosedTickets:
+    def test_ticket_history_resolves_workers_in_bulk(
+        self, api_client, test_labtechnician, test_consultation, django_assert_num_queries
+    ):
+        """A history page costs the same number of queries whatever its size"""
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+        for i in range(10):
+            ticket = open_ticket(test_consultation, 'Lab', 'Low', f'ticket {i}')
+            Ticket.objects.filter(id=ticket.id).update(status='Closed')
+            LabResult.objects.create(ticket=ticket, labtechnician=test_labtechnician)
+
+        # count, page and the workers who closed the page's tickets
+        with django_assert_num_queries(3):
+            response = api_client.get('/lab/get_ticket_history')
+
+        results = response.json()['results']
+        assert len(results) == 10
+        assert {r['worker']['id'] for r in results} == {test_labtechnician.id}
+        assert results[0]['worker']['user']['user']['last_name'] == 'LabTechnician'
+        assert results[0]['consultation']['patient']['user']['user']['first_name'] == 'Test'
+
+        with django_assert_num_queries(2):
+            response = api_client.get(f"/lab/get_ticket/{results[0]['id']}")
+        assert response.json()['worker'] == results[0]['worker']
+
+    def test_worker_of_ticket_without_result_is_null(self, api_client, test_radiologist, test_consultation):
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        ticket = open_ticket(test_consultation, 'Radio', 'Low', 'no result')
+        Ticket.objects.filter(id=ticket.id).update(status='Closed')
+
+        response = api_client.get(f'/radio/get_ticket/{ticket.id}')
+        assert response.json()['worker'] is None
+
+    @pytest.mark.parametrize('count, expected', [('exact', 12), ('cached', 12), ('estimate', 12), ('none', None)])
+    def test_ticket_history_cursor_pagination(
+        self, api_client, test_radiologist, test_consultation, count, expected, django_assert_max_num_queries
+    ):
+        """Cursor pages are newest first and cost the same at any depth"""
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        for i in range(12):
+            ticket = open_ticket(test_consultation, 'Radio', 'Low', f'ticket {i}', age=i)
+            Ticket.objects.filter(id=ticket.id).update(status='Closed')
+
+        titles, cursor = [], None
+        while True:
+            params = {'pagination': 'cursor', 'page_size': 5, 'count': count}
+            if cursor:
+                params['cursor'] = cursor
+            with django_assert_max_num_queries(3):
+                data = api_client.get('/radio/get_ticket_history', params).json()
+            assert data['count'] == expected
+            titles += [t['title'] for t in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert titles == [f'ticket {i}' for i in range(12)]
+
+        response = api_client.get('/radio/get_ticket_history', {'pagination': 'offset'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        # numbered pages need the total
+        response = api_client.get('/radio/get_ticket_history', {'count': 'none'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_ticket_history_cached_count(self, api_client, test_nurse, test_consultation, django_assert_num_queries):
+        api_client.force_authenticate(user=test_nurse.user.user)
+        ticket = open_ticket(test_consultation, 'Nursing', 'Low', 'first')
+        Ticket.objects.filter(id=ticket.id).update(status='Closed')
+
+        assert api_client.get('/nurse/get_ticket_history', {'count': 'cached'}).json()['count'] == 1
+        ticket = open_ticket(test_consultation, 'Nursing', 'Low', 'second')
+        Ticket.objects.filter(id=ticket.id).update(status='Closed')
+        data = api_client.get('/nurse/get_ticket_history', {'count': 'cached'}).json()
+        assert (data['count'], len(data['results'])) == (1, 2)
+        assert api_client.get('/nurse/get_ticket_history').json()['count'] == 2
+
+    def test_patient_list_cursor_pagination(self, api_client, test_labtechnician, test_consultation, django_assert_num_queries):
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+
+        with django_assert_num_queries(2):
+            data = api_client.get('/lab/get_patients_list', {'pagination': 'cursor', 'count': 'exact'}).json()
+        assert data['count'] == 1
+        assert data['next_cursor'] is None
+        assert data['results'][0]['consultation_count'] == 1
+        assert data['results'][0]['user']['user']['last_name'] == 'Patient'
+
+        data = api_client.get('/lab/get_patients_list').json()
+        assert (data['count'], data['num_pages'], data['current_page']) == (1, 1, 1)
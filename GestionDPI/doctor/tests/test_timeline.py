@@ -0,0 +1,93 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from doctor.models import (
+    Ticket, Prescription, LabResult, LabImage, LabObservation,
+    RadioResult, RadioImage, RadioObservation, NursingResult, NursingObservation
+)
+from doctor.timeline import ConsultationTimeline
+
+
+def seed_results(consultation, labtechnician, radiologist, nurse, count):
+    """Attach `count` lab, radio and nursing results (with images and observations) to a consultation"""
+    for i in range(count):
+        for type, worker in (('Lab', labtechnician), ('Radio', radiologist), ('Nursing', nurse)):
+            ticket = Ticket.objects.create(
+                consultation=consultation,
+                hospital=consultation.doctor.user.hospital,
+                type=type,
+                title=f'{type} ticket {i}',
+                description='test',
+                priority='Low',
+                status='Closed'
+            )
+            if type == 'Lab':
+                result = LabResult.objects.create(ticket=ticket, labtechnician=worker)
+                LabImage.objects.create(labresult=result, image='sample')
+                LabObservation.objects.create(labresult=result, title='obs', notes='notes')
+            elif type == 'Radio':
+                result = RadioResult.objects.create(ticket=ticket, radiologist=worker)
+                RadioImage.objects.create(radioresult=result, image='sample')
+                RadioObservation.objects.create(radioresult=result, title='obs', notes='notes')
+            else:
+                result = NursingResult.objects.create(ticket=ticket, nurse=worker)
+                NursingObservation.objects.create(nursingresult=result, title='obs', notes='notes')
+        Prescription.objects.create(consultation=consultation, status='Pending', notes='notes')
+
+
+@pytest.mark.django_db
+class TestConsultationTimeline:
+    def test_timeline_query_count_is_constant(
+        self, django_assert_num_queries, test_consultation,
+        test_labtechnician, test_radiologist, test_nurse
+    ):
+        """The timeline costs the same number of queries for 1 or 15 results per department"""
+        seed_results(test_consultation, test_labtechnician, test_radiologist, test_nurse, 1)
+        with django_assert_num_queries(9):
+            timeline = ConsultationTimeline(test_consultation.id).build()
+        assert len(timeline) == 6
+
+        seed_results(test_consultation, test_labtechnician, test_radiologist, test_nurse, 14)
+        with django_assert_num_queries(9):
+            timeline = ConsultationTimeline(test_consultation.id).build()
+        assert len(timeline) == 90
+
+    def test_timeline_entries(self, test_consultation, test_labtechnician, test_radiologist, test_nurse):
+        """Entries keep the attachments endpoint format"""
+        seed_results(test_consultation, test_labtechnician, test_radiologist, test_nurse, 1)
+        timeline = ConsultationTimeline(test_consultation.id).build()
+
+        types = [entry['type'] for entry in timeline]
+        assert types == [
+            'Lab_image', 'lab_observation', 'Radio_image',
+            'Radio_observation', 'nursing_observation', 'prescription'
+        ]
+        assert timeline[0]['title'] == 'Lab ticket 0'
+        assert timeline[0]['made_by'] == 'Test LabTechnician'
+        assert timeline[-1]['made_by'] == 'Test Doctor'
+
+    def test_attachments_view(self, authenticated_doctor_client, test_consultation,
+                              test_labtechnician, test_radiologist, test_nurse):
+        """getAttachmentsView serves the timeline"""
+        seed_results(test_consultation, test_labtechnician, test_radiologist, test_nurse, 2)
+        url = reverse('get_attachments', args=[test_consultation.id])
+        response = authenticated_doctor_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()['results']) == 12
+
+    def test_timeline_is_cached_until_invalidated(
+        self, django_assert_num_queries, test_consultation,
+        test_labtechnician, test_radiologist, test_nurse
+    ):
+        """A cached timeline is served without queries and rebuilt after invalidation"""
+        seed_results(test_consultation, test_labtechnician, test_radiologist, test_nurse, 1)
+        timeline = ConsultationTimeline(test_consultation.id)
+        assert len(timeline.get()) == 6
+
+        with django_assert_num_queries(0):
+            assert len(timeline.get()) == 6
+
+        Prescription.objects.create(consultation=test_consultation, status='Pending', notes='notes')
+        ConsultationTimeline.invalidate(test_consultation.id)
+        assert len(timeline.get()) == 7
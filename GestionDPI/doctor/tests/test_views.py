@@ -1,6 +1,9 @@
 import pytest
 from django.urls import reverse
 from rest_framework import status
+from django.contrib.auth.models import User
+from users.models import AppUser, Patient
+from doctor.models import Consultation, Prescription
 
 @pytest.mark.django_db
 class TestDoctorViews:
@@ -63,4 +66,109 @@ class TestDoctorViews:
         
         # Test GetPatientsList
         response = api_client.get(reverse('patients_list'))
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
\ No newline at end of file
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    def test_get_dpi_consultations_are_paginated(
+        self, authenticated_doctor_client, test_doctor, test_patient, django_assert_max_num_queries
+    ):
+        """GetDPIConsultationsView returns consultations newest first, one cursor page at a time"""
+        for i in range(25):
+            consultation = Consultation.objects.create(
+                patient=test_patient['patient'],
+                doctor=test_doctor['worker'],
+                priority='Low',
+                reason=f'Consultation {i}',
+                resume=''
+            )
+            Prescription.objects.create(consultation=consultation, status='Pending', notes='')
+            Prescription.objects.create(consultation=consultation, status='Completed', notes='')
+        url = reverse('get_dpi_consultations', args=[test_patient['app_user'].id])
+
+        with django_assert_max_num_queries(4):
+            response = authenticated_doctor_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data['consultations_list']) == 20
+        assert data['consultations_list'][0]['reason'] == 'Consultation 24'
+        assert data['consultations_list'][0]['sgph'] == 'Completed'
+        assert data['consultations_list'][0]['doctor_name'] == 'Test Doctor'
+
+        response = authenticated_doctor_client.get(url, {'cursor': data['next_cursor']})
+        data = response.json()
+        assert [c['reason'] for c in data['consultations_list']] == [f'Consultation {i}' for i in range(4, -1, -1)]
+        assert data['next_cursor'] is None
+
+        response = authenticated_doctor_client.get(url, {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_get_dpi_serves_materialized_document(self, authenticated_doctor_client, test_patient, test_consultation):
+        """GetDPIView serves the materialized DPI with an ETag that changes on every update"""
+        url = reverse('get_dpi', args=[test_patient['app_user'].id])
+        response = authenticated_doctor_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response['ETag']
+        assert len(response.json()['consultations_list']) == 1
+
+        response = authenticated_doctor_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = authenticated_doctor_client.post(reverse('create_consultation'), {
+            'patient_id': test_patient['app_user'].id, 'priority': 'Medium', 'reason': 'Follow up'
+        }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        response = authenticated_doctor_client.post(reverse('archive_consultation'), {
+            'consultation_id': test_consultation.id, 'resume': 'Healed'
+        }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = authenticated_doctor_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+        consultations = response.json()['consultations_list']
+        assert [c['reason'] for c in consultations] == ['Follow up', 'Test consultation']
+        assert consultations[1]['archived'] is True
+        assert consultations[1]['lasted_for'] == 0
+
+    def test_get_dpi_follows_doctor_renames(self, authenticated_doctor_client, test_patient, test_consultation):
+        """Renaming a doctor changes the ETag and the rows of the DPIs listing their consultations"""
+        url = reverse('get_dpi', args=[test_patient['app_user'].id])
+        response = authenticated_doctor_client.get(url)
+        etag = response['ETag']
+        assert response.json()['consultations_list'][0]['doctor_name'] == 'Test Doctor'
+
+        response = authenticated_doctor_client.patch(reverse('myuser_modify'), {'last_name': 'Renamed'}, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = authenticated_doctor_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+        assert response.json()['consultations_list'][0]['doctor_name'] == 'Test Renamed'
+
+    def test_get_patients_list_pages_in_constant_queries(
+        self, authenticated_doctor_client, test_hospital, test_patient, test_consultation, django_assert_max_num_queries
+    ):
+        """GetPatientsList walks the directory with a cursor and sparse fields"""
+        for i in range(4):
+            user = User.objects.create_user(username=f'patient{i}', last_name=f'Z{i}', first_name='P')
+            app_user = AppUser.objects.create(
+                user=user, role='Patient', hospital=test_hospital, nss=f'10{i}',
+                phone_number='0', address='a', date_of_birth='1990-01-01', place_of_birth='alger', gender='Male'
+            )
+            Patient.objects.create(user=app_user, emergency_contact_name='e', emergency_contact_phone='0', medical_condition='')
+        url = reverse('patients_list')
+
+        with django_assert_max_num_queries(3):
+            response = authenticated_doctor_client.get(url, {'page_size': 2, 'fields': 'name,nss,consultation_count'})
+        data = response.json()
+        assert data['patients'] == [
+            {'name': 'Test Patient', 'nss': '999', 'consultation_count': 1},
+            {'name': 'P Z0', 'nss': '100', 'consultation_count': 0},
+        ]
+
+        names = [p['name'] for p in data['patients']]
+        while data['next_cursor']:
+            data = authenticated_doctor_client.get(url, {'page_size': 2, 'fields': 'name', 'cursor': data['next_cursor']}).json()
+            names += [p['name'] for p in data['patients']]
+        assert names == ['Test Patient', 'P Z0', 'P Z1', 'P Z2', 'P Z3']
+
+        response = authenticated_doctor_client.get(url, {'fields': 'name,password'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,64 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from doctor.models import LabImage, LabObservation, LabResult, NursingObservation, NursingResult
+from doctor.tests.conftest import open_ticket
+from doctor.workflow import WORKFLOWS
+
+
+def test_every_department_mounts_its_workflow():
+    for prefix, type in (('lab', 'Lab'), ('radio', 'Radio'), ('nurse', 'Nursing')):
+        match = resolve(f'/{prefix}/dashboard/get_result/1')
+        assert match.func.view_initkwargs['ticket_type'] == type
+        assert match.func.view_initkwargs['permission_classes'] == [WORKFLOWS[type].permission]
+    # departments without images get no image endpoints
+    with pytest.raises(Resolver404):
+        resolve('/nurse/dashboard/add_image')
+
+
+@pytest.mark.django_db
+class TestResultWorkflow:
+    def test_get_result_in_three_queries(self, api_client, test_consultation, test_labtechnician):
+        ticket = open_ticket(test_consultation, 'Lab', 'Low', 'blood test')
+        result = LabResult.objects.create(ticket=ticket, labtechnician=test_labtechnician)
+        for i in range(3):
+            LabImage.objects.create(labresult=result, image=f'sample{i}')
+            LabObservation.objects.create(labresult=result, title=f'analyte {i}', notes='normal')
+        api_client.force_authenticate(user=test_labtechnician.user.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f'/lab/dashboard/get_result/{ticket.id}')
+        assert response.status_code == status.HTTP_200_OK
+        images, observations = response.json()
+        assert [observation['title'] for observation in observations] == ['analyte 0', 'analyte 1', 'analyte 2']
+        assert len(images) == 3
+        # the result with its ticket, then the observations and the images
+        assert len(queries) == 3
+
+    def test_results_are_scoped_to_the_department(self, api_client, test_consultation, test_nurse, test_radiologist):
+        ticket = open_ticket(test_consultation, 'Nursing', 'Low', 'bandage')
+        result = NursingResult.objects.create(ticket=ticket, nurse=test_nurse)
+        NursingObservation.objects.create(nursingresult=result, title='bandage changed', notes='clean')
+
+        api_client.force_authenticate(user=test_nurse.user.user)
+        response = api_client.get(f'/nurse/dashboard/get_result/{ticket.id}')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [{'id': result.nursingobservation_set.get().id, 'title': 'bandage changed', 'notes': 'clean'}]
+
+        api_client.force_authenticate(user=test_radiologist.user.user)
+        assert api_client.get(f'/radio/dashboard/get_result/{ticket.id}').status_code == status.HTTP_404_NOT_FOUND
+        radio_ticket = open_ticket(test_consultation, 'Radio', 'Low', 'x-ray')
+        assert api_client.get(f'/radio/dashboard/get_result/{radio_ticket.id}').status_code == status.HTTP_404_NOT_FOUND
+
+    def test_submit_result_through_the_nursing_workflow(self, api_client, test_consultation, test_nurse):
+        ticket = open_ticket(test_consultation, 'Nursing', 'Medium', 'injection')
+        api_client.force_authenticate(user=test_nurse.user.user)
+
+        response = api_client.post('/nurse/dashboard/submit_result', {'ticket_id': ticket.id, 'title': 'done'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert NursingResult.objects.get(ticket=ticket).nurse == test_nurse
+        response = api_client.get('/nurse/get_ticket_history')
+        assert [entry['id'] for entry in response.json()['results']] == [ticket.id]
+        assert response.json()['results'][0]['worker']['id'] == test_nurse.id
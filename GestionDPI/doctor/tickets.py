@@ -0,0 +1,78 @@
+from django.db.models import Count
+from doctor.models import Consultation, Ticket
+from doctor.workflow import get_workflow
+
+
+def open_tickets(hospital, type):
+    """
+    Open tickets of a type in a hospital, most urgent then oldest first.
+
+    The filter and the order are both served by the `(hospital, type,
+    status, priority_rank, created_at)` index, so the queue is read in
+    index order without sorting, and the consultation, its patient and
+    doctor and their users are joined, so the whole queue is a single query.
+    """
+    return (
+        Ticket.objects.filter(hospital=hospital, type=type, status='Open')
+        .select_related(
+            'consultation__doctor__user__user',
+            'consultation__patient__user__user',
+        )
+        .order_by('priority_rank', 'created_at', 'id')
+    )
+
+
+def preload_consultation_counts(tickets):
+    """
+    Load the consultation count of every ticket's patient with one grouped
+    query, for `Patient.number_of_consultations`.
+    """
+    tickets = list(tickets)
+    patients = {ticket.consultation.patient_id: ticket.consultation.patient for ticket in tickets}
+    counts = dict(
+        Consultation.objects.filter(patient_id__in=patients)
+        .values('patient_id')
+        .annotate(count=Count('id'))
+        .values_list('patient_id', 'count')
+        .order_by()
+    )
+    for ticket in tickets:
+        ticket.consultation.patient.consultation_count = counts.get(ticket.consultation.patient_id, 0)
+    return tickets
+
+
+def open_ticket_queue(hospital, type):
+    """The open ticket queue ready for `TicketSerializer`, in two queries."""
+    return preload_consultation_counts(open_tickets(hospital, type))
+
+
+def closed_tickets(hospital, type):
+    """Closed tickets of a type in a hospital with their consultation chain joined."""
+    return Ticket.objects.filter(hospital=hospital, type=type, status='Closed').select_related(
+        'consultation__doctor__user__user',
+        'consultation__patient__user__user',
+    )
+
+
+def resolve_ticket_workers(tickets):
+    """
+    Map ticket ids to the worker who closed them, with the worker's AppUser
+    and User loaded, in one query per ticket type present in `tickets`.
+
+    Pass it to `TicketSerializer` as the `workers` context entry so
+    `get_worker` does not load every result and worker one by one.
+    """
+    ids_by_type = {}
+    for ticket in tickets:
+        if ticket.status == 'Closed':
+            ids_by_type.setdefault(ticket.type, []).append(ticket.id)
+
+    workers = {}
+    for type, ids in ids_by_type.items():
+        workflow = get_workflow(type)
+        results = workflow.result_model.objects.filter(ticket_id__in=ids).select_related(
+            f'{workflow.worker_field}__user__user'
+        )
+        for result in results:
+            workers[result.ticket_id] = getattr(result, workflow.worker_field)
+    return workers
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.core.cache import cache
+from doctor.derivatives import variant_urls
+from doctor.models import LabResult, RadioResult, NursingResult, Prescription
+from GestionDPI.storage import media_url
+
+
+def _author(worker):
+    return {
+        'made_by': f"{worker.user.user.first_name} {worker.user.user.last_name}",
+        'profile_image': media_url(worker.user.image),
+    }
+
+
+class ConsultationTimeline:
+    """
+    Attachments list (results, images, observations, prescriptions) of a
+    consultation, shared by the doctor and patient views.
+
+    The built list is cached per consultation; every view that adds or removes
+    an attachment must call `ConsultationTimeline.invalidate(consultation_id)`.
+    """
+
+    def __init__(self, consultation_id):
+        self.consultation_id = consultation_id
+
+    @staticmethod
+    def cache_key(consultation_id):
+        return f"consultation_timeline:{consultation_id}"
+
+    @classmethod
+    def invalidate(cls, consultation_id):
+        cache.delete(cls.cache_key(consultation_id))
+
+    def get(self):
+        key = self.cache_key(self.consultation_id)
+        timeline = cache.get(key)
+        if timeline is None:
+            timeline = self.build()
+            cache.set(key, timeline, settings.CONSULTATION_TIMELINE_CACHE_TIMEOUT)
+        return timeline
+
+    def build(self):
+        """
+        Every relation is loaded up front with select_related / prefetch_related
+        so the number of queries stays fixed (9) whatever the number of attachments.
+        """
+        consultation_id = self.consultation_id
+        timeline = []
+
+        lab_results = (
+            LabResult.objects.filter(ticket__consultation_id=consultation_id)
+            .select_related('ticket', 'labtechnician__user__user')
+            .prefetch_related('labimage_set', 'labobservation_set')
+        )
+        for result in lab_results:
+            author = _author(result.labtechnician)
+            for image in result.labimage_set.all():
+                timeline.append({
+                    'type': 'Lab_image',
+                    'title': result.ticket.title,
+                    **author,
+                    'created_at': result.created_at,
+                    'attachment_id': image.id,
+                    'image_url': media_url(image.image),
+                    'variants': variant_urls(image),
+                })
+            for obs in result.labobservation_set.all():
+                timeline.append({
+                    'type': 'lab_observation',
+                    'title': result.ticket.title,
+                    **author,
+                    'created_at': result.created_at,
+                    'attachment_id': obs.id,
+                })
+
+        radio_results = (
+            RadioResult.objects.filter(ticket__consultation_id=consultation_id)
+            .select_related('ticket', 'radiologist__user__user')
+            .prefetch_related('radioimage_set', 'radioobservation_set')
+        )
+        for result in radio_results:
+            author = _author(result.radiologist)
+            for image in result.radioimage_set.all():
+                timeline.append({
+                    'type': 'Radio_image',
+                    'title': result.ticket.title,
+                    **author,
+                    'created_at': result.created_at,
+                    'attachment_id': image.id,
+                    'image_url': media_url(image.image),
+                    'variants': variant_urls(image),
+                })
+            for obs in result.radioobservation_set.all():
+                timeline.append({
+                    'type': 'Radio_observation',
+                    'title': result.ticket.title,
+                    **author,
+                    'created_at': result.created_at,
+                    'attachment_id': obs.id,
+                })
+
+        nursing_results = (
+            NursingResult.objects.filter(ticket__consultation_id=consultation_id)
+            .select_related('ticket', 'nurse__user__user')
+            .prefetch_related('nursingobservation_set')
+        )
+        for result in nursing_results:
+            author = _author(result.nurse)
+            for obs in result.nursingobservation_set.all():
+                timeline.append({
+                    'type': 'nursing_observation',
+                    'title': result.ticket.title,
+                    **author,
+                    'created_at': result.created_at,
+                    'attachment_id': obs.id,
+                })
+
+        prescriptions = (
+            Prescription.objects.filter(consultation_id=consultation_id)
+            .select_related('consultation__doctor__user__user')
+        )
+        for prescription in prescriptions:
+            timeline.append({
+                'type': 'prescription',
+                'title': 'Doctor Prescription',
+                **_author(prescription.consultation.doctor),
+                'created_at': prescription.created_at,
+                'attachment_id': prescription.id,
+            })
+
+        return timeline
@@ -3,15 +3,17 @@ from doctor.views import (
     DoctorOnlyView,
     GetPatientView,
     ModifyMyUser,
-    GetPatientsList,
     CreateConultationView,
     getConultationView,
     getAttachmentsView,
     CreateTicketView,
     CreatePrescriptionView,
+    SearchMedicinesView,
     ArchiveConsultationView,
     GetPrescriptionView,
+    PrintPrescriptionView,
     GetDPIView,
+    GetDPIConsultationsView,
     GetLabImageView,
     GetRadioImageView,
     GetRadioObservationView,
@@ -19,6 +21,9 @@ from doctor.views import (
     GetNurseObservationView,
     GenerateQRView
 )
+from users.views import PatientListView, SearchPatientsView
+from GestionDPI.permissions import IsDoctor
+from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -26,15 +31,19 @@ urlpatterns = [
     path('home', DoctorOnlyView.as_view(), name='doctor_home'),
     path('getpatient/<int:user_id>', GetPatientView.as_view(), name='get_patient'),
     path('modifymyuser', ModifyMyUser.as_view(), name='myuser_modify'),
-    path('patients', GetPatientsList.as_view(), name='patients_list'),
+    path('patients', PatientListView.as_view(permission_classes=[IsAuthenticated, IsDoctor]), name='patients_list'),
+    path('patients/search', SearchPatientsView.as_view(permission_classes=[IsAuthenticated, IsDoctor]), name='search_patients'),
     path('consultation/create', CreateConultationView.as_view(), name='create_consultation'),
     path('consultation/get/<int:consultation_id>', getConultationView.as_view(), name='get_consultation'),
     path('consultation/attachments/<int:consultation_id>', getAttachmentsView.as_view(), name='get_attachments'),
     path('consultation/archive', ArchiveConsultationView.as_view(), name='archive_consultation'),
     path('ticket/create', CreateTicketView.as_view(), name='create_ticket'),
     path('prescription/create', CreatePrescriptionView.as_view(), name='create_prescription'),
+    path('medicines/search', SearchMedicinesView.as_view(), name='search_medicines'),
     path('prescription/get/<int:prescription_id>', GetPrescriptionView.as_view(), name='get_prescription'),
+    path('prescription/print/<int:prescription_id>', PrintPrescriptionView.as_view(), name='print_prescription'),
     path('dpi/get/<int:id>', GetDPIView.as_view(), name='get_dpi'),
+    path('dpi/consultations/<int:id>', GetDPIConsultationsView.as_view(), name='get_dpi_consultations'),
     path('lab/image/<int:id>', GetLabImageView.as_view(), name='get_lab_image'),
     path('radio/image/<int:id>', GetRadioImageView.as_view(), name='get_radio_image'),
     path('radio/observation/<int:id>', GetRadioObservationView.as_view(), name='get_radio_observation'),
@@ -4,17 +4,25 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.http import JsonResponse 
-from datetime import datetime, timedelta,date
-from django.utils.timezone import now
-from users.models import AppUser,Patient,Worker
-from doctor.models import Consultation,Ticket,Prescription,PrescriptionDetail,Medicine,LabResult,LabImage,LabObservation,RadioImage,RadioObservation,RadioResult,NursingObservation,NursingResult
-from django.db.models.functions import TruncMonth
-from django.db.models import Count
-from calendar import month_name
+from datetime import datetime
+from users.models import AppUser,Patient
+from doctor.models import Consultation,Ticket,Prescription,PrescriptionDetail,LabResult,LabImage,LabObservation,RadioImage,RadioObservation,RadioResult,NursingObservation,NursingResult
+from doctor.derivatives import variant_urls
+from doctor.timeline import ConsultationTimeline
+from doctor.medicines import medicine_index, medicine_key, resolve_medicine_ids
+from doctor.prescriptions import RENDER_FORMATS, prescription_document, prescriptions_for_print, render_prescription
+from doctor.dpi import dpi_consultations, serialize_dpi_consultation, get_patient_dpi, refresh_dpi_consultation
+from GestionDPI.pagination import KeysetPaginator, InvalidCursor
+from GestionDPI.storage import media_url, save_uploaded_image
+from GestionDPI.events import publish_ticket_event
+from GestionDPI.stats import PERIODS, labelled_time_series
+from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction
 from django.contrib.auth.models import User
 from rest_framework import status
 import qrcode
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 import io
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample, OpenApiResponse
 from drf_spectacular.types import OpenApiTypes
@@ -28,8 +36,11 @@ from drf_spectacular.types import OpenApiTypes
     - Recent consultations
     - Patient statistics
     - Recent tickets
-    - Six-month analytics
+    - Six-month analytics (or six weeks/days with ?period=week|day)
     """,
+    parameters=[
+        OpenApiParameter(name='period', type=str, location=OpenApiParameter.QUERY, required=False, enum=['month', 'week', 'day'], description='Stats bucket size (default month)')
+    ],
     responses={
         200: OpenApiTypes.OBJECT,
         401: OpenApiTypes.OBJECT,
@@ -70,7 +81,7 @@ class DoctorOnlyView(APIView):
           'nss':user.appuser.nss,
           'phone_number':user.appuser.phone_number,
           'email':user.email,
-          'profile_image':user.appuser.image.url
+          'profile_image':media_url(user.appuser.image)
         }
         
         current_doctor = request.user.appuser.worker
@@ -99,41 +110,17 @@ class DoctorOnlyView(APIView):
           for patient in recent_patients
         ]
        
-        current_month = now()
-        six_months_ago = current_month - timedelta(days=6 * 30)
-        
-        consultation_stats = (
-            Consultation.objects.filter(created_at__gte=six_months_ago,doctor=current_doctor)
-            .annotate(month=TruncMonth('created_at'))
-            .values('month')
-            .annotate(count=Count('id'))
-            .order_by('month')
+        period = request.query_params.get('period', 'month')
+        if period not in PERIODS:
+            return JsonResponse({'error': f"{period} is not a valid period."}, status=400)
+        stats_list = cache.get_or_set(
+            f"doctor_stats:{current_doctor.id}:{period}",
+            lambda: labelled_time_series({
+                'patients': (AppUser.objects.filter(role='Patient', hospital=request.user.appuser.hospital), 'created_at'),
+                'consultations': (Consultation.objects.filter(doctor=current_doctor), 'created_at'),
+            }, period=period),
+            settings.DASHBOARD_STATS_CACHE_TIMEOUT
         )
-        
-        patient_stats = (
-            AppUser.objects.filter(role='Patient', created_at__gte=six_months_ago,hospital=request.user.appuser.hospital)
-            .annotate(month=TruncMonth('created_at'))
-            .values('month')
-            .annotate(count=Count('id'))
-            .order_by('month')
-        )
-
-       
-        stats_list =[]
-        for i in range(6):
-          stats_list.append({
-            month_name[(six_months_ago + timedelta(days=31 * i)).month]: {
-                'patients': next(
-                    (entry['count'] for entry in patient_stats if entry['month'].month == (six_months_ago + timedelta(days=31 * i)).month),
-                    0
-                ),
-                'consultations': next(
-                    (entry['count'] for entry in consultation_stats if entry['month'].month == (six_months_ago + timedelta(days=31 * i)).month),
-                    0
-                ),
-            }
-            
-          })
         recent_consultations_ids= [consultation.id for consultation in recent_consultations]
         top_tickets =  Ticket.objects.filter(consultation__in=recent_consultations_ids).order_by('-created_at')[:8]
         top_tickets_serialized= [] 
@@ -164,63 +151,30 @@ class DoctorOnlyView(APIView):
         return JsonResponse(data)
     
 @extend_schema(
-    tags=['Patients'],
-    summary="Get list of all patients",
-    description="Returns a list of all patients in the doctor's hospital with their basic information",
+    tags=['Prescriptions'],
+    summary="Search medicines",
+    description="Autocomplete over the medicine catalog: medicines with a word starting with the query, names starting with it first. Served from an in-memory index.",
+    parameters=[
+        OpenApiParameter(name='q', type=str, location=OpenApiParameter.QUERY, description='Beginning of a medicine name'),
+        OpenApiParameter(name='limit', type=int, location=OpenApiParameter.QUERY, required=False, description='Maximum number of results (default 10, max 50)')
+    ],
     responses={
         200: OpenApiTypes.OBJECT,
-        401: OpenApiTypes.OBJECT,
-        403: OpenApiTypes.OBJECT
-    },
-    examples=[
-        OpenApiExample(
-            'Success Response',
-            value={
-                'patients': [{
-                    'user_id': 1,
-                    'name': 'John Doe',
-                    'created_at': '2024-01-28T12:00:00Z',
-                    'nss': '12345',
-                    'email': 'patient@example.com',
-                    'date_of_birth': '1990-01-01',
-                    'consultation_count': 5,
-                    'profile_image': 'url/to/image'
-                }]
-            }
-        )
-    ]
+        400: OpenApiTypes.OBJECT
+    }
 )
-class GetPatientsList(APIView):
+class SearchMedicinesView(APIView):
     permission_classes = [IsAuthenticated, IsDoctor]
 
     def get(self, request):
-        patients = AppUser.objects.filter(role='Patient',hospital=request.user.appuser.hospital)
-        patients_serialized=[]
-        for patient in patients:
-          consultation_count = patient.patient.consultation_set.count()
-          patients_serialized.append(
-          {
-              'user_id':patient.id,
-              'name': f"{patient.user.first_name} {patient.user.last_name}",
-              'created_at': patient.created_at,
-              'nss':patient.nss,
-              'email': patient.user.email,
-              'address': patient.address,
-              'date_of_birth': patient.date_of_birth,
-              'phone_number': patient.phone_number,
-              'emergency_contact_name':patient.patient.emergency_contact_name,
-              'emergency_contact_phone':patient.patient.emergency_contact_phone,
-              'consultation_count':consultation_count,
-              'profile_image':patient.image.url
-              
-          }
-          
-        )
-       
-       
-        return JsonResponse({"patients":patients_serialized}, status=200)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+        medicines = medicine_index.search(request.query_params.get('q', ''), limit)
+        return JsonResponse({"medicines":[{"id": medicine_id, "name": name} for medicine_id, name in medicines]}, status=200)
       
-  
 @extend_schema(
     tags=['Patients'],
     summary="Get specific patient details",
@@ -252,7 +206,7 @@ class GetPatientView(APIView):
               'emergency_contact_name':patient.patient.emergency_contact_name,
               'emergency_contact_phone':patient.patient.emergency_contact_phone,
               'consultation_count':consultation_count,
-              'profile_image':patient.image.url
+              'profile_image':media_url(patient.image)
               
           }
           
@@ -262,12 +216,13 @@ class GetPatientView(APIView):
 @extend_schema(
     tags=['Patient Records'],
     summary="Get patient's DPI (Digital Patient Information)",
-    description="Retrieves comprehensive patient information including consultation history",
+    description="Retrieves comprehensive patient information including consultation history, served from the materialized DPI document. Send the returned ETag back in If-None-Match to get a 304 when nothing changed.",
     parameters=[
         OpenApiParameter(name='id', type=int, location=OpenApiParameter.PATH, description='Patient ID')
     ],
     responses={
         200: OpenApiTypes.OBJECT,
+        304: OpenApiResponse(description='DPI not modified'),
         404: OpenApiTypes.OBJECT
     }
 )
@@ -276,36 +231,17 @@ class GetDPIView(APIView):
 
     def get(self, request,id):
        
-        patient =AppUser.objects.get(id=id)
-        consultations = Consultation.objects.filter(patient=patient.patient)
-        consultations_list = []
-        for consultation in consultations:
-            doctor= Worker.objects.get(id=consultation.doctor.id)
-            
-            last_prescription = Prescription.objects.filter(consultation=consultation).order_by('-id').first()
-            if not last_prescription: sgph="-----"
-            else : sgph = last_prescription.status
-            
-            if(consultation.archived):
-                lasted_for=(consultation.archived_at-consultation.created_at).days
-            else : lasted_for="-----"
-            
-            consultations_list.append({
-                "consultation_id":consultation.id,
-                "archived":consultation.archived,
-                "date":consultation.created_at,
-                "doctor_name":f"{doctor.user.user.first_name} {doctor.user.user.last_name}",
-                "lasted_for":lasted_for,
-                "sgph":sgph,
-                "reason":consultation.reason,
-                "priority":consultation.priority,
-                "resume":consultation.resume
-                
-                
-            })
+        patient =AppUser.objects.select_related('user','patient').get(id=id)
+        dpi = get_patient_dpi(patient.patient)
+        etag = f'"dpi-{dpi.patient_id}-{dpi.version}-{patient.updated_at.timestamp()}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
         data ={
               'user_id':patient.id,
-              'profile_image':patient.image.url,
+              'profile_image':media_url(patient.image),
               'name': f"{patient.user.first_name} {patient.user.last_name}",
               'date_of_birth': patient.date_of_birth,
               'nss':patient.nss,
@@ -314,13 +250,45 @@ class GetDPIView(APIView):
               'emergency_contact_name':patient.patient.emergency_contact_name,
               'emergency_contact_phone':patient.patient.emergency_contact_phone,
               'medical_condition':patient.patient.medical_condition,
-              'consultations_list':consultations_list
+              'consultations_list':dpi.document['consultations_list'],
+              'version':dpi.version
               
           }
       
-          
-        
-        return JsonResponse(data)
+        response = JsonResponse(data)
+        response['ETag'] = etag
+        return response
+    
+@extend_schema(
+    tags=['Patient Records'],
+    summary="Get a page of the patient's DPI consultations",
+    description="Reads the consultation history live, newest first, one cursor page at a time",
+    parameters=[
+        OpenApiParameter(name='id', type=int, location=OpenApiParameter.PATH, description='Patient ID'),
+        OpenApiParameter(name='cursor', type=str, location=OpenApiParameter.QUERY, required=False, description='Cursor returned as next_cursor by the previous page'),
+        OpenApiParameter(name='page_size', type=int, location=OpenApiParameter.QUERY, required=False, description='Consultations per page (default 20, max 100)')
+    ],
+    responses={
+        200: OpenApiTypes.OBJECT,
+        400: OpenApiTypes.OBJECT,
+        404: OpenApiTypes.OBJECT
+    }
+)
+class GetDPIConsultationsView(APIView):
+    permission_classes = [IsAuthenticated, IsDoctor]
+
+    def get(self, request,id):
+        patient = Patient.objects.get(user_id=id)
+        paginator = KeysetPaginator(dpi_consultations(patient), '-created_at')
+        try:
+            consultations, next_cursor = paginator.paginate(request)
+        except InvalidCursor as e:
+            return JsonResponse({'error': f"Invalid cursor: {e}"}, status=400)
+
+        return JsonResponse({
+            'consultations_list':[serialize_dpi_consultation(consultation) for consultation in consultations],
+            'next_cursor':next_cursor
+        })
     
     
 @extend_schema(
@@ -355,6 +323,7 @@ class CreateConultationView(APIView):
             return JsonResponse({'error': 'Missing required fields'}, status=400)
         try:
            consultation =Consultation.objects.create(patient=patient,doctor=doctor,priority=priority,reason=reason,archived=False,resume="")
+           refresh_dpi_consultation(consultation.id)
            return JsonResponse({'message': 'Consutation created successfully', 'consultation_id': consultation.id}, status=201)
         except Exception as e:
           print(e)
@@ -381,7 +350,7 @@ class getConultationView(APIView):
         patient= Patient.objects.get(id=consultation.patient.id).user
         data ={
               'user_id':patient.id,
-              'profile_image':patient.image.url,
+              'profile_image':media_url(patient.image),
               'consultation_id':consultation.id,
               'name': f"{patient.user.first_name} {patient.user.last_name}",
               'date_of_birth': patient.date_of_birth,
@@ -411,90 +380,8 @@ class getAttachmentsView(APIView):
     permission_classes = [IsAuthenticated, IsDoctor]
 
     def get(self, request,consultation_id):
-        doctor_id = request.user.appuser.id
         consultation = Consultation.objects.get(id=consultation_id)
-        results_serialized = []
-
-        # Lab Results
-        lab_results = LabResult.objects.filter(ticket__consultation=consultation)
-        for result in lab_results:
-             ticket = Ticket.objects.get(pk=result.ticket.id)
-             for image in result.labimage_set.all():
-                
-                results_serialized.append({
-                    'type': 'Lab_image',
-                    'title':ticket.title,
-                    'made_by':f"{result.labtechnician.user.user.first_name} {result.labtechnician.user.user.last_name}",
-                    'profile_image':result.labtechnician.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id': image.id,
-                   
-                })
-             for obs in result.labobservation_set.all():    
-                 results_serialized.append({
-                    'type': 'lab_observation',
-                    'title':ticket.title,
-                    'made_by':f"{result.labtechnician.user.user.first_name} {result.labtechnician.user.user.last_name}",
-                    'profile_image':result.labtechnician.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id':obs.id
-                   
-                })
-
-
-        # Radio Results
-        radio_results = RadioResult.objects.filter(ticket__consultation=consultation)
-        for result in radio_results:
-             ticket = Ticket.objects.get(pk=result.ticket.id)
-             for image in result.radioimage_set.all():
-                
-                results_serialized.append({
-                    'type': 'Radio_image',
-                    'title':ticket.title,
-                    'made_by': f"{result.radiologist.user.user.first_name} {result.radiologist.user.user.last_name}",
-                    'profile_image':result.radiologist.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id': image.id ,
-                   
-                })
-             for obs in result.radioobservation_set.all():    
-                 results_serialized.append({
-                    'type': 'Radio_observation',
-                    'title':ticket.title,
-                    'made_by': f"{result.radiologist.user.user.first_name} {result.radiologist.user.user.last_name}",
-                    'profile_image':result.radiologist.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id':obs.id
-                   
-                })
-
-
-        # Nursing Results
-        nursing_results = NursingResult.objects.filter(ticket__consultation=consultation)
-        for result in nursing_results:
-             ticket = Ticket.objects.get(pk=result.ticket.id)
-             for obs in result.nursingobservation_set.all():    
-                 results_serialized.append({
-                    'type': 'nursing_observation',
-                    'title':ticket.title,
-                    'made_by': f"{result.nurse.user.user.first_name} {result.nurse.user.user.last_name}",
-                    'profile_image':result.nurse.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id':obs.id ,
-                })
-        prescriptions = Prescription.objects.filter(consultation=consultation)
-        for prescription in prescriptions:
-                 consultation=Consultation.objects.get(pk=prescription.consultation.id)
-                 doctor=Worker.objects.get(pk=consultation.doctor.id)
-                 results_serialized.append({
-                    'type': 'prescription',
-                    'title': f'Doctor Prescription',
-                    'made_by': f"{doctor.user.user.first_name} {doctor.user.user.last_name}",
-                    'profile_image':doctor.user.image.url,
-                    'created_at':prescription.created_at,
-                    'attachment_id':prescription.id,
-                    
-                })
+        results_serialized = ConsultationTimeline(consultation.id).get()
 
         return JsonResponse({"results":results_serialized})
     
@@ -523,7 +410,8 @@ class GetLabImageView(APIView):
         return JsonResponse(
             {'title':ticket.title,
              'created_at':result.created_at,
-             'made_by': f"{result.labtechnician.user.user.first_name} {result.labtechnician.user.user.last_name}",'image':image.image.url}
+             'made_by': f"{result.labtechnician.user.user.first_name} {result.labtechnician.user.user.last_name}",'image':media_url(image.image),
+             'variants': variant_urls(image)}
             )
 
 @extend_schema(
@@ -552,7 +440,8 @@ class GetRadioImageView(APIView):
             {'title':ticket.title,
              'created_at':result.created_at,
              'made_by': f"{result.radiologist.user.user.first_name} {result.radiologist.user.user.last_name}",
-             'image':image.image.url}
+             'image':media_url(image.image),
+             'variants': variant_urls(image)}
             )
 @extend_schema(
         responses={
@@ -689,7 +578,8 @@ class CreateTicketView(APIView):
         if not all([ consultation_id,priority,type,title,description]):
             return JsonResponse({'error': 'Missing required fields'}, status=400)
         try:
-           ticket =Ticket.objects.create(consultation=consultation_id,priority=priority,status='Open',type=type,title=title,description=description,hospital=AppUser.hospital)
+           ticket =Ticket.objects.create(consultation_id=consultation_id,priority=priority,status='Open',type=type,title=title,description=description,hospital=request.user.appuser.hospital)
+           publish_ticket_event('ticket_created', ticket)
            return JsonResponse({'message': 'Ticket created successfully', 'ticket_id': ticket.id}, status=201)
         except:
           return Response("creation failed")
@@ -738,11 +628,29 @@ class CreatePrescriptionView(APIView):
         
         if not all([ consultation_id,status,medicines_list,notes]):
             return JsonResponse({'error': 'Missing required fields'}, status=400)
+        detail_fields = ['name', 'dosage', 'duration', 'frequency', 'instructions']
+        if not isinstance(medicines_list, list) or not all(
+            isinstance(detail, dict) and all(isinstance(detail.get(field), str) for field in detail_fields)
+            for detail in medicines_list
+        ):
+            return JsonResponse({'error': f"Each medicine needs {', '.join(detail_fields)}"}, status=400)
         try:
-           prescription =Prescription.objects.create(consultation=consultation_id,status=status,notes=notes)
-           for medicine_detail in medicines_list:
-               medicine = Medicine.objects.create(name=medicine_detail['name'])
-               prescription_detail=PrescriptionDetail.objects.create(prescription=prescription,medicine=medicine,dosage=medicine_detail['dosage'],duration=medicine_detail['duration'],instructions=medicine_detail['instructions'],frequency=medicine_detail['frequency'])
+           with transaction.atomic():
+               prescription = Prescription.objects.create(consultation_id=consultation_id,status=status,notes=notes)
+               medicine_ids = resolve_medicine_ids(detail['name'] for detail in medicines_list)
+               PrescriptionDetail.objects.bulk_create([
+                   PrescriptionDetail(
+                       prescription=prescription,
+                       medicine_id=medicine_ids[medicine_key(detail['name'])],
+                       dosage=detail['dosage'],
+                       duration=detail['duration'],
+                       instructions=detail['instructions'],
+                       frequency=detail['frequency'],
+                   )
+                   for detail in medicines_list
+               ])
+           ConsultationTimeline.invalidate(consultation_id)
+           refresh_dpi_consultation(consultation_id)
            return JsonResponse({'message': 'Prescription created successfully', 'prescription_id': prescription.id}, status=201)
         except:
           return Response("creation failed")
@@ -781,6 +689,7 @@ class ArchiveConsultationView(APIView):
            consultation.resume=resume
            consultation.archived=True
            consultation.save()
+           refresh_dpi_consultation(consultation.id)
            return JsonResponse({'message': 'Consultation archived successfully', 'consultation_id': consultation_id}, status=201)
         except:
           return Response("archiving failed") 
@@ -801,34 +710,49 @@ class GetPrescriptionView(APIView):
     permission_classes = [IsAuthenticated, IsDoctor]
 
     def get(self, request,prescription_id):
-     
-        prescription = Prescription.objects.get(id=prescription_id)
-        consultation = Consultation.objects.get(id=prescription.consultation.id)
-        patient = Patient.objects.get(id=consultation.patient.id)
-        doctor = Worker.objects.get(id=consultation.doctor.id)
-        
-        today = date.today()
-        age = today.year - patient.user.date_of_birth.year
-        prescription_details = PrescriptionDetail.objects.filter(prescription=prescription)
-        details_string = "\n".join(
-            f"- {detail.medicine.name} {detail.dosage} {detail.frequency} for {detail.duration} {detail.instructions}"
-            for detail in prescription_details
-        )
-        
-        data={
-            "hospital_name":patient.user.hospital.name,
-            "doctor_name":f"{doctor.user.user.first_name} {doctor.user.user.last_name}",
-            "speciality":doctor.speciality,
-            "patient_name":f"{patient.user.user.first_name} {patient.user.user.last_name}",
-            "age":age,
-            "gender":patient.user.gender,
-            "date":prescription.created_at,
-            "medications":details_string,
-            "notes":prescription.notes
-        }
-       
-        
+        try:
+            prescription = prescriptions_for_print().get(id=prescription_id)
+        except Prescription.DoesNotExist:
+            return JsonResponse({'error': 'Prescription not found'}, status=404)
+
+        data = prescription_document(prescription)
+        data["medications"] = "\n".join(data["medications"])
+        del data["prescription_id"]
         return JsonResponse(data, status=200)
+
+
+@extend_schema(
+    tags=['Prescriptions'],
+    summary="Print prescription",
+    description="Printable prescription as a PDF or PNG file. Renders are cached on disk by prescription and content, so reprints are a file read.",
+    parameters=[
+        OpenApiParameter(name='prescription_id', type=int, location=OpenApiParameter.PATH, description='Prescription ID'),
+        OpenApiParameter(name='output', type=str, location=OpenApiParameter.QUERY, required=False, enum=list(RENDER_FORMATS), description='File format (default pdf)')
+    ],
+    responses={
+        (200, 'application/pdf'): OpenApiTypes.BINARY,
+        (200, 'image/png'): OpenApiTypes.BINARY,
+        400: OpenApiTypes.OBJECT,
+        404: OpenApiTypes.OBJECT
+    }
+)
+class PrintPrescriptionView(APIView):
+    permission_classes = [IsAuthenticated, IsDoctor]
+
+    def get(self, request, prescription_id):
+        fmt = request.query_params.get('output', 'pdf')
+        if fmt not in RENDER_FORMATS:
+            return JsonResponse({'error': f"output must be one of {', '.join(RENDER_FORMATS)}"}, status=400)
+        try:
+            prescription = prescriptions_for_print().get(id=prescription_id)
+        except Prescription.DoesNotExist:
+            return JsonResponse({'error': 'Prescription not found'}, status=404)
+
+        return FileResponse(
+            render_prescription(prescription, fmt),
+            content_type=RENDER_FORMATS[fmt][1],
+            filename=f"prescription-{prescription.id}.{fmt}",
+        )
           
 @extend_schema(
     tags=['Doctor Profile'],
@@ -873,7 +797,7 @@ class ModifyMyUser(APIView):
         file = request.FILES.get('image')  
         
         if file:
-            app_user.image = file  
+            app_user.image = save_uploaded_image(file, 'users')
         if first_name:
             app_user.user.first_name = first_name
         if last_name:
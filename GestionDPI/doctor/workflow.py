@@ -0,0 +1,170 @@
+from django.db.models import Prefetch
+from doctor.models import (
+    LabImage,
+    LabObservation,
+    LabResult,
+    NursingObservation,
+    NursingResult,
+    RadioImage,
+    RadioObservation,
+    RadioResult,
+    Ticket,
+)
+from doctor.serializers import (
+    LabImageSerializer,
+    LabObservationSerializer,
+    NursingObservationSerializer,
+    RadioImageSerializer,
+    RadioObservationSerializer,
+)
+from GestionDPI.permissions import IsLabNurse, IsLabTechnician, IsRadiologist
+
+
+class ResultWorkflow:
+    """
+    How a department records the results of its tickets.
+
+    The result models of every department have the same shape: a result
+    row one-to-one with the ticket and pointing to the worker who wrote
+    it, and observation (and optionally image) rows pointing to the
+    result through a field named after the result model. The workflow
+    holds the models of one department and runs the queries on them, so
+    the views and URLs are shared by all departments.
+    """
+
+    def __init__(
+        self,
+        type,
+        role,
+        permission,
+        result_model,
+        worker_field,
+        observation_model,
+        observation_serializer,
+        image_model=None,
+        image_serializer=None,
+    ):
+        self.type = type
+        self.role = role
+        self.permission = permission
+        self.result_model = result_model
+        self.worker_field = worker_field
+        self.observation_model = observation_model
+        self.observation_serializer = observation_serializer
+        self.image_model = image_model
+        self.image_serializer = image_serializer
+        # field of the observations and images pointing to the result
+        self.result_field = result_model._meta.model_name
+
+    @property
+    def has_images(self):
+        return self.image_model is not None
+
+    def tickets(self, hospital):
+        return Ticket.objects.filter(hospital=hospital, type=self.type)
+
+    def result_of(self, ticket, worker):
+        """
+        The result of a ticket, created for the worker when it has none yet.
+        Concurrent first writes are resolved by the unique ticket column.
+        """
+        result, _ = self.result_model.objects.get_or_create(
+            ticket=ticket, defaults={self.worker_field: worker}
+        )
+        return result
+
+    def add_observation(self, result, title, notes):
+        return self.observation_model.objects.create(
+            **{self.result_field: result}, title=title, notes=notes
+        )
+
+    def add_images(self, result, images):
+        """
+        Insert `(stored image, variants, asset)` triples for a result with one
+        query; returns the rows in order.
+        """
+        rows = self.image_model.objects.bulk_create([
+            self.image_model(**{self.result_field: result}, image=image, variants=variants, asset=asset)
+            for image, variants, asset in images
+        ])
+        if any(row.pk is None for row in rows):
+            # read the ids back, bulk_create does not return them on MySQL
+            field = self.image_model._meta.get_field("image")
+            ids = {
+                field.get_prep_value(image): id
+                for image, id in self.image_model.objects.filter(
+                    **{self.result_field: result}, image__in=[row.image for row in rows]
+                ).values_list("image", "id")
+            }
+            for row in rows:
+                row.pk = ids[field.get_prep_value(row.image)]
+        return rows
+
+    def worker_image(self, id, worker):
+        """An image of a result written by the worker, with its ticket joined."""
+        return self.image_model.objects.select_related(f"{self.result_field}__ticket").get(
+            id=id, **{f"{self.result_field}__{self.worker_field}": worker}
+        )
+
+    def detailed_result(self, hospital, ticket_id):
+        """
+        The result of a ticket of this type in a hospital with its
+        observations and images, in one query per kind of row. Raises the
+        result model's `DoesNotExist`.
+        """
+        prefetches = [
+            Prefetch(
+                f"{self.observation_model._meta.model_name}_set",
+                queryset=self.observation_model.objects.order_by("id"),
+                to_attr="observations",
+            )
+        ]
+        if self.has_images:
+            prefetches.append(
+                Prefetch(
+                    f"{self.image_model._meta.model_name}_set",
+                    queryset=self.image_model.objects.order_by("id"),
+                    to_attr="images",
+                )
+            )
+        return (
+            self.result_model.objects.filter(ticket__hospital=hospital, ticket__type=self.type)
+            .prefetch_related(*prefetches)
+            .get(ticket_id=ticket_id)
+        )
+
+
+# ticket type -> workflow of the department handling it
+WORKFLOWS = {}
+
+
+def register_workflow(workflow):
+    """
+    Make a department available to `GestionDPI.workflow.workflow_urlpatterns`.
+    Its ticket type must also be one of the `Ticket.type` choices.
+    """
+    WORKFLOWS[workflow.type] = workflow
+    return workflow
+
+
+def get_workflow(type):
+    return WORKFLOWS[type]
+
+
+register_workflow(ResultWorkflow(
+    "Lab", "LabTechnician", IsLabTechnician,
+    LabResult, "labtechnician",
+    LabObservation, LabObservationSerializer,
+    LabImage, LabImageSerializer,
+))
+register_workflow(ResultWorkflow(
+    "Radio", "Radiologist", IsRadiologist,
+    RadioResult, "radiologist",
+    RadioObservation, RadioObservationSerializer,
+    RadioImage, RadioImageSerializer,
+))
+register_workflow(ResultWorkflow(
+    "Nursing", "Nurse", IsLabNurse,
+    NursingResult, "nurse",
+    NursingObservation, NursingObservationSerializer,
+))
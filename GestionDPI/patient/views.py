@@ -6,10 +6,11 @@ from rest_framework.parsers import JSONParser
 from rest_framework.exceptions import NotFound
 from django.db import transaction
 from django.http import JsonResponse
-from users.models import Patient
-from doctor.models import Consultation,Prescription,LabImage,LabObservation,LabResult,RadioResult,RadioImage,RadioObservation,NursingObservation,NursingResult,Ticket
+from users.models import AppUser, Patient
+from doctor.models import Consultation,Prescription,LabImage,LabObservation,RadioImage,RadioObservation,NursingObservation
 from GestionDPI.permissions import IsPatient
-from doctor.models import  LabResult, RadioResult, NursingResult
+from doctor.timeline import ConsultationTimeline
+from GestionDPI.storage import save_uploaded_image
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.exceptions import ValidationError
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiResponse,OpenApiTypes
@@ -118,7 +119,7 @@ class ConsultationDetailView(APIView):
         # Get patient and consultation
         try:
             patient = Patient.objects.get(user=user.appuser)
-            consultation = Consultation.objects.get(id=consultation_id, patient=patient)
+            consultation = Consultation.objects.select_related('doctor__user__user').get(id=consultation_id, patient=patient)
         except (Patient.DoesNotExist, Consultation.DoesNotExist):
             raise NotFound(detail="Consultation not found or unauthorized access.")
 
@@ -145,88 +146,14 @@ class ConsultationDetailView(APIView):
             'archived' : consultation.archived
         }
         results_serialized = []
-
-        # Lab Results
-        lab_results = LabResult.objects.filter(ticket__consultation=consultation)
-        for result in lab_results:
-             ticket = Ticket.objects.get(pk=result.ticket)
-             for image in result.labimage_set.all():
-                
-                results_serialized.append({
-                    'type': 'Lab_image',
-                    'title':ticket.title,
-                    'made_by':f"{result.labtechnician.user.user.first_name} {result.labtechnician.user.user.last_name}",
-                    'profile_image':result.labtechnician.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id': image.image.url ,
-                   
-                })
-             for obs in result.labobservation_set.all():    
-                 results_serialized.append({
-                    'type': 'lab_observation',
-                    'title':ticket.title,
-                    'made_by':f"{result.labtechnician.user.user.first_name} {result.labtechnician.user.user.last_name}",
-                    'profile_image':result.labtechnician.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id':obs.id
-                   
-                })
-
-
-        # Radio Results
-        radio_results = RadioResult.objects.filter(ticket__consultation=consultation)
-        for result in radio_results:
-             ticket = Ticket.objects.get(pk=result.ticket)
-             for image in result.radioimage_set.all():
-                
-                results_serialized.append({
-                    'type': 'Radio_image',
-                    'title':ticket.title,
-                    'made_by': f"{result.radiologist.user.user.first_name} {result.radiologist.user.user.last_name}",
-                    'profile_image':result.radiologist.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id': image.image.url ,
-                   
-                })
-             for obs in result.radioobservation_set.all():    
-                 results_serialized.append({
-                    'type': 'Radio_observation',
-                    'title':ticket.title,
-                    'made_by': f"{result.radiologist.user.user.first_name} {result.radiologist.user.user.last_name}",
-                    'profile_image':result.radiologist.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id':obs.id
-                   
-                })
-
-
-        # Nursing Results
-        nursing_results = NursingResult.objects.filter(ticket__consultation=consultation)
-        for result in nursing_results:
-             ticket = Ticket.objects.get(pk=result.ticket)
-             for obs in result.nursingobservation_set.all():    
-                 results_serialized.append({
-                    'type': 'Nursing_observation',
-                    'title':ticket.title,
-                    'made_by': f"{result.nurse.user.user.first_name} {result.nurse.user.user.last_name}",
-                    'profile_image':result.nurse.user.image.url,
-                    'created_at':result.created_at,
-                    'attachment_id':obs.id ,
-                })
-        prescriptions = Prescription.objects.filter(consultation=consultation)
-        for prescription in prescriptions:
-                 consultation=Consultation.objects.get(pk=prescription.consultation)
-                 doctor=Worker.objects.get(pk=consultation.doctor)
-                 results_serialized.append({
-                    'type': 'prescription',
-                    'title': f'Doctor Prescription',
-                    'made_by': f"{doctor.user.user.first_name} {doctor.user.user.last_name}",
-                    'profile_image':doctor.user.image.url,
-                    'created_at':prescription.created_at,
-                    'attachment_id':prescription.id,
-                    
-                })
-
+        for entry in ConsultationTimeline(consultation.id).get():
+            entry = dict(entry)
+            # the patient portal links images directly and capitalizes nursing entries
+            if 'image_url' in entry:
+                entry['attachment_id'] = entry.pop('image_url')
+            elif entry['type'] == 'nursing_observation':
+                entry['type'] = 'Nursing_observation'
+            results_serialized.append(entry)
 
         return JsonResponse({'patient':patient_info,'consultation': consultation_details, 'results': results_serialized}, status=200)
 
@@ -283,7 +210,7 @@ class ModifyMyUser(APIView):
         file = request.FILES.get('image')  
         
         if file:
-            app_user.image = file  
+            app_user.image = save_uploaded_image(file, 'users')
         if first_name:
             app_user.user.first_name = first_name
         if last_name:
@@ -0,0 +1,63 @@
+from django.db.models import Count
+from GestionDPI.storage import media_url
+from users.models import AppUser, Patient
+
+# field name -> value of a directory row, computed from an AppUser joined with its User and Patient
+PATIENT_DIRECTORY_FIELDS = {
+    'user_id': lambda patient: patient.id,
+    'name': lambda patient: f"{patient.user.first_name} {patient.user.last_name}",
+    'created_at': lambda patient: patient.created_at,
+    'nss': lambda patient: patient.nss,
+    'email': lambda patient: patient.user.email,
+    'address': lambda patient: patient.address,
+    'date_of_birth': lambda patient: patient.date_of_birth,
+    'phone_number': lambda patient: patient.phone_number,
+    'emergency_contact_name': lambda patient: patient.patient.emergency_contact_name,
+    'emergency_contact_phone': lambda patient: patient.patient.emergency_contact_phone,
+    'consultation_count': lambda patient: patient.consultation_count,
+    'profile_image': lambda patient: media_url(patient.image),
+}
+
+PATIENT_DIRECTORY_ORDERING = 'user__last_name'
+
+
+def parse_directory_fields(value):
+    """
+    Parse a `fields=name,nss,...` sparse fieldset; all fields when empty.
+    Raises ValueError on unknown fields.
+    """
+    if not value:
+        return list(PATIENT_DIRECTORY_FIELDS)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in PATIENT_DIRECTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def patient_directory(hospital, fields):
+    """
+    Patients of a hospital with their user and patient rows joined; the
+    consultation count is annotated only when it is requested.
+    """
+    patients = AppUser.objects.filter(role='Patient', hospital=hospital).select_related('user', 'patient')
+    if 'consultation_count' in fields:
+        patients = patients.annotate(consultation_count=Count('patient__consultation'))
+    return patients
+
+
+def serialize_directory_patient(patient, fields):
+    return {field: PATIENT_DIRECTORY_FIELDS[field](patient) for field in fields}
+
+
+def hospital_patients(hospital):
+    """
+    Patient rows of a hospital for `PatientSerializer`: the AppUser and User
+    are joined and the consultation count is annotated, so a page of
+    patients is a single query.
+    """
+    return (
+        Patient.objects.filter(user__hospital=hospital)
+        .select_related('user__user')
+        .annotate(consultation_count=Count('consultation'))
+    )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from users.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the patient search index (name, NSS and phone terms and trigrams) of every patient"
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} patients"))
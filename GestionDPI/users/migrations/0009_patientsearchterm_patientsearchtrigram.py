@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_appuser_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('name', 'name'), ('nss', 'nss'), ('phone', 'phone')], max_length=10)),
+                ('term', models.CharField(max_length=100)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.hospital')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hospital', 'term'], name='users_patie_hospita_7b0d09_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PatientSearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.hospital')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hospital', 'trigram'], name='users_patie_hospita_851d1a_idx')],
+            },
+        ),
+    ]
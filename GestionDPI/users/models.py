@@ -58,6 +58,9 @@ class Patient(models.Model):
         return f"{self.user.user.first_name}"
     
     def number_of_consultations(self):
+        # preloaded for whole pages by doctor.tickets.preload_consultation_counts
+        if hasattr(self, 'consultation_count'):
+            return self.consultation_count
         return self.consultation_set.count()
         
     
@@ -72,3 +75,26 @@ class Worker(models.Model):
 # Admin Model
 class Admin(models.Model):
     user = models.OneToOneField(AppUser, on_delete=models.CASCADE)
+
+
+# Patient search index, maintained by users.search
+class PatientSearchTerm(models.Model):
+    KIND_CHOICES = [
+        ('name', 'name'),
+        ('nss', 'nss'),
+        ('phone', 'phone')
+    ]
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    term = models.CharField(max_length=100)
+    class Meta:
+        indexes = [models.Index(fields=['hospital', 'term'])]
+
+
+class PatientSearchTrigram(models.Model):
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    trigram = models.CharField(max_length=3)
+    class Meta:
+        indexes = [models.Index(fields=['hospital', 'trigram'])]
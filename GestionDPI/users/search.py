@@ -0,0 +1,156 @@
+import re
+import unicodedata
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, Q, Value, When
+from django.db.models.signals import post_save
+from users.models import AppUser, Patient, PatientSearchTerm, PatientSearchTrigram
+
+# a prefix match always outranks a fuzzy-only match
+PREFIX_SCORE = 2.0
+EXACT_SCORE = 3.0
+MIN_SIMILARITY = 0.3
+# trigram padding; MySQL ignores trailing spaces in comparisons so spaces cannot be used
+PAD = '$'
+
+
+def normalize(text):
+    """Lowercase, accent-free alphanumeric tokens of a text"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def trigrams(term):
+    padded = f"{PAD}{PAD}{term}{PAD}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def patient_terms(patient):
+    """(kind, term) pairs indexed for a patient"""
+    app_user = patient.user
+    terms = {('name', token) for token in normalize(f"{app_user.user.first_name} {app_user.user.last_name}")}
+    terms.update(('nss', token) for token in normalize(app_user.nss))
+    phone = ''.join(normalize(app_user.phone_number))
+    if phone:
+        terms.add(('phone', phone))
+    return terms
+
+
+def index_patient(patient):
+    """(Re)index a patient; done on save by the receivers of `connect_search_index`"""
+    terms = patient_terms(patient)
+    grams = set()
+    for _, term in terms:
+        grams |= trigrams(term)
+
+    hospital_id = patient.user.hospital_id
+    with transaction.atomic():
+        PatientSearchTerm.objects.filter(patient=patient).delete()
+        PatientSearchTrigram.objects.filter(patient=patient).delete()
+        PatientSearchTerm.objects.bulk_create([
+            PatientSearchTerm(hospital_id=hospital_id, patient=patient, kind=kind, term=term[:100])
+            for kind, term in terms
+        ])
+        PatientSearchTrigram.objects.bulk_create([
+            PatientSearchTrigram(hospital_id=hospital_id, patient=patient, trigram=gram)
+            for gram in grams
+        ])
+
+
+# fields of each model that are indexed, by the lookup from a Patient to it
+INDEXED_FIELDS = {
+    User: ('user__user', {'first_name', 'last_name'}),
+    AppUser: ('user', {'nss', 'phone_number', 'hospital', 'hospital_id'}),
+}
+
+
+def reindex_on_save(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    `post_save` receiver keeping the index in step with patients, their
+    AppUser and their User, whichever view or command saves them. Saves of
+    unindexed fields only (e.g. `last_login`) are skipped; queryset updates
+    and bulk writes send no signal, run `rebuild_index` after them.
+    """
+    if raw:
+        return
+    if sender is Patient:
+        patients = [instance]
+    else:
+        lookup, fields = INDEXED_FIELDS[sender]
+        if created or (update_fields is not None and not fields & set(update_fields)):
+            # a new User or AppUser has no Patient yet, it is indexed with it
+            return
+        patients = Patient.objects.filter(**{lookup: instance}).select_related('user__user')
+    for patient in patients:
+        index_patient(patient)
+
+
+def connect_search_index():
+    for model in (Patient, AppUser, User):
+        post_save.connect(reindex_on_save, sender=model, dispatch_uid=f"patient_search:{model._meta.label}")
+
+
+def rebuild_index(patients=None, batch_size=500):
+    patients = patients if patients is not None else Patient.objects.all()
+    count = 0
+    for patient in patients.select_related('user__user').iterator(chunk_size=batch_size):
+        index_patient(patient)
+        count += 1
+    return count
+
+
+def search_patients(hospital, query, limit=20):
+    """
+    Rank the patients of a hospital matching `query` by name, NSS or phone.
+
+    Prefix matches on indexed terms score highest; trigram similarity adds
+    fuzzy matching for typos. Returns `[(patient_id, score), ...]` best first,
+    in two queries whatever the size of the hospital.
+    """
+    tokens = list(dict.fromkeys(normalize(query)))
+    if not tokens:
+        return []
+    scores = defaultdict(float)
+
+    prefix = Q()
+    strength = {}
+    for i, token in enumerate(tokens):
+        prefix |= Q(term__startswith=token)
+        # best match of the token among the patient's terms
+        strength[f'token{i}'] = Max(Case(
+            When(term=token, then=Value(EXACT_SCORE)),
+            When(term__startswith=token, then=Value(PREFIX_SCORE)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+    # scored and ordered by the database, so that the cap on candidates
+    # drops the weakest matches rather than an arbitrary subset
+    matches = (
+        PatientSearchTerm.objects.filter(prefix, hospital=hospital)
+        .values('patient_id')
+        .annotate(**strength)
+        .annotate(score=sum((F(name) for name in strength), Value(0.0)))
+        .order_by('-score', 'patient_id')
+        .values_list('patient_id', 'score')[:limit * 20]
+    )
+    for patient_id, score in matches:
+        scores[patient_id] += score
+
+    grams = set()
+    for token in tokens:
+        grams |= trigrams(token)
+    similar = (
+        PatientSearchTrigram.objects.filter(hospital=hospital, trigram__in=grams)
+        .values('patient_id')
+        .annotate(hits=Count('id'))
+        .order_by('-hits')[:limit * 5]
+    )
+    for row in similar:
+        similarity = row['hits'] / len(grams)
+        if similarity >= MIN_SIMILARITY or row['patient_id'] in scores:
+            scores[row['patient_id']] += similarity
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_flex_fields import FlexFieldsModelSerializer
 
 from .models import Worker, Patient, AppUser, User
+from GestionDPI.serializers import MediaUrlField
 
 
 
@@ -13,6 +14,8 @@ class UserSerializer(FlexFieldsModelSerializer):
 
 class AppUserSerializer(FlexFieldsModelSerializer):
 
+    image = MediaUrlField()
+
     class Meta:
         model = AppUser
         fields = [
@@ -1,3 +1,111 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from GestionDPI.pagination import KeysetPaginator
+from users.directory import PATIENT_DIRECTORY_ORDERING, parse_directory_fields, patient_directory, serialize_directory_patient
+from users.search import search_patients
 
-# Create your views here.
+# The patient directory views are shared by the doctor and admin URLs,
+# which route them with their own permission_classes; a route without them
+# still requires an authenticated user.
+
+FIELDS_PARAMETER = OpenApiParameter(
+    name='fields', type=str, location=OpenApiParameter.QUERY, required=False,
+    description='Comma separated subset of the patient fields to return'
+)
+
+
+@extend_schema(
+    tags=['Patients'],
+    summary="Get list of all patients",
+    description="Returns a page of the patients in the user's hospital, ordered by last name, with their basic information",
+    parameters=[
+        OpenApiParameter(name='cursor', type=str, location=OpenApiParameter.QUERY, required=False, description='Cursor returned as next_cursor by the previous page'),
+        OpenApiParameter(name='page_size', type=int, location=OpenApiParameter.QUERY, required=False, description='Patients per page (default 50, max 200)'),
+        FIELDS_PARAMETER,
+    ],
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'patients': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'user_id': {'type': 'integer'},
+                            'name': {'type': 'string'},
+                            'created_at': {'type': 'string', 'format': 'date-time'},
+                            'nss': {'type': 'string'},
+                            'email': {'type': 'string'},
+                            'address': {'type': 'string'},
+                            'date_of_birth': {'type': 'string', 'format': 'date'},
+                            'phone_number': {'type': 'string'},
+                            'emergency_contact_name': {'type': 'string'},
+                            'emergency_contact_phone': {'type': 'string'},
+                            'consultation_count': {'type': 'integer'},
+                            'profile_image': {'type': 'string'}
+                        }
+                    }
+                },
+                'next_cursor': {'type': 'string', 'nullable': True}
+            }
+        },
+        400: OpenApiTypes.OBJECT
+    }
+)
+class PatientListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            fields = parse_directory_fields(request.query_params.get('fields'))
+            paginator = KeysetPaginator(
+                patient_directory(request.user.appuser.hospital, fields),
+                PATIENT_DIRECTORY_ORDERING, page_size=50, max_page_size=200
+            )
+            patients, next_cursor = paginator.paginate(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        patients_serialized = [serialize_directory_patient(patient, fields) for patient in patients]
+        return JsonResponse({"patients":patients_serialized, "next_cursor":next_cursor}, status=200)
+
+
+@extend_schema(
+    tags=['Patients'],
+    summary="Search patients",
+    description="Search-as-you-type over the hospital's patients by first/last name, NSS or phone number. Prefix matches rank first, then fuzzy (trigram) matches.",
+    parameters=[
+        OpenApiParameter(name='q', type=str, location=OpenApiParameter.QUERY, description='Search text'),
+        OpenApiParameter(name='limit', type=int, location=OpenApiParameter.QUERY, required=False, description='Maximum number of results (default 20, max 50)'),
+        FIELDS_PARAMETER,
+    ],
+    responses={
+        200: OpenApiTypes.OBJECT,
+        400: OpenApiTypes.OBJECT
+    }
+)
+class SearchPatientsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        hospital = request.user.appuser.hospital
+        try:
+            fields = parse_directory_fields(request.query_params.get('fields'))
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 50))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        ranked = search_patients(hospital, request.query_params.get('q', ''), limit)
+        patients = {
+            patient.patient.id: patient
+            for patient in patient_directory(hospital, fields).filter(patient__id__in=[patient_id for patient_id, _ in ranked])
+        }
+        results = [
+            {**serialize_directory_patient(patients[patient_id], fields), 'score': round(score, 3)}
+            for patient_id, score in ranked if patient_id in patients
+        ]
+        return JsonResponse({"patients":results}, status=200)